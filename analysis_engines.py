@@ -0,0 +1,346 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+BookDataAnalyzer的数据处理引擎
+功能：
+1. pandas: 默认引擎，即时计算，与原有逻辑一致
+2. Polars: 惰性扫描CSV/Parquet，清洗、分类统计和指标统计在优化后的查询计划中多线程执行
+3. DuckDB: 同样惰性执行，查询由DuckDB优化并行计算
+三种引擎的清洗规则、分类计数（同数量按首次出现顺序）和指标口径相同；
+只有绘图、去重等需要逐行数据的功能才把结果转换成pandas DataFrame
+"""
+
+import importlib.util
+import itertools
+import math
+
+# pandas在创建pandas引擎或惰性引擎需要转换成DataFrame时才导入；
+# Polars和DuckDB只检查是否已安装，创建对应引擎时才导入（导入较慢，不影响只用pandas的场景）
+POLARS_AVAILABLE = importlib.util.find_spec('polars') is not None
+DUCKDB_AVAILABLE = importlib.util.find_spec('duckdb') is not None
+pd = None
+pl = None
+duckdb = None
+
+# 清洗后新增的数值列
+CLEAN_COLUMNS = ('原价_清洗', '现价_清洗', '字数_清洗')
+DERIVED_COLUMNS = ('折扣率', '优惠金额')
+# 价格、字数文本中需要去掉的部分
+PRICE_STRIP = ('￥', ' ')
+WORD_STRIP = ('万字', ' ')
+# 带BOM的CSV在部分引擎中第一个列名会残留BOM
+BOM = '\ufeff'
+# 指标中的分位数（与pandas describe()一致）
+QUANTILES = (0.25, 0.5, 0.75)
+
+def is_parquet(path):
+    return str(path).lower().endswith(('.parquet', '.pq'))
+
+def clean_number(value, strip, scale=1):
+    """pandas引擎：去掉单位后转为数值，无法解析时为0"""
+    if pd.isna(value):
+        return 0
+    text = str(value)
+    for part in strip:
+        text = text.replace(part, '')
+    try:
+        return float(text) * scale
+    except ValueError:
+        return 0
+
+def stats_dict(count, mean, std, minimum, quantiles, maximum):
+    """与pandas Series.describe()相同键的统计字典，空值为nan"""
+    def value(x):
+        return math.nan if x is None else float(x)
+    stats = {'count': float(count), 'mean': value(mean), 'std': value(std), 'min': value(minimum)}
+    for q, x in zip(QUANTILES, quantiles):
+        stats[f'{q:.0%}'] = value(x)
+    stats['max'] = value(maximum)
+    return stats
+
+def metrics_dict(row):
+    """把各引擎单次查询得到的聚合结果（扁平字典）整理成与BookMetricsAccumulator.result()相同的结构"""
+    def describe(prefix):
+        return stats_dict(row[f'{prefix}_count'], row[f'{prefix}_mean'], row[f'{prefix}_std'], row[f'{prefix}_min'],
+                          [row[f'{prefix}_q{int(q * 100)}'] for q in QUANTILES], row[f'{prefix}_max'])
+    word_stats = describe('word') if row['word_count'] else None
+    return {
+        'total_books': int(row['total']),
+        'priced_books': int(row['price_count']),
+        'worded_books': int(row['word_count']),
+        'price_stats': describe('price'),
+        'current_price_stats': describe('current'),
+        'word_stats': word_stats,
+        'discount_books': int(row['discount_count']),
+        'mean_discount_rate': row['discount_mean'] if row['discount_mean'] is not None else 0.0,
+        'mean_saving': row['saving_mean'] if row['saving_mean'] is not None else 0.0,
+        'rank_min': math.inf if row['rank_min'] is None else float(row['rank_min']),
+        'rank_max': -math.inf if row['rank_max'] is None else float(row['rank_max']),
+        'top100_books': int(row['top100'] or 0),
+        'top500_books': int(row['top500'] or 0),
+        'high_price_books': int(row['high_price'] or 0),
+        'low_price_books': int(row['low_price'] or 0),
+    }
+
+def sort_category_counts(counts):
+    """分类计数表按数量降序，数量相同时按首次出现顺序（first列）"""
+    counts = counts.sort_values(['数量', 'first'], ascending=[False, True], kind='stable')
+    return counts[['分类', '数量']].reset_index(drop=True)
+
+class PandasEngine:
+    name = 'pandas'
+    lazy = False
+
+    def __init__(self):
+        global pd
+        import pandas as pd
+
+    def scan(self, path):
+        if is_parquet(path):
+            return pd.read_parquet(path)
+        return pd.read_csv(path, encoding='utf-8')
+
+    def from_pandas(self, data):
+        return data
+
+    def to_pandas(self, frame):
+        return frame
+
+    def columns(self, frame):
+        return list(frame.columns)
+
+    def clean(self, frame):
+        """解析价格、字数并计算折扣率和优惠金额（由books_to_frame构建的数据已带数值列，无需再解析文本）"""
+        if '原价_清洗' not in frame.columns:
+            frame['原价_清洗'] = frame['原价'].apply(clean_number, strip=PRICE_STRIP)
+        if '现价_清洗' not in frame.columns:
+            frame['现价_清洗'] = frame['现价'].apply(clean_number, strip=PRICE_STRIP)
+        if '字数_清洗' not in frame.columns:
+            frame['字数_清洗'] = frame['字数'].apply(clean_number, strip=WORD_STRIP, scale=10000)
+        frame['折扣率'] = (frame['现价_清洗'] / frame['原价_清洗']).fillna(1)
+        frame['优惠金额'] = frame['原价_清洗'] - frame['现价_清洗']
+        return frame
+
+    def category_counts(self, frame):
+        """各分类的图书数（多个分类用+分隔）"""
+        categories = frame['分类'].dropna().astype(str).str.split('+').explode().str.strip()
+        counts = pd.DataFrame({'分类': categories.to_numpy(), 'first': range(len(categories))})
+        counts = counts.groupby('分类', sort=False).agg(数量=('first', 'size'), first=('first', 'min')).reset_index()
+        return sort_category_counts(counts)
+
+    def common_metrics(self, frame):
+        """
+        单遍流式统计，内存有界：每列不超过EXACT_LIMIT个值时分位数精确计算，与Polars、DuckDB引擎结果相同；
+        超过后改用KLL草图，分位数在草图的误差范围内近似
+        """
+        from streaming_stats import BookMetricsAccumulator
+
+        accumulator = BookMetricsAccumulator()
+        accumulator.update(frame)
+        return accumulator.result()
+
+class PolarsEngine:
+    name = 'polars'
+    lazy = True
+
+    def __init__(self):
+        global pl
+        if not POLARS_AVAILABLE:
+            raise RuntimeError("Polars引擎需要安装polars")
+        import polars as pl
+
+    def scan(self, path):
+        frame = pl.scan_parquet(path) if is_parquet(path) else pl.scan_csv(path, infer_schema_length=10000)
+        # UTF-8 BOM可能残留在第一个列名中
+        names = frame.collect_schema().names()
+        return frame.rename({name: name.lstrip(BOM) for name in names if name.startswith(BOM)})
+
+    def from_pandas(self, data):
+        return pl.from_pandas(data).lazy()
+
+    def to_pandas(self, frame):
+        import pandas as pd
+
+        # 不依赖pyarrow的转换
+        return pd.DataFrame(frame.collect().to_dict(as_series=False))
+
+    def columns(self, frame):
+        return frame.collect_schema().names()
+
+    def _clean_number(self, column, strip, scale=1):
+        text = pl.col(column).cast(pl.Utf8)
+        for part in strip:
+            text = text.str.replace_all(part, '', literal=True)
+        return (text.cast(pl.Float64, strict=False) * scale).fill_null(0).fill_nan(0)
+
+    def clean(self, frame):
+        names = self.columns(frame)
+        exprs = []
+        for column, source, strip, scale in (('原价_清洗', '原价', PRICE_STRIP, 1), ('现价_清洗', '现价', PRICE_STRIP, 1),
+                                             ('字数_清洗', '字数', WORD_STRIP, 10000)):
+            if column not in names:
+                exprs.append(self._clean_number(source, strip, scale).alias(column))
+        frame = frame.with_columns(exprs) if exprs else frame
+        original, current = pl.col('原价_清洗').cast(pl.Float64), pl.col('现价_清洗').cast(pl.Float64)
+        # 0/0为nan，与pandas的fillna(1)一致；非零/0为inf
+        return frame.with_columns((current / original).fill_nan(1).alias('折扣率'),
+                                  (original - current).alias('优惠金额'))
+
+    def category_counts(self, frame):
+        import pandas as pd
+
+        counts = (frame.select(pl.col('分类').drop_nulls().cast(pl.Utf8).str.split('+').explode()
+                               .str.strip_chars().alias('分类'))
+                  .with_row_index('first')
+                  .group_by('分类')
+                  .agg(pl.len().alias('数量'), pl.col('first').min())
+                  .collect())
+        return sort_category_counts(pd.DataFrame(counts.to_dict(as_series=False)))
+
+    def _describe(self, column, prefix):
+        values = pl.col(column).filter(pl.col(column) > 0)
+        exprs = [values.count().alias(f'{prefix}_count'), values.mean().alias(f'{prefix}_mean'),
+                 values.std().alias(f'{prefix}_std'), values.min().alias(f'{prefix}_min'),
+                 values.max().alias(f'{prefix}_max')]
+        exprs += [values.quantile(q, interpolation='linear').alias(f'{prefix}_q{int(q * 100)}') for q in QUANTILES]
+        return exprs
+
+    def common_metrics(self, frame):
+        price, current, rank = pl.col('原价_清洗'), pl.col('现价_清洗'), pl.col('热度排名')
+        both = (price > 0) & (current > 0)
+        priced = price.filter(price > 0)
+        row = frame.select(
+            pl.len().alias('total'),
+            *self._describe('原价_清洗', 'price'),
+            *self._describe('现价_清洗', 'current'),
+            *self._describe('字数_清洗', 'word'),
+            both.sum().alias('discount_count'),
+            pl.col('折扣率').filter(both).mean().alias('discount_mean'),
+            pl.col('优惠金额').filter(both).mean().alias('saving_mean'),
+            rank.min().alias('rank_min'), rank.max().alias('rank_max'),
+            (rank <= 100).sum().alias('top100'), (rank <= 500).sum().alias('top500'),
+            (price > priced.quantile(0.75, interpolation='linear')).sum().alias('high_price'),
+            (price < priced.quantile(0.25, interpolation='linear')).sum().alias('low_price'),
+        ).collect().row(0, named=True)
+        return metrics_dict(row)
+
+def quote(name):
+    """SQL标识符"""
+    return '"' + name.replace('"', '""') + '"'
+
+class DuckDBEngine:
+    name = 'duckdb'
+    lazy = True
+
+    def __init__(self):
+        global duckdb
+        if not DUCKDB_AVAILABLE:
+            raise RuntimeError("DuckDB引擎需要安装duckdb")
+        import duckdb
+        self.conn = duckdb.connect()
+        self._view_ids = itertools.count()
+
+    def _view(self):
+        """每次查询使用新的视图名（在同名视图上再次查询会递归绑定）"""
+        return f'v{next(self._view_ids)}'
+
+    def scan(self, path):
+        relation = self.conn.read_parquet(path) if is_parquet(path) else self.conn.read_csv(path)
+        # UTF-8 BOM可能残留在第一个列名中
+        renames = [f'{quote(name)} AS {quote(name.lstrip(BOM))}' for name in relation.columns
+                   if name.startswith(BOM)]
+        if renames:
+            excluded = ', '.join(quote(name) for name in relation.columns if name.startswith(BOM))
+            view = self._view()
+            relation = relation.query(view, f"SELECT * EXCLUDE ({excluded}), {', '.join(renames)} FROM {view}")
+        return relation
+
+    def from_pandas(self, data):
+        return self.conn.from_df(data)
+
+    def to_pandas(self, frame):
+        return frame.df()
+
+    def columns(self, frame):
+        return list(frame.columns)
+
+    def _clean_number(self, column, strip, scale=1):
+        text = f'CAST({quote(column)} AS VARCHAR)'
+        for part in strip:
+            text = f"replace({text}, '{part}', '')"
+        return f'coalesce(TRY_CAST({text} AS DOUBLE) * {scale}, 0)'
+
+    def clean(self, frame):
+        names = self.columns(frame)
+        selects = [f'* EXCLUDE ({", ".join(quote(c) for c in DERIVED_COLUMNS)})'
+                   if any(c in names for c in DERIVED_COLUMNS) else '*']
+        for column, source, strip, scale in (('原价_清洗', '原价', PRICE_STRIP, 1), ('现价_清洗', '现价', PRICE_STRIP, 1),
+                                             ('字数_清洗', '字数', WORD_STRIP, 10000)):
+            if column not in names:
+                selects.append(f'{self._clean_number(source, strip, scale)} AS {quote(column)}')
+        view = self._view()
+        frame = frame.query(view, f"SELECT {', '.join(selects)} FROM {view}")
+        # DuckDB除以0得到NULL，这里按pandas的结果补齐：0/0为1，非零/0为±inf
+        view = self._view()
+        return frame.query(view, f'''
+            SELECT *,
+                   CASE WHEN "原价_清洗" = 0 THEN
+                            CASE WHEN "现价_清洗" = 0 THEN 1.0
+                                 WHEN "现价_清洗" > 0 THEN 'inf'::DOUBLE ELSE '-inf'::DOUBLE END
+                        ELSE "现价_清洗"::DOUBLE / "原价_清洗" END AS "折扣率",
+                   "原价_清洗" - "现价_清洗" AS "优惠金额"
+            FROM {view}''')
+
+    def category_counts(self, frame):
+        # first: 首次出现的位置（行号, 行内序号），数量相同的分类按它排序
+        view = self._view()
+        counts = frame.query(view, f'''
+            WITH rows AS (
+                SELECT row_number() OVER () AS row_id, string_split(CAST("分类" AS VARCHAR), '+') AS parts
+                FROM {view} WHERE "分类" IS NOT NULL
+            ),
+            items AS (SELECT row_id, generate_subscripts(parts, 1) AS part_id, unnest(parts) AS part FROM rows)
+            SELECT trim(part) AS "分类", count(*) AS "数量", min(row_id * 10000 + part_id) AS first
+            FROM items GROUP BY trim(part)
+        ''').df()
+        counts['数量'] = counts['数量'].astype(int)
+        return sort_category_counts(counts)
+
+    def _describe(self, column, prefix):
+        condition = f'FILTER (WHERE {quote(column)} > 0)'
+        exprs = [f'count({quote(column)}) {condition} AS {prefix}_count',
+                 f'avg({quote(column)}) {condition} AS {prefix}_mean',
+                 f'stddev_samp({quote(column)}) {condition} AS {prefix}_std',
+                 f'min({quote(column)}) {condition} AS {prefix}_min',
+                 f'max({quote(column)}) {condition} AS {prefix}_max']
+        exprs += [f'quantile_cont({quote(column)}, {q}) {condition} AS {prefix}_q{int(q * 100)}' for q in QUANTILES]
+        return exprs
+
+    def common_metrics(self, frame):
+        view = self._view()
+        both = '"原价_清洗" > 0 AND "现价_清洗" > 0'
+        exprs = (['count(*) AS total']
+                 + self._describe('原价_清洗', 'price') + self._describe('现价_清洗', 'current')
+                 + self._describe('字数_清洗', 'word')
+                 + [f'count(*) FILTER (WHERE {both}) AS discount_count',
+                    f'avg("折扣率") FILTER (WHERE {both}) AS discount_mean',
+                    f'avg("优惠金额") FILTER (WHERE {both}) AS saving_mean',
+                    'min("热度排名") AS rank_min', 'max("热度排名") AS rank_max',
+                    'count(*) FILTER (WHERE "热度排名" <= 100) AS top100',
+                    'count(*) FILTER (WHERE "热度排名" <= 500) AS top500',
+                    f'count(*) FILTER (WHERE "原价_清洗" > (SELECT quantile_cont("原价_清洗", 0.75) FROM {view} '
+                    'WHERE "原价_清洗" > 0)) AS high_price',
+                    f'count(*) FILTER (WHERE "原价_清洗" < (SELECT quantile_cont("原价_清洗", 0.25) FROM {view} '
+                    'WHERE "原价_清洗" > 0)) AS low_price'])
+        result = frame.query(view, f"SELECT {', '.join(exprs)} FROM {view}")
+        return metrics_dict(dict(zip(result.columns, result.fetchone())))
+
+ENGINES = {'pandas': PandasEngine, 'polars': PolarsEngine, 'duckdb': DuckDBEngine}
+
+def get_engine(name='pandas'):
+    """按名称创建引擎；依赖未安装时回退到pandas"""
+    try:
+        return ENGINES[name]()
+    except RuntimeError as e:
+        print(f"{e}，改用pandas引擎")
+        return PandasEngine()
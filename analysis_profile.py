@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+BookDataAnalyzer运行剖析
+功能：
+1. 记录每个分析方法和每张图表的墙钟时间、CPU时间、RSS的变化和进程峰值RSS，开销只有几次系统调用，可在定时任务中常开
+2. 可选tracemalloc：统计每一步Python对象分配的峰值（有一定开销，排查内存问题时再开）
+3. 可选cProfile：保存.prof文件（可用snakeviz、flameprof等工具生成火焰图）并在报告中列出最耗时的函数
+4. 每次运行的剖析结果追加到JSONL文件，便于比较数据增长后各步骤的变化
+"""
+
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# resource模块只在类Unix系统上可用，不可用时不记录RSS
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+# 默认剖析结果文件（每次运行追加一行）
+PROFILE_FILE = 'analysis_profile.jsonl'
+# cProfile报告中列出的函数数
+CPROFILE_TOP = 20
+
+def current_rss_mb():
+    """当前RSS（MB），只在提供/proc/self/statm的系统（Linux）上可用，否则返回None"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+def peak_rss_mb():
+    """进程启动以来的峰值RSS（MB），不可用时返回None；这是整个进程的峰值，不是某一步骤的"""
+    if not RESOURCE_AVAILABLE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux单位为KB，macOS为字节
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+class AnalysisProfiler:
+    def __init__(self, trace_memory=False, cprofile_file=None):
+        """trace_memory: 是否启用tracemalloc；cprofile_file: 给出时用cProfile剖析整个运行并保存到该文件"""
+        self.trace_memory = trace_memory
+        self.cprofile_file = cprofile_file
+        self.steps = []       # 按完成顺序的各步骤记录
+        self._stack = []      # 正在执行的步骤（嵌套调用时外层在前）
+        self._profile = None
+        self._started = None
+
+    def start(self):
+        """开始剖析（run_full_analysis之前调用）"""
+        self._started = (time.perf_counter(), time.process_time())
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.cprofile_file:
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop(self):
+        """结束剖析，保存cProfile结果"""
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self.cprofile_file)
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _fold_traced_peak(self):
+        """把当前tracemalloc峰值计入所有正在执行的步骤，然后重置峰值"""
+        _, peak = tracemalloc.get_traced_memory()
+        for entry in self._stack:
+            entry['traced_peak'] = max(entry['traced_peak'], peak)
+        tracemalloc.reset_peak()
+
+    @contextmanager
+    def step(self, name):
+        """剖析一个步骤；步骤可以嵌套（如generate_report内部调用analyze_common_metrics）"""
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            self._fold_traced_peak()
+        entry = {'name': name, 'depth': len(self._stack), 'traced_peak': 0,
+                 'traced_start': tracemalloc.get_traced_memory()[0] if tracing else 0}
+        self._stack.append(entry)
+        rss = current_rss_mb()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            record = {
+                'name': name,
+                'depth': entry['depth'],
+                'wall_seconds': round(time.perf_counter() - wall, 6),
+                'cpu_seconds': round(time.process_time() - cpu, 6),
+                # 该步骤前后RSS的变化（步骤中分配后又释放的内存不计入，需要时用trace_memory）
+                'rss_delta_mb': None if rss is None else round(current_rss_mb() - rss, 1),
+                # 截至该步骤结束时整个进程的峰值，会继承之前步骤的峰值
+                'process_peak_rss_mb': peak_rss_mb(),
+            }
+            if tracing:
+                self._fold_traced_peak()
+                record['traced_peak_mb'] = round((entry['traced_peak'] - entry['traced_start']) / (1024 * 1024), 3)
+            self._stack.pop()
+            self.steps.append(record)
+
+    def summary(self):
+        """剖析结果字典"""
+        result = {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'pid': os.getpid(),
+            'peak_rss_mb': peak_rss_mb(),
+            'steps': self.steps,
+        }
+        if self._started is not None:
+            result['wall_seconds'] = round(time.perf_counter() - self._started[0], 6)
+            result['cpu_seconds'] = round(time.process_time() - self._started[1], 6)
+        if self.cprofile_file:
+            result['cprofile_file'] = self.cprofile_file
+        return result
+
+    def write(self, path=PROFILE_FILE, **extra):
+        """把本次结果追加为JSONL的一行；extra中的字段（如数据文件、行数）一并写入"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({**extra, **self.summary()}, ensure_ascii=False) + '\n')
+
+    def format_table(self):
+        """便于终端查看的步骤表，嵌套步骤缩进显示"""
+        memory = self.trace_memory
+        header = f"{'步骤':<30}{'墙钟(s)':>10}{'CPU(s)':>10}{'RSS变化(MB)':>13}{'进程峰值RSS(MB)':>15}"
+        lines = [header + (f"{'分配峰值(MB)':>13}" if memory else '')]
+        for step in self.steps:
+            delta = '-' if step['rss_delta_mb'] is None else f"{step['rss_delta_mb']:+.1f}"
+            peak = '-' if step['process_peak_rss_mb'] is None else f"{step['process_peak_rss_mb']:.1f}"
+            line = (f"{'  ' * step['depth'] + step['name']:<32}{step['wall_seconds']:>10.3f}"
+                    f"{step['cpu_seconds']:>10.3f}{delta:>13}{peak:>19}")
+            if memory:
+                line += f"{step.get('traced_peak_mb', 0):>13.2f}"
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def format_cprofile(self, top=CPROFILE_TOP):
+        """cProfile中累计耗时最多的函数"""
+        if self._profile is None:
+            return ''
+        import io
+        import pstats
+        stream = io.StringIO()
+        pstats.Stats(self._profile, stream=stream).sort_stats('cumulative').print_stats(top)
+        return stream.getvalue()
+
+def profiled(method):
+    """BookDataAnalyzer方法的装饰器：分析器设置了profiler时记录该方法的开销，否则直接调用"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        profiler = getattr(self, 'profiler', None)
+        if profiler is None:
+            return method(self, *args, **kwargs)
+        with profiler.step(method.__name__):
+            return method(self, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+豆瓣爬虫与分析离线基准测试
+功能：
+1. 本地HTTP服务回放保存的works-list页面（SAVE_HTML调试文件）和合成封面图片
+2. 测量端到端页面吞吐、单页解析和单本书提取耗时、图片下载吞吐
+3. 在放大的合成数据集(1万~1000万行)上测量BookDataAnalyzer各阶段耗时
+4. 结果追加保存，与上一次运行对比发现性能回退
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 默认的结果文件
+RESULTS_FILE = os.path.join('benchmarks', 'results.jsonl')
+# 默认回放的HTML目录（SAVE_HTML模式保存的 debug_response_selenium_page*.html）
+FIXTURE_PATTERN = 'debug_response*page*.html'
+# 指标变差超过该比例视为回退
+REGRESSION_THRESHOLD = 0.20
+# 每页书籍数
+BOOKS_PER_PAGE = 20
+
+SYNTHETIC_CATEGORIES = [
+    '编程语言', '编程语言 + 软件开发与应用', '人工智能', '市场营销 + 互联网营销',
+    '软件开发与应用', '云计算与大数据', '云计算与大数据 + 人工智能', '网络安全',
+    '移动互联网', '经济 + 人工智能', '办公软件指南', '硬件开发',
+]
+
+def make_synthetic_page(page_num, cover_base):
+    """生成一页与豆瓣works-list结构一致的合成HTML"""
+    items = []
+    for i in range(BOOKS_PER_PAGE):
+        works_id = page_num * 1000 + i
+        category = SYNTHETIC_CATEGORIES[(page_num + i) % len(SYNTHETIC_CATEGORIES)]
+        kind_links = ''.join(f'<a class="kind-link" href="#">{c.strip()}</a>' for c in category.split('+'))
+        intro = f'第{page_num}页第{i + 1}本书的简介。' + '本书系统介绍了相关技术的原理与实践。' * 8
+        items.append(
+            f'<li class="works-item" data-works-id="{works_id}">'
+            f'<div class="cover"><img src="{cover_base}/{works_id}.jpg!s" alt=""></div>'
+            f'<div class="info"><h4 class="title"><a href="/ebook/{works_id}/">'
+            f'<span class="title-text">合成图书{works_id}</span></a></h4>'
+            f'<div class="title">合成图书{works_id}</div>'
+            f'<div class="author"><a class="author-link" href="#">作者{works_id % 97}</a>'
+            f'<a class="author-link" href="#">译者{works_id % 13}</a></div>'
+            f'<a class="intro" href="#">{intro}</a><div class="abstract">{intro}</div>'
+            f'<div class="extra-info"><span>{(works_id % 50) / 2 + 3:.1f} 万字</span>{kind_links}</div>'
+            f'<span class="price-tag"><s class="original-price">{40 + i}.00</s>'
+            f'<span class="discount-price">{30 + i}.50</span></span></div></li>'
+        )
+    return (f'<html><head><title>计算机与互联网 - 豆瓣阅读</title></head><body>'
+            f'<div id="react-root"><ul class="works-list">{"".join(items)}</ul></div></body></html>')
+
+def make_cover_bytes(seed, size=(300, 400)):
+    """生成一张合成封面（Pillow可用时为真实JPEG，否则为带JPEG头的填充数据）"""
+    try:
+        from PIL import Image
+        import numpy as np
+        rng = np.random.RandomState(seed)
+        base = rng.randint(0, 255, size=3)
+        gradient = np.linspace(0, 1, size[1])[:, None, None]
+        pixels = (base * (0.5 + 0.5 * gradient) + rng.randint(0, 30, (size[1], size[0], 3))).clip(0, 255)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels.astype('uint8')).save(buffer, format='JPEG', quality=85)
+        return buffer.getvalue()
+    except ImportError:
+        return b'\xff\xd8\xff\xe0' + bytes(30 * 1024) + b'\xff\xd9'
+
+class FixtureServer:
+    def __init__(self, covers):
+        """covers: 封面字节列表；页面在服务启动后通过set_pages设置"""
+        self.pages = []
+        self.covers = covers
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.base_url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def set_pages(self, pages):
+        """设置回放的HTML列表（按页号循环回放）"""
+        self.pages = [page.encode('utf-8') for page in pages]
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                match = re.search(r'[?&]page=(\d+)', self.path)
+                if self.path.startswith('/category'):
+                    page_num = int(match.group(1)) if match else 1
+                    body = server.pages[(page_num - 1) % len(server.pages)]
+                    content_type = 'text/html; charset=utf-8'
+                elif self.path.startswith('/covers/'):
+                    cover_id = int(re.sub(r'\D', '', self.path.split('/')[-1]) or 0)
+                    body = server.covers[cover_id % len(server.covers)]
+                    content_type = 'image/jpeg'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def load_fixture_pages(fixture_dir, cover_base):
+    """读取保存的页面，并把封面地址改写到本地服务"""
+    paths = sorted(glob.glob(os.path.join(fixture_dir, FIXTURE_PATTERN)))
+    pages = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            html = f.read()
+        counter = iter(range(10 ** 9))
+        html = re.sub(r'(<img[^>]*?\bsrc=")[^"]*(")',
+                      lambda m: f'{m.group(1)}{cover_base}/{next(counter)}.jpg!s{m.group(2)}', html)
+        pages.append(html)
+    return pages, paths
+
+def bench_crawl(server, n_pages, use_selenium=False):
+    """端到端爬取：请求页面、解析、下载封面"""
+    import douban
+    from crawl_metrics import CrawlMetrics
+
+    douban.METRICS = CrawlMetrics()
+    image_dir = tempfile.mkdtemp(prefix='bench_images_')
+    douban.IMAGE_DIR = image_dir
+    driver = douban.init_webdriver() if use_selenium else None
+    books = 0
+    try:
+        start = time.perf_counter()
+        for page_num in range(1, n_pages + 1):
+            url = f'{server.base_url}/category/105?sort=hot&page={page_num}'
+            with contextlib.redirect_stdout(io.StringIO()):
+                if driver:
+                    rows = douban.fetch_book_data_selenium(url, driver, page_num)
+                else:
+                    rows = douban.fetch_book_data(url, page_num, (page_num - 1) * BOOKS_PER_PAGE + 1)
+            books += len(rows or [])
+        elapsed = time.perf_counter() - start
+    finally:
+        if driver:
+            driver.quit()
+        shutil.rmtree(image_dir, ignore_errors=True)
+
+    stages = douban.METRICS.summary()['stages']
+    results = {
+        'crawl.pages_per_sec': n_pages / elapsed,
+        'crawl.books_per_sec': books / elapsed,
+    }
+    for stage in ('parse_html', 'extract_book', 'download_image'):
+        if stage in stages:
+            results[f'crawl.{stage}_ms'] = stages[stage]['mean_seconds'] * 1000
+    return results
+
+def bench_extract(pages, repeat=5):
+    """不经网络直接解析页面：单页解析和单本书提取耗时"""
+    from book_extractor import extract_books
+    from crawl_metrics import CrawlMetrics
+
+    metrics = CrawlMetrics()
+    books = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            books += len(extract_books(page, metrics=metrics))
+    elapsed = time.perf_counter() - start
+
+    stages = metrics.summary()['stages']
+    results = {'extract.pages_per_sec': repeat * len(pages) / elapsed}
+    if books:
+        results['extract.per_book_us'] = elapsed / books * 1e6
+    for stage in ('parse_html', 'extract_book'):
+        if stage in stages:
+            results[f'extract.{stage}_ms'] = stages[stage]['mean_seconds'] * 1000
+    return results
+
+def bench_images(server, n_images):
+    """封面下载吞吐（下载+写盘）"""
+    import douban
+
+    image_dir = tempfile.mkdtemp(prefix='bench_images_')
+    douban.IMAGE_DIR = image_dir
+    try:
+        start = time.perf_counter()
+        for i in range(n_images):
+            douban.download_image(f'{server.base_url}/covers/{i}.jpg', i, f'封面{i}')
+        elapsed = time.perf_counter() - start
+        total_bytes = sum(os.path.getsize(p) for p in glob.glob(os.path.join(image_dir, '*')))
+    finally:
+        shutil.rmtree(image_dir, ignore_errors=True)
+    return {
+        'images.per_sec': n_images / elapsed,
+        'images.mb_per_sec': total_bytes / elapsed / 1024 / 1024,
+    }
+
+def make_synthetic_books(n_rows, seed=0):
+    """生成n_rows行与books.csv结构一致的合成数据"""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.RandomState(seed)
+    ranks = np.arange(1, n_rows + 1)
+    prices = rng.lognormal(3.5, 0.5, n_rows).round(2)
+    discounts = np.where(rng.rand(n_rows) < 0.3, rng.uniform(0.5, 1.0, n_rows), 1.0)
+    words = rng.lognormal(2.5, 0.6, n_rows).round(1)
+    categories = np.array(SYNTHETIC_CATEGORIES, dtype=object)[rng.randint(0, len(SYNTHETIC_CATEGORIES), n_rows)]
+    ids = pd.Series(ranks).astype(str)
+    return pd.DataFrame({
+        '热度排名': ranks,
+        '书名': '合成图书' + ids,
+        '作者': '作者' + (pd.Series(ranks) % 9973).astype(str),
+        '简介': '这是一本关于' + pd.Series(categories) + '的合成图书。',
+        '分类': categories,
+        '字数': pd.Series(words).astype(str) + ' 万字',
+        '原价': '￥' + pd.Series(prices).map('{:.2f}'.format),
+        '现价': '￥' + pd.Series((prices * discounts).round(2)).map('{:.2f}'.format),
+        '封面图片': ids + '_合成图书.jpg',
+    })
+
+def bench_analysis(n_rows):
+    """BookDataAnalyzer各阶段耗时"""
+    from book_analysis import BookDataAnalyzer
+
+    data = make_synthetic_books(n_rows)
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyzer = BookDataAnalyzer(data=data)
+        for stage in ('clean_data', 'analyze_categories', 'analyze_common_metrics'):
+            start = time.perf_counter()
+            getattr(analyzer, stage)()
+            results[f'analysis.{n_rows}.{stage}_sec'] = time.perf_counter() - start
+    return results
+
+def git_commit():
+    """当前代码版本"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+def load_previous(results_file):
+    """读取上一次的基准结果"""
+    if not os.path.exists(results_file):
+        return None
+    with open(results_file, 'r', encoding='utf-8') as f:
+        lines = [line for line in f if line.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+def is_higher_better(name):
+    """吞吐类指标越大越好，耗时类指标越小越好"""
+    return name.endswith('per_sec')
+
+def compare(current, previous, threshold=REGRESSION_THRESHOLD):
+    """与上一次结果对比，返回回退的指标列表"""
+    regressions = []
+    print(f"\n与上次运行对比 ({previous.get('time')}, {previous.get('commit')}):")
+    for name, value in current.items():
+        old = previous['results'].get(name)
+        if not old:
+            continue
+        change = (value - old) / old
+        worse = -change if is_higher_better(name) else change
+        flag = ' <-- 回退' if worse > threshold else ''
+        print(f"  {name:<45}{old:>12.4f} -> {value:>12.4f} ({change:+.1%}){flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='豆瓣爬虫与分析离线基准测试')
+    parser.add_argument('--fixtures', default='.', help='保存的HTML页面目录 (默认: 当前目录)')
+    parser.add_argument('--pages', type=int, default=20, help='端到端回放的页数 (默认: 20)')
+    parser.add_argument('--images', type=int, default=100, help='图片下载测试数量 (默认: 100)')
+    parser.add_argument('--rows', default='10000', help='分析测试的数据规模，逗号分隔 (默认: 10000)')
+    parser.add_argument('--selenium', action='store_true', help='端到端测试使用Selenium浏览器')
+    parser.add_argument('--skip-crawl', action='store_true', help='跳过爬虫相关测试')
+    parser.add_argument('--skip-analysis', action='store_true', help='跳过分析测试')
+    parser.add_argument('--results', default=RESULTS_FILE, help=f'结果文件 (默认: {RESULTS_FILE})')
+    parser.add_argument('--no-save', action='store_true', help='不保存本次结果')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help=f'判定回退的变化比例 (默认: {REGRESSION_THRESHOLD})')
+    args = parser.parse_args()
+
+    results = {}
+    if not args.skip_crawl:
+        covers = [make_cover_bytes(seed) for seed in range(8)]
+        with FixtureServer(covers) as server:
+            cover_base = f'{server.base_url}/covers'
+            pages, paths = load_fixture_pages(args.fixtures, cover_base)
+            if pages:
+                print(f"回放 {len(paths)} 个保存的页面")
+            else:
+                print("未找到保存的页面，使用合成页面")
+                pages = [make_synthetic_page(n, cover_base) for n in range(1, 6)]
+            server.set_pages(pages)
+
+            print(f"直接解析 {len(pages)} 个页面...")
+            results.update(bench_extract(pages))
+            print(f"端到端爬取 {args.pages} 页...")
+            results.update(bench_crawl(server, args.pages, args.selenium))
+            print(f"下载 {args.images} 张封面...")
+            with contextlib.redirect_stdout(io.StringIO()):
+                results.update(bench_images(server, args.images))
+
+    if not args.skip_analysis:
+        for n_rows in (int(n) for n in args.rows.split(',')):
+            print(f"分析 {n_rows} 行合成数据...")
+            results.update(bench_analysis(n_rows))
+
+    print("\n=== 基准测试结果 ===")
+    for name, value in results.items():
+        print(f"  {name:<45}{value:>12.4f}")
+
+    previous = load_previous(args.results)
+    regressions = compare(results, previous, args.threshold) if previous else []
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(args.results) or '.', exist_ok=True)
+        record = {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'results': results,
+        }
+        with open(args.results, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        print(f"\n结果已追加保存至 {args.results}")
+
+    if regressions:
+        print(f"发现 {len(regressions)} 项性能回退")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
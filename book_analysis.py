@@ -8,102 +8,162 @@
 3. 统计其他常用指标（价格、字数、热度等）
 """
 
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from collections import Counter
+import argparse
+import time
 import warnings
 warnings.filterwarnings('ignore')
 
-# 设置中文字体以支持中文显示
-plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei']
-plt.rcParams['axes.unicode_minus'] = False
+from analysis_engines import ENGINES, get_engine
+from analysis_profile import AnalysisProfiler, PROFILE_FILE, profiled
+
+# 输出文件
+CATEGORY_CHART = '图书分类统计.png'
+METRICS_CHART = '图书指标分析.png'
+REPORT_FILE = '豆瓣图书分析报告.txt'
+
+def load_pyplot(show=True):
+    """
+    首次绘图时才导入matplotlib（导入耗时较长，只做统计时不需要），并设置中文字体
+    show=False时使用无界面的Agg后端，没有显示器的定时任务也能保存图表
+    """
+    if not show:
+        import matplotlib
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei']
+    plt.rcParams['axes.unicode_minus'] = False
+    return plt
 
 class BookDataAnalyzer:
-    def __init__(self, csv_file='books.csv'):
-        """初始化分析器"""
+    def __init__(self, csv_file='books.csv', data=None, engine='pandas', profiler=None):
+        """
+        初始化分析器，传入data(DataFrame)时直接使用，不再读取CSV
+        engine: pandas（默认）、polars或duckdb；后两者惰性扫描CSV/Parquet，
+                清洗、分类统计和指标统计不经过pandas，只有绘图和去重时才转换
+        profiler: AnalysisProfiler，给出时记录各分析方法和图表的耗时与内存
+        """
         self.csv_file = csv_file
-        self.data = None
-        self.load_data()
+        self.profiler = profiler
+        self.engine = get_engine(engine)
+        self.frame = None     # 引擎自己的数据表示（pandas引擎即DataFrame）
+        self._data = None
+        self.metrics = None
+        if data is not None:
+            self.data = data
+        else:
+            self.load_data()
+
+    @property
+    def data(self):
+        """pandas DataFrame形式的数据（惰性引擎在首次访问时才转换）"""
+        if self._data is None and self.frame is not None:
+            self._data = self.engine.to_pandas(self.frame)
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self.frame = None if value is None else self.engine.from_pandas(value)
         
+    @profiled
     def load_data(self):
-        """加载数据"""
+        """加载数据（CSV或Parquet）"""
         try:
-            self.data = pd.read_csv(self.csv_file, encoding='utf-8')
-            print(f"成功加载数据，共 {len(self.data)} 条记录")
-            print(f"数据列名: {list(self.data.columns)}")
+            self.frame = self.engine.scan(self.csv_file)
+            if self.engine.lazy:
+                print(f"已用 {self.engine.name} 引擎扫描数据文件（惰性执行）")
+            else:
+                print(f"成功加载数据，共 {len(self.frame)} 条记录")
+            print(f"数据列名: {self.engine.columns(self.frame)}")
         except Exception as e:
             print(f"加载数据失败: {e}")
             
+    @profiled
     def clean_data(self):
-        """清洗数据"""
-        if self.data is None:
+        """清洗数据：解析价格、字数，计算折扣率和优惠金额"""
+        if self.frame is None:
             return
-            
-        # 清洗价格数据
-        def clean_price(price_str):
-            if pd.isna(price_str):
-                return 0
-            # 移除￥符号和空格
-            price_str = str(price_str).replace('￥', '').replace(' ', '')
-            try:
-                return float(price_str)
-            except:
-                return 0
-        
-        # 清洗字数数据
-        def clean_word_count(word_str):
-            if pd.isna(word_str):
-                return 0
-            # 提取数字部分
-            word_str = str(word_str).replace('万字', '').replace(' ', '')
-            try:
-                return float(word_str) * 10000  # 转换为实际字数
-            except:
-                return 0
-        
-        self.data['原价_清洗'] = self.data['原价'].apply(clean_price)
-        self.data['现价_清洗'] = self.data['现价'].apply(clean_price)
-        self.data['字数_清洗'] = self.data['字数'].apply(clean_word_count)
-        
-        # 计算折扣率
-        self.data['折扣率'] = (self.data['现价_清洗'] / self.data['原价_清洗']).fillna(1)
-        self.data['优惠金额'] = self.data['原价_清洗'] - self.data['现价_清洗']
-        
+        self.frame = self.engine.clean(self.frame)
+        self._data = None
         print("数据清洗完成")
         
+    @profiled
+    def deduplicate_editions(self, threshold=None):
+        """
+        去除近似重复的图书（同一作品的不同版本、译本），每组只保留热度排名最高的一本
+        threshold: 相似度阈值（默认book_dedup.DEFAULT_THRESHOLD，与book_dedup.py命令行相同）
+        """
+        if self.frame is None:
+            return
+        # book_dedup依赖numpy，去重时才导入
+        from book_dedup import find_duplicate_clusters, DEFAULT_THRESHOLD
+
+        if threshold is None:
+            threshold = DEFAULT_THRESHOLD
+        clusters = find_duplicate_clusters(self.data['书名'].tolist(),
+                                           self.data['作者'].tolist(),
+                                           self.data['简介'].tolist(),
+                                           threshold=threshold)
+        ranks = self.data['热度排名'].to_numpy()
+        drop_positions = []
+        self.duplicate_clusters = []
+        for members in clusters:
+            members = sorted(members, key=lambda i: ranks[i])
+            self.duplicate_clusters.append(self.data.iloc[members][['热度排名', '书名', '作者']])
+            drop_positions.extend(members[1:])
+
+        self.data = self.data.drop(index=self.data.index[drop_positions]).reset_index(drop=True)
+        # 数据变了，之前的统计结果作废
+        self.metrics = None
+        if hasattr(self, 'category_stats'):
+            del self.category_stats
+        print(f"近似重复检测完成: 发现 {len(clusters)} 组重复图书，移除 {len(drop_positions)} 条记录")
+        return self.duplicate_clusters
+
+    @profiled
     def analyze_categories(self):
-        """分析图书分类"""
-        if self.data is None:
+        """分析图书分类（有些书有多个分类，用+分隔；数量相同时按首次出现顺序）"""
+        if self.frame is None:
             return
             
-        # 处理分类数据，有些书可能有多个分类，用+分隔
-        all_categories = []
-        for category in self.data['分类'].dropna():
-            # 按+号分割多个分类
-            cats = [cat.strip() for cat in str(category).split('+')]
-            all_categories.extend(cats)
-        
-        # 统计各分类的数量
-        category_counts = Counter(all_categories)
-        
-        # 转换为DataFrame便于分析
-        self.category_stats = pd.DataFrame([
-            {'分类': cat, '数量': count} 
-            for cat, count in category_counts.items()
-        ]).sort_values('数量', ascending=False)
+        self.category_stats = self.engine.category_counts(self.frame)
         
         print("\n=== 分类统计结果 ===")
         print(self.category_stats.head(20))
         
         return self.category_stats
+
+    @profiled
+    def analyze_category_keywords(self, index_file=None, top_k=5):
+        """
+        各分类简介的TF-IDF关键词：用当前数据增量更新关键词索引（只对新增或简介变化的图书分词），
+        再给分类统计加上关键词列；index_file默认为category_keywords.KEYWORD_INDEX_FILE
+        """
+        if self.frame is None:
+            return
+        from category_keywords import KEYWORD_INDEX_FILE, load_keyword_index, annotate_categories
+
+        index_file = index_file or KEYWORD_INDEX_FILE
+        index = load_keyword_index(index_file)
+        stats = index.update(self.data[['书名', '作者', '简介', '分类']].to_dict('records'))
+        if stats['added'] or stats['updated']:
+            index.save(index_file)
+        print(f"\n关键词索引: 新分词 {stats['added'] + stats['updated']} 本, 沿用 {stats['unchanged']} 本")
+
+        category_stats = self.category_stats if hasattr(self, 'category_stats') else self.analyze_categories()
+        self.category_stats = annotate_categories(category_stats, index, top_k)
+        print("\n=== 分类关键词 ===")
+        for _, row in self.category_stats.head(20).iterrows():
+            print(f"{row['分类']}: {row['关键词']}")
+        return self.category_stats
     
-    def visualize_categories(self, top_n=15):
-        """可视化分类统计"""
+    @profiled
+    def visualize_categories(self, top_n=15, output=CATEGORY_CHART, show=True):
+        """可视化分类统计，show=False时只保存图片不弹出窗口（适合定时任务）"""
         if not hasattr(self, 'category_stats'):
             self.analyze_categories()
             
+        plt = load_pyplot(show)
         # 创建图表，增大图表尺寸和间距
         fig, axes = plt.subplots(2, 2, figsize=(24, 18))
         fig.suptitle('豆瓣图书分类统计分析', fontsize=22, fontweight='bold', y=0.98)
@@ -170,22 +230,27 @@ class BookDataAnalyzer:
         # 调整子图间距，防止重叠
         plt.subplots_adjust(left=0.08, bottom=0.08, right=0.95, top=0.92, 
                            wspace=0.25, hspace=0.35)
-        plt.savefig('图书分类统计.png', dpi=300, bbox_inches='tight', 
+        plt.savefig(output, dpi=300, bbox_inches='tight', 
                    facecolor='white', edgecolor='none')
-        plt.show()
+        if show:
+            plt.show()
+        else:
+            plt.close(fig)
         
+    @profiled
     def analyze_common_metrics(self):
-        """分析其他常用指标"""
-        if self.data is None:
+        """分析其他常用指标（单遍流式统计，结果缓存在self.metrics供报告复用）"""
+        if self.frame is None:
             return
+        self.metrics = metrics = self.engine.common_metrics(self.frame)
             
         print("\n=== 基础统计信息 ===")
-        print(f"总图书数量: {len(self.data)}")
-        print(f"有价格信息的图书: {(self.data['原价_清洗'] > 0).sum()}")
-        print(f"有字数信息的图书: {(self.data['字数_清洗'] > 0).sum()}")
+        print(f"总图书数量: {metrics['total_books']}")
+        print(f"有价格信息的图书: {metrics['priced_books']}")
+        print(f"有字数信息的图书: {metrics['worded_books']}")
         
         # 价格统计
-        price_stats = self.data[self.data['原价_清洗'] > 0]['原价_清洗'].describe()
+        price_stats = metrics['price_stats']
         print("\n=== 价格统计 (原价) ===")
         print(f"平均价格: ￥{price_stats['mean']:.2f}")
         print(f"价格中位数: ￥{price_stats['50%']:.2f}")
@@ -194,23 +259,21 @@ class BookDataAnalyzer:
         print(f"价格标准差: ￥{price_stats['std']:.2f}")
         
         # 现价统计
-        current_price_stats = self.data[self.data['现价_清洗'] > 0]['现价_清洗'].describe()
+        current_price_stats = metrics['current_price_stats']
         print("\n=== 价格统计 (现价) ===")
         print(f"平均现价: ￥{current_price_stats['mean']:.2f}")
         print(f"现价中位数: ￥{current_price_stats['50%']:.2f}")
         
         # 折扣统计
-        discount_data = self.data[(self.data['原价_清洗'] > 0) & (self.data['现价_清洗'] > 0)]
-        if len(discount_data) > 0:
-            avg_discount = discount_data['折扣率'].mean()
+        if metrics['discount_books'] > 0:
+            avg_discount = metrics['mean_discount_rate']
             print(f"\n=== 折扣统计 ===")
             print(f"平均折扣率: {avg_discount:.2f} ({avg_discount*100:.1f}%)")
-            print(f"平均优惠金额: ￥{discount_data['优惠金额'].mean():.2f}")
+            print(f"平均优惠金额: ￥{metrics['mean_saving']:.2f}")
             
         # 字数统计
-        word_data = self.data[self.data['字数_清洗'] > 0]
-        if len(word_data) > 0:
-            word_stats = word_data['字数_清洗'].describe()
+        word_stats = metrics['word_stats']
+        if word_stats is not None:
             print("\n=== 字数统计 ===")
             print(f"平均字数: {word_stats['mean']:.0f} 字")
             print(f"字数中位数: {word_stats['50%']:.0f} 字")
@@ -219,19 +282,17 @@ class BookDataAnalyzer:
         
         # 热度排名统计
         print("\n=== 热度排名统计 ===")
-        print(f"排名范围: {self.data['热度排名'].min()} - {self.data['热度排名'].max()}")
-        print(f"前100名图书数: {(self.data['热度排名'] <= 100).sum()}")
-        print(f"前500名图书数: {(self.data['热度排名'] <= 500).sum()}")
-        
-        return {
-            'price_stats': price_stats,
-            'current_price_stats': current_price_stats,
-            'word_stats': word_stats if len(word_data) > 0 else None,
-            'total_books': len(self.data)
-        }
+        print(f"排名范围: {metrics['rank_min']:.0f} - {metrics['rank_max']:.0f}")
+        print(f"前100名图书数: {metrics['top100_books']}")
+        print(f"前500名图书数: {metrics['top500_books']}")
+        
+        return metrics
     
-    def visualize_metrics(self):
-        """可视化各项指标"""
+    @profiled
+    def visualize_metrics(self, output=METRICS_CHART, show=True):
+        """可视化各项指标，show=False时只保存图片不弹出窗口（适合定时任务）"""
+        import numpy as np
+        plt = load_pyplot(show)
         fig, axes = plt.subplots(2, 3, figsize=(28, 20))
         fig.suptitle('豆瓣图书各项指标分析', fontsize=24, fontweight='bold', y=0.98)
         
@@ -322,21 +383,23 @@ class BookDataAnalyzer:
         # 调整子图间距，防止重叠
         plt.subplots_adjust(left=0.06, bottom=0.06, right=0.96, top=0.92,
                            wspace=0.25, hspace=0.35)
-        plt.savefig('图书指标分析.png', dpi=300, bbox_inches='tight',
+        plt.savefig(output, dpi=300, bbox_inches='tight',
                    facecolor='white', edgecolor='none')
-        plt.show()
+        if show:
+            plt.show()
+        else:
+            plt.close(fig)
     
-    def generate_report(self):
+    @profiled
+    def generate_report(self, report_file=REPORT_FILE):
         """生成分析报告"""
         print("\n" + "="*60)
         print("豆瓣图书数据分析报告")
         print("="*60)
         
-        # 基础统计
-        metrics = self.analyze_common_metrics()
-        
-        # 分类统计
-        category_stats = self.analyze_categories()
+        # 基础统计和分类统计：已分析过时直接复用，不再重新计算
+        metrics = self.metrics if self.metrics is not None else self.analyze_common_metrics()
+        category_stats = self.category_stats if hasattr(self, 'category_stats') else self.analyze_categories()
         
         print(f"\n=== 分类洞察 ===")
         print(f"总分类数: {len(category_stats)}")
@@ -346,65 +409,108 @@ class BookDataAnalyzer:
         # 价格洞察
         if metrics['price_stats'] is not None:
             print(f"\n=== 价格洞察 ===")
-            high_price_books = (self.data['原价_清洗'] > metrics['price_stats']['75%']).sum()
-            low_price_books = (self.data['原价_清洗'] < metrics['price_stats']['25%']).sum()
-            print(f"高价图书数量 (>75%分位数): {high_price_books}")
-            print(f"低价图书数量 (<25%分位数): {low_price_books}")
+            print(f"高价图书数量 (>75%分位数): {metrics['high_price_books']}")
+            print(f"低价图书数量 (<25%分位数): {metrics['low_price_books']}")
         
         # 保存详细报告到文件
-        with open('豆瓣图书分析报告.txt', 'w', encoding='utf-8') as f:
+        with open(report_file, 'w', encoding='utf-8') as f:
             f.write("豆瓣图书数据分析报告\n")
             f.write("="*60 + "\n\n")
-            f.write(f"分析时间: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write(f"分析时间: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
             f.write(f"数据文件: {self.csv_file}\n")
-            f.write(f"总图书数: {len(self.data)}\n\n")
+            f.write(f"总图书数: {metrics['total_books']}\n\n")
             
             # 分类统计写入文件
             f.write("分类统计 (Top 20):\n")
             f.write("-" * 30 + "\n")
             for _, row in category_stats.head(20).iterrows():
-                f.write(f"{row['分类']}: {row['数量']}本\n")
+                keywords = f"  关键词: {row['关键词']}" if '关键词' in category_stats.columns else ''
+                f.write(f"{row['分类']}: {row['数量']}本{keywords}\n")
             
-        print(f"\n详细报告已保存至: 豆瓣图书分析报告.txt")
+        print(f"\n详细报告已保存至: {report_file}")
         
-    def run_full_analysis(self):
-        """运行完整分析"""
+    def run_full_analysis(self, dedup=False, charts=True, show=True, keywords=False, keyword_index=None):
+        """
+        运行完整分析，dedup=True时先去除近似重复的图书，charts=False时不生成图表，
+        keywords=True时为各分类提取简介关键词（keyword_index: 关键词索引文件）
+        """
         print("开始豆瓣图书数据分析...")
         
         # 数据清洗
         self.clean_data()
         
+        # 去除同一作品的多个版本，避免分类统计重复计数
+        if dedup:
+            self.deduplicate_editions()
+        
         # 分类分析
         self.analyze_categories()
+        if keywords:
+            self.analyze_category_keywords(keyword_index)
         
         # 指标分析
         self.analyze_common_metrics()
         
         # 生成可视化图表
-        print("\n正在生成分类统计图表...")
-        self.visualize_categories()
-        
-        print("正在生成指标分析图表...")
-        self.visualize_metrics()
+        if charts:
+            print("\n正在生成分类统计图表...")
+            self.visualize_categories(show=show)
+            
+            print("正在生成指标分析图表...")
+            self.visualize_metrics(show=show)
         
         # 生成报告
         self.generate_report()
         
         print("\n分析完成！生成的文件:")
-        print("- 图书分类统计.png")
-        print("- 图书指标分析.png") 
-        print("- 豆瓣图书分析报告.txt")
+        if charts:
+            print(f"- {CATEGORY_CHART}")
+            print(f"- {METRICS_CHART}")
+        print(f"- {REPORT_FILE}")
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='豆瓣图书数据分析与可视化')
+    parser.add_argument('--csv', default='books.csv', help='数据文件 (默认: books.csv)')
+    parser.add_argument('--dedup', action='store_true', help='分析前去除近似重复的图书')
+    parser.add_argument('--no-charts', action='store_true', help='只输出统计和报告，不生成图表')
+    parser.add_argument('--no-show', action='store_true', help='只保存图表，不弹出窗口')
+    parser.add_argument('--engine', choices=list(ENGINES), default='pandas',
+                        help='数据处理引擎，polars/duckdb惰性执行并支持Parquet (默认: pandas)')
+    parser.add_argument('--keywords', action='store_true', help='为各分类提取简介中的TF-IDF关键词（写入报告）')
+    parser.add_argument('--keyword-index', help='关键词索引文件，跨次运行增量更新 (默认: category_keywords.pkl)')
+    parser.add_argument('--profile', action='store_true', help='记录各步骤的墙钟时间、CPU时间和峰值内存')
+    parser.add_argument('--profile-output', default=PROFILE_FILE, help=f'剖析结果文件，每次运行追加一行 (默认: {PROFILE_FILE})')
+    parser.add_argument('--profile-memory', action='store_true', help='剖析时用tracemalloc统计各步骤的分配峰值（较慢）')
+    parser.add_argument('--cprofile', metavar='FILE', help='剖析时同时用cProfile记录函数调用并保存到FILE（如analysis.prof）')
+    args = parser.parse_args()
+
+    profiler = None
+    if args.profile or args.profile_memory or args.cprofile:
+        profiler = AnalysisProfiler(trace_memory=args.profile_memory, cprofile_file=args.cprofile)
+        profiler.start()
+
     # 创建分析器实例
-    analyzer = BookDataAnalyzer('books.csv')
+    analyzer = BookDataAnalyzer(args.csv, engine=args.engine, profiler=profiler)
     
     # 运行完整分析
-    analyzer.run_full_analysis()
+    analyzer.run_full_analysis(dedup=args.dedup, charts=not args.no_charts, show=not args.no_show,
+                               keywords=args.keywords, keyword_index=args.keyword_index)
+
+    if profiler is not None:
+        profiler.stop()
+        print("\n=== 运行剖析 ===")
+        print(profiler.format_table())
+        if args.cprofile:
+            print(profiler.format_cprofile())
+            print(f"cProfile结果已保存至: {args.cprofile}")
+        profiler.write(args.profile_output, csv_file=args.csv, engine=analyzer.engine.name,
+                       rows=analyzer.metrics['total_books'] if analyzer.metrics else None)
+        print(f"剖析结果已追加至: {args.profile_output}")
     
     # 可以单独运行某个分析功能
     # analyzer.clean_data()
+    # analyzer.deduplicate_editions()
     # analyzer.analyze_categories()
     # analyzer.visualize_categories(top_n=20)
     # analyzer.analyze_common_metrics()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+豆瓣图书近似重复检测（不同版本、译本）
+功能：
+1. 对简介做字符shingle，计算MinHash签名
+2. LSH分桶查找候选对，避免两两比较
+3. 结合规范化后的书名/作者确认，输出重复图书簇
+"""
+
+import argparse
+import zlib
+
+import numpy as np
+
+from book_text import normalize_text, normalize_title, normalize_author, PUNCT_RE
+
+# MinHash参数
+NUM_PERM = 128
+# LSH分桶：BANDS * ROWS 必须等于 NUM_PERM
+LSH_BANDS = 16
+# 简介shingle长度（字符）
+SHINGLE_SIZE = 3
+# 判定为近似重复的Jaccard相似度阈值
+DEFAULT_THRESHOLD = 0.8
+# 简介过短时不参与MinHash比较
+MIN_INTRO_LENGTH = 20
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+def intro_shingles(intro):
+    """
+    简介的字符shingle集合（去除标点和空白后切分），返回32位哈希数组
+    """
+    if intro is None or (isinstance(intro, float) and np.isnan(intro)):
+        return None
+    text = PUNCT_RE.sub('', normalize_text(intro))
+    # 去掉爬虫截断时添加的省略号
+    text = text.rstrip('.')
+    if len(text) < MIN_INTRO_LENGTH or text == '无简介信息':
+        return None
+    shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    return np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles),
+                       dtype=np.uint64, count=len(shingles))
+
+class MinHasher:
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        """生成固定的随机哈希函数参数 (a*x + b) mod p"""
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, hashes):
+        """计算一组shingle哈希的MinHash签名"""
+        # (num_shingles, num_perm) 一次性向量化计算
+        values = (np.outer(hashes, self.a) + self.b) % MERSENNE_PRIME & MAX_HASH
+        return values.min(axis=0)
+
+class UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, x):
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, x, y):
+        root_x, root_y = self.find(x), self.find(y)
+        if root_x != root_y:
+            self.parent[max(root_x, root_y)] = min(root_x, root_y)
+
+def titles_related(title_a, title_b):
+    """
+    判断两个规范化书名是否可能是同一作品（相同或相互包含）
+    """
+    if not title_a or not title_b:
+        return True
+    return title_a in title_b or title_b in title_a
+
+def find_duplicate_clusters(titles, authors, intros, threshold=DEFAULT_THRESHOLD,
+                            num_perm=NUM_PERM, bands=LSH_BANDS):
+    """
+    查找近似重复的图书
+    titles/authors/intros: 等长序列
+    返回: 重复簇列表，每个簇是按位置排序的行号列表（只返回大小>1的簇）
+    """
+    if num_perm % bands != 0:
+        raise ValueError("num_perm 必须能被 bands 整除")
+    rows = num_perm // bands
+    n = len(titles)
+    uf = UnionFind(n)
+
+    # 1. 书名+作者规范化后完全相同的视为同一作品
+    norm_titles = [normalize_title(title) for title in titles]
+    exact_keys = {}
+    for i, (title, author) in enumerate(zip(norm_titles, authors)):
+        key = (title, normalize_author(author))
+        if not title:
+            continue
+        if key in exact_keys:
+            uf.union(exact_keys[key], i)
+        else:
+            exact_keys[key] = i
+
+    # 2. 简介MinHash + LSH分桶
+    hasher = MinHasher(num_perm)
+    signatures = {}
+    buckets = {}
+    for i, intro in enumerate(intros):
+        hashes = intro_shingles(intro)
+        if hashes is None:
+            continue
+        sig = hasher.signature(hashes)
+        signatures[i] = sig
+        for band in range(bands):
+            key = (band, sig[band * rows:(band + 1) * rows].tobytes())
+            buckets.setdefault(key, []).append(i)
+
+    # 3. 同桶内的候选对用完整签名估算Jaccard相似度，并要求书名相互包含
+    #    （同一出版社的"C#从入门到精通"和"C++从入门到精通"简介几乎相同，但不是同一作品）
+    checked = set()
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                pair = (members[x], members[y])
+                if pair in checked or uf.find(pair[0]) == uf.find(pair[1]):
+                    continue
+                checked.add(pair)
+                similarity = np.mean(signatures[pair[0]] == signatures[pair[1]])
+                if similarity >= threshold and titles_related(norm_titles[pair[0]],
+                                                              norm_titles[pair[1]]):
+                    uf.union(*pair)
+
+    clusters = {}
+    for i in range(n):
+        clusters.setdefault(uf.find(i), []).append(i)
+    return [members for members in clusters.values() if len(members) > 1]
+
+def main():
+    """主函数"""
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description='豆瓣图书近似重复检测')
+    parser.add_argument('--csv', default='books.csv', help='数据文件 (默认: books.csv)')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'相似度阈值 (默认: {DEFAULT_THRESHOLD})')
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.csv, encoding='utf-8-sig')
+    clusters = find_duplicate_clusters(data['书名'].tolist(), data['作者'].tolist(),
+                                       data['简介'].tolist(), args.threshold)
+
+    print(f"共 {len(data)} 本书，发现 {len(clusters)} 组重复图书")
+    for members in clusters:
+        print("-" * 40)
+        for i in members:
+            row = data.iloc[i]
+            print(f"[{row['热度排名']}] {row['书名']} - {row['作者']}")
+
+if __name__ == "__main__":
+    main()
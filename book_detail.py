@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+豆瓣图书详情页补全
+功能：
+1. 抓取每本书的详情页，补全完整简介、出版社、评分和准确字数
+2. 有界线程池并发抓取，配合全局限速
+3. 按作品ID缓存到本地，已补全的书不会重复抓取
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from bs4 import BeautifulSoup
+
+import douban
+from douban import debug_print, HEADERS
+from crawl_orchestrator import RateLimiter
+from book_record import Book, parse_word_count
+
+# 详情页地址
+DETAIL_URL = "https://read.douban.com/ebook/{works_id}/"
+# 本地缓存文件
+CACHE_FILE = 'detail_cache.json'
+# 默认并发数和限速（每秒请求数）
+DEFAULT_WORKERS = 4
+DEFAULT_RATE = 1.0
+# 补全后新增的CSV字段
+ENRICH_FIELDS = ['出版社', '评分']
+
+WORD_COUNT_RE = re.compile(r'(\d+(?:\.\d+)?)\s*万?字')
+RATING_RE = re.compile(r'\d+(?:\.\d+)?')
+
+class DetailCache:
+    def __init__(self, cache_file=CACHE_FILE):
+        """作品ID -> 详情字典，保存为JSON"""
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                print(f"读取详情缓存失败，将重新抓取: {e}")
+
+    def get(self, works_id):
+        with self._lock:
+            return self.entries.get(str(works_id))
+
+    def put(self, works_id, detail):
+        with self._lock:
+            self.entries[str(works_id)] = detail
+
+    def save(self):
+        """先写临时文件再替换，避免中断时损坏缓存"""
+        with self._lock:
+            tmp_file = self.cache_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(tmp_file, self.cache_file)
+
+def find_labeled_value(soup, label):
+    """查找"出版社：xxx"这类标签后的值"""
+    label_elem = soup.find(string=re.compile(label))
+    if not label_elem:
+        return None
+    # 值可能在同一个文本节点里，也可能在相邻元素中
+    text = label_elem.split('：', 1)[-1].split(':', 1)[-1].strip()
+    if text and text != label_elem.strip():
+        return text
+    parent = label_elem.parent
+    sibling = parent.find_next_sibling() if parent else None
+    if sibling:
+        return sibling.get_text(strip=True) or None
+    return None
+
+def parse_detail_page(html_content):
+    """从详情页HTML中提取完整简介、出版社、评分和字数"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    detail = {}
+
+    # 结构化数据优先
+    for script in soup.find_all('script', type='application/ld+json'):
+        try:
+            data = json.loads(script.string or '')
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            detail.setdefault('简介', data.get('description'))
+            publisher = data.get('publisher')
+            if isinstance(publisher, dict):
+                publisher = publisher.get('name')
+            detail.setdefault('出版社', publisher)
+            rating = data.get('aggregateRating')
+            if isinstance(rating, dict):
+                detail.setdefault('评分', rating.get('ratingValue'))
+
+    if not detail.get('简介'):
+        intro_elem = (soup.find(itemprop='description')
+                      or soup.find(class_=re.compile(r'(article-profile-intro|book-intro|intro)')))
+        if intro_elem:
+            detail['简介'] = intro_elem.get_text('\n', strip=True)
+        else:
+            meta = soup.find('meta', attrs={'name': 'description'})
+            detail['简介'] = meta.get('content') if meta else None
+
+    if not detail.get('出版社'):
+        detail['出版社'] = find_labeled_value(soup, '出版社') or find_labeled_value(soup, '提供方')
+
+    if not detail.get('评分'):
+        score_elem = soup.find(itemprop='ratingValue') or soup.find(class_=re.compile(r'score'))
+        if score_elem:
+            match = RATING_RE.search(score_elem.get('content') or score_elem.get_text(strip=True))
+            detail['评分'] = match.group(0) if match else None
+
+    word_text = find_labeled_value(soup, '字数')
+    if word_text:
+        word_text = word_text.replace(',', '')
+        match = WORD_COUNT_RE.search(word_text)
+        if match:
+            words = float(match.group(1))
+            # 保存准确的整数字数，写CSV时才格式化为列表页的"x.x 万字"
+            if '万' in word_text:
+                words = words * 10000
+            detail['字数'] = int(round(words))
+
+    return {key: value for key, value in detail.items() if value}
+
+def fetch_detail(works_id, session, limiter):
+    """抓取并解析一本书的详情页"""
+    url = DETAIL_URL.format(works_id=works_id)
+    limiter.acquire()
+    with douban.METRICS.timer('detail_get'):
+        response = session.get(url, headers=HEADERS, timeout=10)
+        response.raise_for_status()
+    douban.METRICS.add_bytes('detail_html', len(response.content))
+    with douban.METRICS.timer('detail_parse'):
+        # 传入原始字节，由BeautifulSoup按页面声明的编码解码
+        return parse_detail_page(response.content)
+
+def merge_detail(book, detail):
+    """把详情合并到Book（原地修改）：简介取更完整的版本，详情页有字数时取代列表页四舍五入的字数"""
+    full_intro = detail.get('简介')
+    if full_intro and len(full_intro) >= len((book.intro or '').rstrip('.')):
+        book.intro = full_intro
+    word_count = detail.get('字数')
+    # 旧版缓存中的字数是"x.x 万字"文本
+    if isinstance(word_count, str):
+        word_count = parse_word_count(word_count)
+    if word_count is not None:
+        book.word_count = word_count
+    book.publisher = detail.get('出版社')
+    book.rating = detail.get('评分')
+    return book
+
+def enrich_books(books, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, cache_file=CACHE_FILE):
+    """
+    补全Book列表的详情（原地修改），返回同一列表
+    已在缓存中的作品ID直接使用缓存，不再请求
+    """
+    cache = DetailCache(cache_file)
+    limiter = RateLimiter(rate)
+    works_ids = {str(book.works_id) for book in books if book.works_id}
+    pending = sorted(works_id for works_id in works_ids if cache.get(works_id) is None)
+    print(f" 详情补全: 共 {len(works_ids)} 个作品，缓存命中 {len(works_ids) - len(pending)} 个，"
+          f"需抓取 {len(pending)} 个")
+
+    if pending:
+        session = requests.Session()
+        failed = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(fetch_detail, works_id, session, limiter): works_id
+                       for works_id in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                works_id = futures[future]
+                try:
+                    detail = future.result()
+                    detail['抓取时间'] = time.strftime('%Y-%m-%d %H:%M:%S')
+                    cache.put(works_id, detail)
+                except Exception as e:
+                    failed += 1
+                    douban.METRICS.inc('detail_failures')
+                    debug_print(f"作品 {works_id} 详情抓取失败: {e}", "ERROR")
+                # 定期落盘，中断后已抓取的详情不会丢失
+                if done % 50 == 0:
+                    cache.save()
+        cache.save()
+        if failed:
+            print(f" {failed} 本书详情抓取失败，下次运行时会重试")
+
+    return [merge_detail(book, cache.get(book.works_id) or {}) for book in books]
+
+def main():
+    """主函数：补全已有CSV中的书籍详情"""
+    parser = argparse.ArgumentParser(description='豆瓣图书详情页补全')
+    parser.add_argument('--csv', default=douban.CSV_FILE, help=f'数据文件 (默认: {douban.CSV_FILE})')
+    parser.add_argument('--output', help='输出文件 (默认: 覆盖输入文件)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help=f'并发数 (默认: {DEFAULT_WORKERS})')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help=f'每秒请求数 (默认: {DEFAULT_RATE})')
+    parser.add_argument('--cache', default=CACHE_FILE, help=f'缓存文件 (默认: {CACHE_FILE})')
+    parser.add_argument('--debug', action='store_true', help='开启调试模式')
+    args = parser.parse_args()
+
+    douban.DEBUG_MODE = args.debug
+    with open(args.csv, 'r', newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        fieldnames = reader.fieldnames
+        books = [Book.from_row(row) for row in reader]
+    if '作品ID' not in fieldnames:
+        print(" 错误：CSV中没有作品ID字段，请用新版爬虫重新爬取")
+        return
+
+    books = enrich_books(books, args.workers, args.rate, args.cache)
+    fieldnames = fieldnames + [field for field in ENRICH_FIELDS if field not in fieldnames]
+    output = args.output or args.csv
+    douban.save_to_csv(books, output, fieldnames)
+    print(f" 已保存 {len(books)} 本书到 {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+豆瓣读书列表页统一解析
+功能：
+1. Selenium和requests两种模式共用的书籍信息提取逻辑
+2. 字段选择器在导入时编译成(标签名, class)查找表，每本书只遍历一次子节点；价格、字数正则同样在导入时编译
+3. 只解析works-list部分（SoupStrainer），跳过页面其余内容
+4. 从列表页的分页栏或作品总数读取总页数（不看works-list中的简介），爬虫据此不再抓取不存在的页面
+"""
+
+import re
+import time
+
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+
+from book_record import Book, parse_price, parse_word_count
+
+# 每页书籍数（用于计算热度排名）
+BOOKS_PER_PAGE = 20
+# 简介最大长度
+INTRO_MAX_LEN = 2000
+# 多个作者的分隔符
+AUTHOR_SEPARATOR = ' / '
+
+# 只保留works-list列表，其余内容不建树
+WORKS_LIST_STRAINER = SoupStrainer('ul', class_='works-list')
+
+# 字段选择器：(标签名, class) -> 字段名，导入时编译成查找表
+# 每本书只遍历一次子节点，按查找表分发，不必对每个字段分别搜索整棵子树
+FIELD_SELECTORS = {
+    ('h4', 'title'): 'title_box',
+    ('span', 'title-text'): 'title_text',
+    ('div', 'title'): 'title_div',
+    ('div', 'author'): 'author_box',
+    ('a', 'author-link'): 'author_link',
+    ('a', 'intro'): 'intro',
+    ('div', 'abstract'): 'abstract',
+    ('div', 'extra-info'): 'extra_info',
+    ('span', 'price-tag'): 'price',
+    ('s', 'original-price'): 'original_price',
+    ('span', 'discount-price'): 'discount_price',
+    ('a', 'kind-link'): 'kind_link',
+}
+# 不看class、只按标签名收集的字段
+TAG_SELECTORS = {'img': 'img', 'a': 'link'}
+
+WORKS_ID_RE = re.compile(r'/ebook/(\d+)')
+
+# works-list的起始标签，以及用于匹配其结束位置的ul标签
+WORKS_LIST_OPEN_RE = re.compile(r'<ul\b[^>]*\bclass\s*=\s*["\'][^"\']*\bworks-list\b', re.I)
+UL_TAG_RE = re.compile(r'<(/?)ul\b[^>]*>', re.I)
+# 作品总数，如"共 1,234 部作品"（数字前后可能夹着标签）
+TOTAL_COUNT_RE = re.compile(r'共\s*(?:<[^>]*>\s*)*([\d,]+)\s*(?:<[^>]*>\s*)*(?:部|本|个|条)')
+# 分页栏：只解析class含pagination/paginator的元素
+PAGINATION_STRAINER = SoupStrainer(class_=re.compile(r'paginat'))
+PAGE_PARAM_RE = re.compile(r'[?&]page=(\d+)')
+
+def parse_works_list(html_content):
+    """解析页面中的works-list，返回book li元素列表（没有列表时返回空列表）"""
+    soup = BeautifulSoup(html_content, 'html.parser', parse_only=WORKS_LIST_STRAINER)
+    items = soup.find_all('li')
+    # 优先取带data-works-id的实际书籍，排除loading skeleton
+    return [item for item in items if item.has_attr('data-works-id')] or items
+
+def strip_works_list(html_content):
+    """去掉页面中的works-list（书籍简介里的"共3个部分"之类不能当作作品总数）"""
+    parts = []
+    pos = 0
+    for match in WORKS_LIST_OPEN_RE.finditer(html_content):
+        if match.start() < pos:
+            continue
+        parts.append(html_content[pos:match.start()])
+        # 按ul的嵌套层数找到对应的结束标签；没有结束标签时丢弃其后全部内容
+        depth, pos = 0, len(html_content)
+        for tag in UL_TAG_RE.finditer(html_content, match.start()):
+            depth += -1 if tag.group(1) else 1
+            if depth == 0:
+                pos = tag.end()
+                break
+    parts.append(html_content[pos:])
+    return ''.join(parts)
+
+def parse_page_count(html_content, books_per_page=BOOKS_PER_PAGE):
+    """
+    从列表页读取总页数：优先取分页栏中最大的页码，其次按作品总数计算；都没有时返回None
+    只查看works-list之外的内容
+    """
+    html_content = strip_works_list(html_content)
+    soup = BeautifulSoup(html_content, 'html.parser', parse_only=PAGINATION_STRAINER)
+    pages = [int(text) for text in soup.stripped_strings if text.isdigit()]
+    for link in soup.find_all('a', href=True):
+        match = PAGE_PARAM_RE.search(link['href'])
+        if match:
+            pages.append(int(match.group(1)))
+    if pages:
+        return max(pages)
+
+    match = TOTAL_COUNT_RE.search(html_content)
+    if match:
+        total = int(match.group(1).replace(',', ''))
+        return max(1, -(-total // books_per_page))
+    return None
+
+def collect_fields(item):
+    """一次遍历book li的所有子节点，返回 字段名 -> 元素列表（文档顺序）"""
+    fields = {}
+    for node in item.descendants:
+        if not isinstance(node, Tag):
+            continue
+        name = node.name
+        field = TAG_SELECTORS.get(name)
+        if field:
+            fields.setdefault(field, []).append(node)
+        for cls in node.get('class') or ():
+            field = FIELD_SELECTORS.get((name, cls))
+            if field:
+                fields.setdefault(field, []).append(node)
+    return fields
+
+def first_text(fields, *names):
+    """按顺序尝试多个字段，返回第一个存在的元素文本"""
+    for name in names:
+        if name in fields:
+            return fields[name][0].get_text(strip=True)
+    return None
+
+def extract_book(item, ranking):
+    """
+    从单个book li元素中提取信息
+    返回 (Book, 封面原图URL)，没有书名时返回None
+    """
+    fields = collect_fields(item)
+    title = first_text(fields, 'title_text', 'title_box', 'title_div')
+    if not title:
+        return None
+
+    if 'author_link' in fields:
+        author = AUTHOR_SEPARATOR.join(link.get_text(strip=True) for link in fields['author_link'])
+    elif 'author_box' in fields:
+        author_box = fields['author_box'][0]
+        links = [link.get_text(strip=True) for link in author_box.find_all('a')]
+        author = AUTHOR_SEPARATOR.join(links) if links else author_box.get_text(strip=True)
+    else:
+        author = "未知作者"
+
+    intro = first_text(fields, 'intro', 'abstract') or "无简介信息"
+    if len(intro) > INTRO_MAX_LEN:
+        intro = intro[:INTRO_MAX_LEN] + "..."
+
+    word_count = None
+    spans = [span for extra_info in fields.get('extra_info', ()) for span in extra_info.find_all('span')]
+    for span in spans:
+        text = span.get_text(strip=True)
+        if '万字' in text:
+            word_count = parse_word_count(text)
+            break
+
+    original_price = current_price = None
+    if 'price' in fields:
+        if 'original_price' in fields and 'discount_price' in fields:
+            # 有打折，存在原价和现价
+            original_price = parse_price(first_text(fields, 'original_price'))
+            current_price = parse_price(first_text(fields, 'discount_price'))
+        else:
+            # 没有打折，只有一个价格
+            original_price = current_price = parse_price(first_text(fields, 'price'))
+
+    categories = [link.get_text(strip=True) for link in fields.get('kind_link', ())]
+    category_str = " + ".join(c for c in categories if c) or "未分类"
+
+    # 作品ID：优先取data-works-id属性，其次从详情页链接中解析
+    works_id = item.get('data-works-id', '')
+    if not works_id:
+        for link in fields.get('link', ()):
+            match = WORKS_ID_RE.search(link.get('href', ''))
+            if match:
+                works_id = match.group(1)
+                break
+
+    cover_url = None
+    for img in fields.get('img', ()):
+        if img.get('src'):
+            # 去掉缩略图参数，获取原图
+            cover_url = img['src'].split('!')[0]
+            break
+
+    book = Book(
+        rank=ranking,
+        title=title,
+        author=author,
+        intro=intro,
+        category=category_str,
+        word_count=word_count,
+        original_price=original_price,
+        current_price=current_price,
+        works_id=works_id,
+    )
+    return book, cover_url
+
+def extract_books(html_content, start_rank=1, metrics=None, on_error=None):
+    """
+    解析一页HTML，返回 [(Book, 封面原图URL), ...]
+    metrics: CrawlMetrics（可选），记录parse_html、extract_book耗时和计数
+    on_error: 单本书提取出错时的回调 (序号, 异常)
+    """
+    start = time.perf_counter()
+    items = parse_works_list(html_content)
+    if metrics:
+        metrics.observe('parse_html', time.perf_counter() - start)
+
+    results = []
+    for i, item in enumerate(items):
+        item_start = time.perf_counter()
+        try:
+            extracted = extract_book(item, start_rank + i)
+        except Exception as e:
+            if metrics:
+                metrics.inc('book_errors')
+            if on_error:
+                on_error(i, e)
+            continue
+        if metrics:
+            metrics.observe('extract_book', time.perf_counter() - item_start)
+        if extracted:
+            results.append(extracted)
+    return results
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+爬虫流水线中的图书记录
+功能：
+1. 基于__slots__的Book记录，两种爬取模式和所有输出共用
+2. 提取时即把价格、字数解析为数值，分类字符串做驻留(intern)
+3. 转换为CSV行（保持原有文本格式）或带数值列的DataFrame记录
+"""
+
+import re
+import sys
+
+PRICE_RE = re.compile(r'\d+(?:\.\d+)?')
+WORD_COUNT_RE = re.compile(r'(\d+(?:\.\d+)?)\s*万字')
+
+# 缺失值在CSV中的写法
+UNKNOWN = '未知'
+
+def parse_price(text):
+    """从"￥48.30"、"48.30"等文本中解析价格，无法解析时返回None"""
+    if text is None:
+        return None
+    match = PRICE_RE.search(str(text).replace(',', ''))
+    return float(match.group(0)) if match else None
+
+def parse_word_count(text):
+    """从"8.1 万字"中解析实际字数，无法解析时返回None"""
+    if text is None:
+        return None
+    match = WORD_COUNT_RE.search(str(text))
+    return int(round(float(match.group(1)) * 10000)) if match else None
+
+def intern_category(category):
+    """驻留分类字符串（大量图书共享少数几种分类组合）"""
+    return sys.intern(category) if category else category
+
+class Book:
+    __slots__ = ('rank', 'title', 'author', 'intro', 'category', 'word_count',
+                 'original_price', 'current_price', 'cover', 'works_id',
+                 'publisher', 'rating', 'category_id', 'sort')
+
+    # CSV字段名 -> 属性名
+    FIELD_ATTRS = {
+        '热度排名': 'rank',
+        '书名': 'title',
+        '作者': 'author',
+        '简介': 'intro',
+        '分类': 'category',
+        '字数': 'word_count',
+        '原价': 'original_price',
+        '现价': 'current_price',
+        '封面图片': 'cover',
+        '作品ID': 'works_id',
+        '出版社': 'publisher',
+        '评分': 'rating',
+        '分类ID': 'category_id',
+        '排序': 'sort',
+    }
+
+    def __init__(self, rank, title, author, intro, category, word_count=None,
+                 original_price=None, current_price=None, cover=None, works_id='',
+                 publisher=None, rating=None, category_id=None, sort=None):
+        """价格为浮点数、字数为整数，缺失时为None"""
+        self.rank = rank
+        self.title = title
+        self.author = author
+        self.intro = intro
+        self.category = intern_category(category)
+        self.word_count = word_count
+        self.original_price = original_price
+        self.current_price = current_price
+        self.cover = cover
+        self.works_id = works_id
+        self.publisher = publisher
+        self.rating = rating
+        self.category_id = category_id
+        self.sort = sort
+
+    def __repr__(self):
+        return f"Book(rank={self.rank!r}, title={self.title!r})"
+
+    @property
+    def categories(self):
+        """分类列表（多个分类用+分隔）"""
+        return [intern_category(c.strip()) for c in self.category.split('+')] if self.category else []
+
+    def to_row(self):
+        """转换为CSV行，价格和字数保持"￥48.30"、"8.1 万字"的原有格式"""
+        row = {
+            '热度排名': self.rank,
+            '书名': self.title,
+            '作者': self.author,
+            '简介': self.intro,
+            '分类': self.category,
+            '字数': f"{self.word_count / 10000:.1f} 万字" if self.word_count is not None else UNKNOWN,
+            '原价': f"￥{self.original_price:.2f}" if self.original_price is not None else UNKNOWN,
+            '现价': f"￥{self.current_price:.2f}" if self.current_price is not None else UNKNOWN,
+            '封面图片': self.cover or '未下载',
+            '作品ID': self.works_id or '',
+        }
+        for field in ('出版社', '评分', '分类ID', '排序'):
+            value = getattr(self, self.FIELD_ATTRS[field])
+            row[field] = '' if value is None else value
+        return row
+
+    def to_record(self):
+        """转换为分析用记录，附带已解析的数值列（缺失为0，与clean_data一致）"""
+        record = self.to_row()
+        record['原价_清洗'] = self.original_price or 0.0
+        record['现价_清洗'] = self.current_price or 0.0
+        record['字数_清洗'] = float(self.word_count or 0)
+        return record
+
+    @classmethod
+    def from_row(cls, row):
+        """从CSV行（字典）还原Book"""
+        rank = row.get('热度排名')
+        try:
+            rank = int(rank)
+        except (TypeError, ValueError):
+            pass
+        return cls(
+            rank=rank,
+            title=row.get('书名'),
+            author=row.get('作者'),
+            intro=row.get('简介'),
+            category=row.get('分类'),
+            word_count=parse_word_count(row.get('字数')),
+            original_price=parse_price(row.get('原价')),
+            current_price=parse_price(row.get('现价')),
+            cover=row.get('封面图片') if row.get('封面图片') != '未下载' else None,
+            works_id=row.get('作品ID') or '',
+            publisher=row.get('出版社') or None,
+            rating=row.get('评分') or None,
+            category_id=row.get('分类ID') or None,
+            sort=row.get('排序') or None,
+        )
+
+def books_to_frame(books):
+    """把Book列表转换为DataFrame（已包含数值列，BookDataAnalyzer.clean_data无需再解析）"""
+    import pandas as pd
+    return pd.DataFrame([book.to_record() for book in books])
@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+豆瓣图书全文检索
+功能：
+1. 基于书名、作者、分类、简介建立倒排索引（中文二元组 / jieba分词）
+2. 索引持久化到磁盘，新一轮爬取后增量更新
+3. 关键词查询，BM25相关度与热度排名混合排序
+"""
+
+import argparse
+import csv
+import hashlib
+import heapq
+import math
+import os
+import time
+
+from book_text import tokenize, query_tokens, book_key, JIEBA_AVAILABLE
+from index_store import save_index, load_index
+
+# 索引文件路径
+INDEX_FILE = 'books_index.pkl'
+# 索引格式版本，结构变化时递增
+INDEX_VERSION = 1
+# 各字段权重（书名命中比简介命中更重要）
+FIELD_WEIGHTS = {
+    '书名': 3.0,
+    '作者': 2.0,
+    '分类': 1.5,
+    '简介': 1.0,
+}
+# BM25参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+# 热度排名在最终得分中的权重
+RANK_WEIGHT = 0.3
+
+def rank_score(ranking):
+    """
+    热度排名得分：第1名为1.0，排名越靠后得分越低
+    """
+    try:
+        ranking = int(ranking)
+    except (TypeError, ValueError):
+        return 0.0
+    if ranking < 1:
+        return 0.0
+    return 1.0 / math.log2(ranking + 1)
+
+class BookSearchIndex:
+    def __init__(self, mode='bigram'):
+        """初始化空索引"""
+        if mode == 'jieba' and not JIEBA_AVAILABLE:
+            print("jieba不可用，改用二元组分词")
+            mode = 'bigram'
+        self.mode = mode
+        self.docs = {}          # doc_id -> 书籍展示字段
+        self.key_to_id = {}     # 书名|作者 -> doc_id
+        self.doc_hash = {}      # doc_id -> 索引字段的内容摘要
+        self.doc_terms = {}     # doc_id -> 词列表，删除/更新时使用
+        self.doc_len = {}       # doc_id -> 加权文档长度
+        self.postings = {}      # 词 -> {doc_id: 加权词频}
+        self.total_len = 0.0
+        self.next_id = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _analyze(self, row):
+        """将一本书的各字段分词并按字段权重累加词频"""
+        terms = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            value = row.get(field)
+            if not value:
+                continue
+            for token in tokenize(value, self.mode):
+                terms[token] = terms.get(token, 0.0) + weight
+        return terms
+
+    @staticmethod
+    def _content_hash(row):
+        """索引字段的内容摘要，用于判断书籍内容是否变化"""
+        content = '\x1f'.join(str(row.get(field) or '') for field in FIELD_WEIGHTS)
+        return hashlib.md5(content.encode('utf-8')).hexdigest()
+
+    def remove_book(self, key):
+        """从索引中删除一本书"""
+        doc_id = self.key_to_id.pop(key, None)
+        if doc_id is None:
+            return False
+        for term in self.doc_terms.pop(doc_id):
+            posting = self.postings[term]
+            del posting[doc_id]
+            if not posting:
+                del self.postings[term]
+        self.total_len -= self.doc_len.pop(doc_id)
+        del self.docs[doc_id]
+        del self.doc_hash[doc_id]
+        return True
+
+    def add_book(self, row):
+        """
+        添加或更新一本书
+        返回: added / updated / unchanged
+        """
+        key = book_key(row.get('书名'), row.get('作者'))
+        content_hash = self._content_hash(row)
+        doc_id = self.key_to_id.get(key)
+
+        if doc_id is not None and self.doc_hash[doc_id] == content_hash:
+            # 内容未变化，只刷新热度排名等展示字段
+            self.docs[doc_id]['热度排名'] = row.get('热度排名')
+            return 'unchanged'
+
+        status = 'added'
+        if doc_id is not None:
+            self.remove_book(key)
+            status = 'updated'
+
+        doc_id = self.next_id
+        self.next_id += 1
+        terms = self._analyze(row)
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        length = sum(terms.values())
+
+        self.key_to_id[key] = doc_id
+        self.doc_hash[doc_id] = content_hash
+        self.doc_terms[doc_id] = list(terms)
+        self.doc_len[doc_id] = length
+        self.total_len += length
+        self.docs[doc_id] = {
+            '热度排名': row.get('热度排名'),
+            '书名': row.get('书名'),
+            '作者': row.get('作者'),
+            '分类': row.get('分类'),
+        }
+        return status
+
+    def update_from_csv(self, csv_file):
+        """
+        从爬虫输出的CSV增量更新索引
+        不在本次CSV中的书（已下榜）仍可检索，但清除其热度排名，不再参与排名加权；清除的数量记为unranked
+        """
+        stats = {'added': 0, 'updated': 0, 'unchanged': 0, 'unranked': 0}
+        seen = set()
+        with open(csv_file, 'r', newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                # 同一批次中重复出现的书只保留排名靠前的一条
+                key = book_key(row.get('书名'), row.get('作者'))
+                if key in seen:
+                    continue
+                seen.add(key)
+                stats[self.add_book(row)] += 1
+        for key, doc_id in self.key_to_id.items():
+            doc = self.docs[doc_id]
+            if key not in seen and doc['热度排名'] is not None:
+                doc['热度排名'] = None
+                stats['unranked'] += 1
+        return stats
+
+    def search(self, query, limit=10, rank_weight=RANK_WEIGHT):
+        """
+        检索书籍，所有查询词都需命中
+        返回按得分降序排列的书籍列表
+        """
+        terms = query_tokens(query, self.mode)
+        if not terms or not self.docs:
+            return []
+
+        postings = [self.postings.get(term) for term in terms]
+        if not all(postings):
+            return []
+
+        # 从最短的倒排表开始求交集
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+
+        n_docs = len(self.docs)
+        avg_len = self.total_len / n_docs
+        idfs = [math.log(1 + (n_docs - len(p) + 0.5) / (len(p) + 0.5)) for p in postings]
+
+        def score(doc_id):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[doc_id] / avg_len)
+            text_score = 0.0
+            for idf, posting in zip(idfs, postings):
+                tf = posting[doc_id]
+                text_score += idf * tf * (BM25_K1 + 1) / (tf + norm)
+            return text_score * (1 + rank_weight * rank_score(self.docs[doc_id]['热度排名']))
+
+        top = heapq.nlargest(limit, ((score(doc_id), doc_id) for doc_id in candidates))
+        return [dict(self.docs[doc_id], 得分=round(s, 4)) for s, doc_id in top]
+
+    def save(self, index_file=INDEX_FILE):
+        """保存索引到磁盘（先写临时文件再替换，避免中断时损坏索引）"""
+        save_index(self, index_file, INDEX_VERSION)
+
+    @classmethod
+    def load(cls, index_file=INDEX_FILE):
+        """从磁盘加载索引"""
+        return load_index(cls, index_file, INDEX_VERSION)
+
+def update_index(csv_file, index_file=INDEX_FILE, mode='bigram'):
+    """
+    用新爬取的CSV增量更新磁盘上的索引（索引不存在时新建）
+    """
+    if os.path.exists(index_file):
+        try:
+            index = BookSearchIndex.load(index_file)
+        except Exception as e:
+            print(f"加载索引失败，将重新建立: {e}")
+            index = BookSearchIndex(mode)
+    else:
+        index = BookSearchIndex(mode)
+
+    stats = index.update_from_csv(csv_file)
+    index.save(index_file)
+    print(f"索引更新完成: 新增 {stats['added']} 本, 更新 {stats['updated']} 本, "
+          f"未变化 {stats['unchanged']} 本, 下榜清除排名 {stats['unranked']} 本, 索引共 {len(index)} 本")
+    return index
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='豆瓣图书全文检索')
+    parser.add_argument('--index', default=INDEX_FILE, help=f'索引文件 (默认: {INDEX_FILE})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='从CSV重新建立索引')
+    build_parser.add_argument('--csv', default='books.csv', help='数据文件 (默认: books.csv)')
+    build_parser.add_argument('--jieba', action='store_true', help='使用jieba分词')
+
+    update_parser = subparsers.add_parser('update', help='用新的CSV增量更新索引')
+    update_parser.add_argument('--csv', default='books.csv', help='数据文件 (默认: books.csv)')
+
+    query_parser = subparsers.add_parser('query', help='检索书籍')
+    query_parser.add_argument('keywords', help='查询关键词')
+    query_parser.add_argument('-n', '--limit', type=int, default=10, help='返回结果数 (默认: 10)')
+    query_parser.add_argument('--rank-weight', type=float, default=RANK_WEIGHT,
+                              help=f'热度排名权重 (默认: {RANK_WEIGHT})')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        index = BookSearchIndex('jieba' if args.jieba else 'bigram')
+        stats = index.update_from_csv(args.csv)
+        index.save(args.index)
+        print(f"索引建立完成，共 {stats['added']} 本书，{len(index.postings)} 个词项")
+    elif args.command == 'update':
+        update_index(args.csv, args.index)
+    elif args.command == 'query':
+        index = BookSearchIndex.load(args.index)
+        start = time.perf_counter()
+        results = index.search(args.keywords, args.limit, args.rank_weight)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"找到 {len(results)} 条结果 (耗时 {elapsed:.3f} ms)")
+        for book in results:
+            print(f"[{book['热度排名'] or '-'}] {book['书名']} - {book['作者']} "
+                  f"({book['分类']}) 得分: {book['得分']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+图书数据只读HTTP查询服务
+功能：
+1. 把最新的books.csv载入内存索引：按热度排名排列的数组、按现价排序的数组（二分查找范围）和 分类 -> 图书编号 的映射
+2. GET /books 按分类、排名范围、价格范围过滤，按排名或价格排序，分页返回JSON；
+   /books/<排名> 单本书，/categories 分类列表，/status 服务状态
+3. 响应按LRU缓存，重复查询直接返回缓存的JSON
+4. 后台线程监视CSV文件，新一轮爬取写完后在后台建好新索引再整体替换，
+   正在处理的请求继续使用旧索引，不会中断
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from book_record import Book
+
+# 默认数据文件和监听地址
+CSV_FILE = 'books.csv'
+HOST = '127.0.0.1'
+PORT = 8000
+# 每页默认和最多返回的图书数
+PER_PAGE = 20
+MAX_PER_PAGE = 100
+# 响应缓存条目数
+CACHE_SIZE = 1024
+# 检查数据文件是否更新的间隔（秒）；文件大小和修改时间连续两次相同才重新加载，避免读到写了一半的CSV
+RELOAD_INTERVAL = 2.0
+# /books支持的排序方式
+SORTS = ('rank', 'price', '-price')
+# 索引版本号（缓存键的一部分）
+SNAPSHOT_VERSIONS = itertools.count(1)
+
+def book_json(book):
+    """一本书的JSON记录"""
+    return {
+        'rank': book.rank, 'title': book.title, 'author': book.author, 'intro': book.intro,
+        'category': book.category, 'categories': book.categories, 'word_count': book.word_count,
+        'original_price': book.original_price, 'current_price': book.current_price,
+        'cover': book.cover, 'works_id': book.works_id or None, 'publisher': book.publisher,
+        'rating': book.rating, 'category_id': book.category_id, 'sort': book.sort,
+    }
+
+def file_signature(path):
+    """文件的 (修改时间, 大小)，不存在时返回None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+class BookSnapshot:
+    def __init__(self, books, source=None, signature=None):
+        """由Book列表建立不可变的查询索引；图书编号即按热度排名排列后的位置"""
+        self.books = sorted(books, key=lambda book: book.rank if isinstance(book.rank, int) else float('inf'))
+        self.records = [book_json(book) for book in self.books]
+        self.source = source
+        self.signature = signature
+        self.loaded_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        self.version = next(SNAPSHOT_VERSIONS)
+        # 热度排名（缺失为inf，排在最后），已按升序排列
+        self.ranks = np.array([book.rank if isinstance(book.rank, int) else np.inf for book in self.books],
+                              dtype=np.float64)
+        # 现价（缺失为nan）及按现价升序的图书编号，nan排在最后
+        self.prices = np.array([np.nan if book.current_price is None else book.current_price for book in self.books],
+                               dtype=np.float64)
+        self.price_order = np.argsort(self.prices, kind='stable')
+        self.sorted_prices = self.prices[self.price_order]
+        # 分类 -> 图书编号（升序即按排名）
+        categories = {}
+        for book_id, book in enumerate(self.books):
+            for category in book.categories:
+                if category:
+                    categories.setdefault(category, []).append(book_id)
+        self.categories = {category: np.array(ids, dtype=np.int64) for category, ids in categories.items()}
+
+    @classmethod
+    def load(cls, csv_file):
+        """读取CSV建立索引（先记录文件签名，加载期间文件又被改写时下一轮会再次加载）"""
+        signature = file_signature(csv_file)
+        with open(csv_file, 'r', encoding='utf-8-sig', newline='') as f:
+            books = [Book.from_row(row) for row in csv.DictReader(f)]
+        return cls(books, csv_file, signature)
+
+    def __len__(self):
+        return len(self.books)
+
+    def find_rank(self, rank):
+        """按热度排名查找图书编号"""
+        position = int(np.searchsorted(self.ranks, rank))
+        return position if position < len(self.ranks) and self.ranks[position] == rank else None
+
+    def query(self, categories=(), rank_min=None, rank_max=None, price_min=None, price_max=None, sort='rank'):
+        """过滤并排序，返回图书编号数组；多个分类之间为"或"，不同条件之间为"且" """
+        candidates = None
+        if rank_min is not None or rank_max is not None:
+            lo = 0 if rank_min is None else np.searchsorted(self.ranks, rank_min, 'left')
+            hi = len(self.ranks) if rank_max is None else np.searchsorted(self.ranks, rank_max, 'right')
+            candidates = np.arange(lo, hi)
+        if price_min is not None or price_max is not None:
+            valid = len(self.sorted_prices) - int(np.isnan(self.sorted_prices).sum())
+            lo = 0 if price_min is None else np.searchsorted(self.sorted_prices[:valid], price_min, 'left')
+            hi = valid if price_max is None else np.searchsorted(self.sorted_prices[:valid], price_max, 'right')
+            ids = np.sort(self.price_order[lo:hi])
+            candidates = ids if candidates is None else np.intersect1d(candidates, ids, assume_unique=True)
+        if categories:
+            parts = [self.categories.get(category, np.empty(0, dtype=np.int64)) for category in categories]
+            ids = parts[0] if len(parts) == 1 else np.unique(np.concatenate(parts))
+            candidates = ids if candidates is None else np.intersect1d(candidates, ids, assume_unique=True)
+        if candidates is None:
+            candidates = np.arange(len(self.books))
+        if sort == 'price':
+            candidates = candidates[np.argsort(self.prices[candidates], kind='stable')]
+        elif sort == '-price':
+            candidates = candidates[np.argsort(-self.prices[candidates], kind='stable')]
+        return candidates
+
+    def category_counts(self):
+        """[(分类, 图书数), ...]，按图书数降序"""
+        return sorted(((category, len(ids)) for category, ids in self.categories.items()),
+                      key=lambda item: -item[1])
+
+class ResponseCache:
+    def __init__(self, max_size=CACHE_SIZE):
+        """线程安全的LRU缓存：键 -> 响应正文"""
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            body = self._items.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = body
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._items), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses}
+
+class QueryError(ValueError):
+    """请求参数错误（返回400）"""
+
+def int_param(params, name, default=None, minimum=None):
+    values = params.get(name)
+    if not values or values[-1] == '':
+        return default
+    try:
+        value = int(values[-1])
+    except ValueError:
+        raise QueryError(f"参数 {name} 应为整数")
+    if minimum is not None and value < minimum:
+        raise QueryError(f"参数 {name} 不能小于 {minimum}")
+    return value
+
+def float_param(params, name):
+    values = params.get(name)
+    if not values or values[-1] == '':
+        return None
+    try:
+        return float(values[-1])
+    except ValueError:
+        raise QueryError(f"参数 {name} 应为数字")
+
+class BookService:
+    def __init__(self, csv_file=CSV_FILE, cache_size=CACHE_SIZE, reload_interval=RELOAD_INTERVAL):
+        """加载数据并准备缓存；reload_interval为0时不监视文件"""
+        self.csv_file = csv_file
+        self.cache = ResponseCache(cache_size)
+        self.reload_interval = reload_interval
+        self.reloads = 0
+        self.snapshot = BookSnapshot.load(csv_file)
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def reload(self):
+        """重新加载数据文件：新索引建好后整体替换，替换前后到达的请求分别使用旧、新索引"""
+        snapshot = BookSnapshot.load(self.csv_file)
+        self.snapshot = snapshot
+        self.cache.clear()
+        self.reloads += 1
+        print(f" 已重新加载 {self.csv_file}: {len(snapshot)} 本书")
+
+    def _watch(self):
+        pending = None
+        while not self._stop.wait(self.reload_interval):
+            signature = file_signature(self.csv_file)
+            if signature is None or signature == self.snapshot.signature:
+                pending = None
+                continue
+            # 文件还在变化（爬虫正在写入）时等下一轮
+            if signature != pending:
+                pending = signature
+                continue
+            try:
+                self.reload()
+            except Exception as e:
+                print(f" 重新加载失败，继续使用旧数据: {e}")
+            pending = None
+
+    def start_watcher(self):
+        if self.reload_interval > 0 and self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name='csv-watcher', daemon=True)
+            self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def handle(self, path, query):
+        """处理一个GET请求，返回 (状态码, JSON正文bytes, 是否命中缓存)"""
+        snapshot = self.snapshot
+        params = parse_qs(query)
+        # 参数顺序不影响缓存命中；键中带上索引版本，替换数据后旧条目不会被误用
+        key = (snapshot.version, path, tuple(sorted((name, tuple(values)) for name, values in params.items())))
+        body = self.cache.get(key)
+        if body is not None:
+            return 200, body, True
+        try:
+            status, payload = self.route(snapshot, path, params)
+        except QueryError as e:
+            status, payload = 400, {'error': str(e)}
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        # /status是实时状态，不缓存
+        if status == 200 and path != '/status':
+            self.cache.put(key, body)
+        return status, body, False
+
+    def route(self, snapshot, path, params):
+        """返回 (状态码, 可JSON序列化的结果)"""
+        path = path.rstrip('/') or '/'
+        if path == '/books':
+            return 200, self.list_books(snapshot, params)
+        if path.startswith('/books/'):
+            try:
+                rank = int(path[len('/books/'):])
+            except ValueError:
+                raise QueryError("排名应为整数")
+            book_id = snapshot.find_rank(rank)
+            if book_id is None:
+                return 404, {'error': f"没有热度排名为 {rank} 的图书"}
+            return 200, snapshot.records[book_id]
+        if path == '/categories':
+            return 200, [{'category': category, 'count': count} for category, count in snapshot.category_counts()]
+        if path == '/status':
+            return 200, {'source': snapshot.source, 'books': len(snapshot), 'version': snapshot.version,
+                         'loaded_at': snapshot.loaded_at,
+                         'reloads': self.reloads, 'cache': self.cache.stats()}
+        return 404, {'error': '未知路径，可用: /books, /books/<排名>, /categories, /status'}
+
+    def list_books(self, snapshot, params):
+        sort = params.get('sort', ['rank'])[-1]
+        if sort not in SORTS:
+            raise QueryError(f"sort 应为 {', '.join(SORTS)} 之一")
+        page = int_param(params, 'page', 1, minimum=1)
+        per_page = min(int_param(params, 'per_page', PER_PAGE, minimum=1), MAX_PER_PAGE)
+        ids = snapshot.query(
+            categories=[c.strip() for value in params.get('category', []) for c in value.split(',') if c.strip()],
+            rank_min=int_param(params, 'rank_min'), rank_max=int_param(params, 'rank_max'),
+            price_min=float_param(params, 'price_min'), price_max=float_param(params, 'price_max'),
+            sort=sort)
+        start = (page - 1) * per_page
+        return {
+            'total': len(ids), 'page': page, 'per_page': per_page,
+            'pages': -(-len(ids) // per_page),
+            'books': [snapshot.records[book_id] for book_id in ids[start:start + per_page]],
+        }
+
+class BookRequestHandler(BaseHTTPRequestHandler):
+    """把GET请求交给server.service处理"""
+    access_log = False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        status, body, cached = self.server.service.handle(url.path, url.query)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Cache', 'hit' if cached else 'miss')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.access_log:
+            super().log_message(format, *args)
+
+def make_server(service, host=HOST, port=PORT, access_log=False):
+    """创建多线程HTTP服务器（每个请求一个线程）"""
+    handler = type('Handler', (BookRequestHandler,), {'access_log': access_log})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='图书数据只读HTTP查询服务')
+    parser.add_argument('--csv', default=CSV_FILE, help=f'数据文件，更新后自动重新加载 (默认: {CSV_FILE})')
+    parser.add_argument('--host', default=HOST, help=f'监听地址 (默认: {HOST})')
+    parser.add_argument('--port', type=int, default=PORT, help=f'端口 (默认: {PORT})')
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help=f'响应缓存条目数，0为不缓存 (默认: {CACHE_SIZE})')
+    parser.add_argument('--reload-interval', type=float, default=RELOAD_INTERVAL,
+                        help=f'检查数据文件更新的间隔秒数，0为不自动重新加载 (默认: {RELOAD_INTERVAL})')
+    parser.add_argument('--access-log', action='store_true', help='输出每个请求的访问日志')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    service = BookService(args.csv, args.cache_size, args.reload_interval)
+    print(f" 已加载 {args.csv}: {len(service.snapshot)} 本书，{len(service.snapshot.categories)} 个分类，"
+          f"耗时 {time.perf_counter() - start:.2f} 秒")
+    service.start_watcher()
+    server = make_server(service, args.host, args.port, args.access_log)
+    print(f" 服务地址 http://{args.host}:{args.port}/books （Ctrl+C 停止）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop_watcher()
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+豆瓣图书相似推荐
+功能：
+1. 简介+分类的TF-IDF特征（特征哈希到2^18维，稀疏矩阵保存，去掉IDF很低的常见词）
+2. 封面图片的感知哈希(dHash)和颜色直方图特征
+3. 特征矩阵持久化，暴力余弦检索返回K本最相似的图书
+"""
+
+import argparse
+import os
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+import scipy.sparse as sp
+
+from book_text import tokenize
+from image_archive import ImageArchive
+
+# 尝试导入Pillow，如果不可用则只使用文本特征
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# 特征文件路径
+FEATURE_FILE = 'book_features.npz'
+# 图片存储目录（与douban.py一致）
+IMAGE_DIR = 'images'
+# 文本特征哈希后的维度（稀疏存储，维度足够大时哈希冲突可以忽略）
+TEXT_DIM = 2 ** 18
+# 出现在超过该比例图书中的词IDF很低，对区分图书没有帮助，不作为文本特征
+MAX_DF_RATIO = 0.2
+# 颜色直方图每个通道的分箱数（总维度为其立方）
+HIST_BINS = 4
+# 各类特征在相似度中的权重
+TEXT_WEIGHT = 0.6
+HASH_WEIGHT = 0.15
+HIST_WEIGHT = 0.25
+# 分类词在文本特征中的额外权重
+CATEGORY_WEIGHT = 3.0
+# 每批处理的图书数，限制中间矩阵的内存占用
+BATCH_SIZE = 1024
+
+def l2_normalize(matrix):
+    """按行做L2归一化，全零行保持为零"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+def l2_normalize_sparse(matrix):
+    """稀疏矩阵按行做L2归一化，全零行保持为零"""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return (sp.diags(1 / norms) @ matrix).tocsr().astype(np.float32)
+
+def book_terms(intro, category):
+    """简介与分类的词项列表（简介取二元组和英文单词，分类整体作为一个词）"""
+    terms = [t for t in tokenize(intro) if len(t) > 1] if isinstance(intro, str) else []
+    categories = []
+    if isinstance(category, str):
+        categories = ['分类:' + c.strip() for c in category.split('+') if c.strip()]
+    return terms, categories
+
+def text_features(intros, categories, dim=TEXT_DIM, max_df_ratio=MAX_DF_RATIO):
+    """
+    计算TF-IDF特征，并用带符号的特征哈希映射到dim维；文档频率超过max_df_ratio的词被丢弃
+    返回: (n, dim) float32 CSR稀疏矩阵，行已L2归一化
+    """
+    docs = []
+    df = Counter()
+    for intro, category in zip(intros, categories):
+        terms, cats = book_terms(intro, category)
+        counts = Counter(terms)
+        for cat in cats:
+            counts[cat] += CATEGORY_WEIGHT
+        docs.append(counts)
+        df.update(counts.keys())
+
+    # 每个词只计算一次哈希桶、符号和IDF
+    term_ids = {term: i for i, term in enumerate(df)}
+    hashes = np.fromiter((zlib.crc32(term.encode('utf-8')) for term in df),
+                         dtype=np.int64, count=len(df))
+    buckets = hashes % dim
+    signs = np.where((hashes >> 31) & 1, -1.0, 1.0).astype(np.float32)
+    doc_freq = np.fromiter(df.values(), dtype=np.float32, count=len(df))
+    idf = np.log((1 + len(docs)) / (1 + doc_freq)) + 1
+    # 分类词不受文档频率限制（分类本身就是相似性的主要依据）
+    is_category = np.fromiter((term.startswith('分类:') for term in df), dtype=bool, count=len(df))
+    keep = is_category | (doc_freq <= max_df_ratio * len(docs))
+
+    lengths = np.fromiter((len(counts) for counts in docs), dtype=np.int64, count=len(docs))
+    cols = np.fromiter((term_ids[term] for counts in docs for term in counts),
+                       dtype=np.int64, count=int(lengths.sum()))
+    weights = np.fromiter((w for counts in docs for w in counts.values()),
+                          dtype=np.float32, count=len(cols))
+    rows = np.repeat(np.arange(len(docs)), lengths)
+    rows, cols, weights = rows[keep[cols]], cols[keep[cols]], weights[keep[cols]]
+    tfidf = (1 + np.log(weights)) * idf[cols] * signs[cols]
+    # 同一文档落入同一桶的词在转换为CSR时直接累加
+    features = sp.csr_matrix((tfidf, (rows, buckets[cols])), shape=(len(docs), dim), dtype=np.float32)
+    features.sum_duplicates()
+    return l2_normalize_sparse(features)
+
+def load_cover_arrays(paths, archive=None):
+    """
+    读取一批封面，缩放为小尺寸数组
+    archive: ImageArchive（可选），此时paths为存档中的文件名，直接从mmap读取
+    返回: (灰度9x8数组, RGB 16x16数组, 是否有效掩码)
+    """
+    n = len(paths)
+    gray = np.zeros((n, 8, 9), dtype=np.float32)
+    rgb = np.zeros((n, 16, 16, 3), dtype=np.uint8)
+    valid = np.zeros(n, dtype=bool)
+    for i, path in enumerate(paths):
+        if not path or not (path in archive if archive is not None else os.path.exists(path)):
+            continue
+        try:
+            with (archive.open_image(path) if archive is not None else Image.open(path)) as img:
+                img = img.convert('RGB')
+                gray[i] = np.asarray(img.convert('L').resize((9, 8), Image.BILINEAR), dtype=np.float32)
+                rgb[i] = np.asarray(img.resize((16, 16), Image.BILINEAR))
+                valid[i] = True
+        except Exception as e:
+            print(f"读取封面失败 {path}: {e}")
+    return gray, rgb, valid
+
+def image_features(paths, archive=None):
+    """
+    计算封面的dHash与颜色直方图特征（按批向量化）
+    archive: ImageArchive（可选），此时paths为存档中的文件名
+    返回: (哈希特征 n×64, 直方图特征 n×HIST_BINS³)，均已L2归一化，缺失封面为零向量
+    """
+    n = len(paths)
+    hist_dim = HIST_BINS ** 3
+    hash_features = np.zeros((n, 64), dtype=np.float32)
+    hist_features = np.zeros((n, hist_dim), dtype=np.float32)
+    if not PIL_AVAILABLE:
+        print("Pillow不可用，跳过封面特征")
+        return hash_features, hist_features
+
+    for start in range(0, n, BATCH_SIZE):
+        gray, rgb, valid = load_cover_arrays(paths[start:start + BATCH_SIZE], archive)
+        # dHash：相邻像素亮度比较得到64位，映射为±1向量
+        bits = (gray[:, :, 1:] > gray[:, :, :-1]).reshape(len(gray), 64)
+        hashes = np.where(bits, 1.0, -1.0).astype(np.float32)
+        hashes[~valid] = 0
+
+        # 颜色直方图：量化后按颜色编号计数
+        quantized = (rgb.astype(np.int32) * HIST_BINS) // 256
+        codes = (quantized[..., 0] * HIST_BINS + quantized[..., 1]) * HIST_BINS + quantized[..., 2]
+        codes = codes.reshape(len(rgb), -1)
+        offsets = np.arange(len(rgb))[:, None] * hist_dim
+        hist = np.bincount((codes + offsets).ravel(), minlength=len(rgb) * hist_dim)
+        hist = hist.reshape(len(rgb), hist_dim).astype(np.float32)
+        hist[~valid] = 0
+
+        hash_features[start:start + len(gray)] = hashes
+        hist_features[start:start + len(rgb)] = hist
+
+    return l2_normalize(hash_features), l2_normalize(hist_features)
+
+class SimilarBookIndex:
+    def __init__(self, text, images, ranks, titles, authors):
+        """text: 文本特征（CSR稀疏矩阵）；images: 拼接后的封面特征矩阵；两者都已按权重缩放"""
+        self.text = sp.csr_matrix(text, dtype=np.float32)
+        self.images = np.ascontiguousarray(images, dtype=np.float32)
+        self.ranks = np.asarray(ranks)
+        self.titles = np.asarray(titles)
+        self.authors = np.asarray(authors)
+
+    @classmethod
+    def build(cls, data, image_dir=IMAGE_DIR, archive=None):
+        """从图书DataFrame计算全部特征；archive: 封面存档（ImageArchive），给出时不读取image_dir"""
+        text = text_features(data['简介'].tolist(), data['分类'].tolist())
+        names = [name if isinstance(name, str) and name != '未下载' else None for name in data['封面图片']]
+        paths = names if archive is not None else [name and os.path.join(image_dir, name) for name in names]
+        hashes, hists = image_features(paths, archive)
+        # 各块已归一化，乘以sqrt(权重)后点积即为加权余弦相似度之和
+        images = np.hstack([hashes * np.sqrt(HASH_WEIGHT), hists * np.sqrt(HIST_WEIGHT)])
+        return cls(text * np.sqrt(TEXT_WEIGHT), images, data['热度排名'].to_numpy(), data['书名'].astype(str).tolist(),
+                   data['作者'].astype(str).tolist())
+
+    def save(self, feature_file=FEATURE_FILE):
+        """保存特征矩阵（文本特征保存CSR的三个数组）"""
+        np.savez(feature_file, text_data=self.text.data, text_indices=self.text.indices,
+                 text_indptr=self.text.indptr, text_shape=np.array(self.text.shape), images=self.images,
+                 ranks=self.ranks, titles=self.titles, authors=self.authors)
+
+    @classmethod
+    def load(cls, feature_file=FEATURE_FILE):
+        """加载特征矩阵"""
+        with np.load(feature_file) as f:
+            if 'text_data' not in f:
+                raise ValueError(f"特征文件格式已过期，请重新运行build: {feature_file}")
+            text = sp.csr_matrix((f['text_data'], f['text_indices'], f['text_indptr']),
+                                 shape=tuple(f['text_shape']))
+            return cls(text, f['images'], f['ranks'], f['titles'].tolist(), f['authors'].tolist())
+
+    def find(self, title=None, rank=None):
+        """按热度排名或书名查找图书的行号"""
+        if rank is not None:
+            matches = np.flatnonzero(self.ranks == rank)
+        else:
+            matches = [i for i, t in enumerate(self.titles) if title in t]
+        return int(matches[0]) if len(matches) else None
+
+    def most_similar(self, row, k=10):
+        """返回与第row本书最相似的k本书 [(行号, 相似度), ...]"""
+        scores = (self.text @ self.text[row].T).toarray().ravel() + self.images @ self.images[row]
+        scores[row] = -np.inf
+        k = min(k, len(scores) - 1)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='豆瓣图书相似推荐')
+    parser.add_argument('--features', default=FEATURE_FILE, help=f'特征文件 (默认: {FEATURE_FILE})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='计算并保存特征矩阵')
+    build_parser.add_argument('--csv', default='books.csv', help='数据文件 (默认: books.csv)')
+    build_parser.add_argument('--image-dir', default=IMAGE_DIR, help=f'封面目录 (默认: {IMAGE_DIR})')
+    build_parser.add_argument('--image-archive', help='从封面存档（如covers.pack）读取封面，代替--image-dir')
+
+    query_parser = subparsers.add_parser('query', help='查找相似图书')
+    query_parser.add_argument('title', nargs='?', help='书名（支持部分匹配）')
+    query_parser.add_argument('--rank', type=int, help='按热度排名指定图书')
+    query_parser.add_argument('-k', type=int, default=10, help='返回数量 (默认: 10)')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        import pandas as pd
+        data = pd.read_csv(args.csv, encoding='utf-8-sig')
+        start = time.perf_counter()
+        archive = ImageArchive(args.image_archive) if args.image_archive else None
+        index = SimilarBookIndex.build(data, args.image_dir, archive)
+        index.save(args.features)
+        print(f"特征计算完成: {len(index.ranks)} 本书, 文本 {index.text.shape[1]} 维 "
+              f"(平均每本 {index.text.nnz / max(1, len(index.ranks)):.0f} 个非零项), 封面 {index.images.shape[1]} 维, "
+              f"耗时 {time.perf_counter() - start:.2f} 秒")
+    else:
+        if args.title is None and args.rank is None:
+            parser.error("请指定书名或 --rank")
+        index = SimilarBookIndex.load(args.features)
+        row = index.find(args.title, args.rank)
+        if row is None:
+            print("未找到指定的图书")
+            return
+        start = time.perf_counter()
+        results = index.most_similar(row, args.k)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"与《{index.titles[row]}》最相似的 {len(results)} 本书 (耗时 {elapsed:.2f} ms):")
+        for i, score in results:
+            print(f"[{index.ranks[i]}] {index.titles[i]} - {index.authors[i]} 相似度: {score:.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+图书文本处理工具
+功能：
+1. 中文分词（默认按字二元组切分，可选jieba）
+2. 文本规范化（书名、作者）与书籍唯一键
+"""
+
+import re
+import unicodedata
+
+# 尝试导入jieba，如果不可用则使用二元组切分
+try:
+    import jieba
+    JIEBA_AVAILABLE = True
+except ImportError:
+    JIEBA_AVAILABLE = False
+
+# 连续的中文字符 / 连续的字母数字
+CJK_RUN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+WORD_RE = re.compile(r'[0-9a-z]+(?:[.+#][0-9a-z]+)*[+#]*')
+TOKEN_SPLIT_RE = re.compile(r'([\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+)')
+# 作者字段中的国籍、译者等标记
+AUTHOR_NOISE_RE = re.compile(r'[\[【(（][^\]】)）]*[\]】)）]|编著|主编|著|译')
+# 书名中的版本说明（如"（原书第3版）"）和副标题
+TITLE_NOISE_RE = re.compile(r'[(（][^)）]*版[^)）]*[)）]|第[0-9一二三四五六七八九十]+版|[:：].*$')
+# 标点与空白（保留+和#，避免C++、C#被规范化成同一个词）
+PUNCT_RE = re.compile(r'[^\w+#]+|_+')
+
+def normalize_text(text):
+    """
+    规范化文本：全角转半角、统一小写、去除首尾空白
+    """
+    if text is None:
+        return ''
+    return unicodedata.normalize('NFKC', str(text)).lower().strip()
+
+def cjk_bigrams(run):
+    """
+    将一段连续中文切分为单字和相邻二元组
+    """
+    tokens = list(run)
+    tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+def tokenize(text, mode='bigram'):
+    """
+    文本分词
+    mode: bigram（单字+二元组，适合子串检索）或 jieba（词语切分）
+    """
+    text = normalize_text(text)
+    if not text:
+        return []
+
+    tokens = []
+    for part in TOKEN_SPLIT_RE.split(text):
+        if not part:
+            continue
+        if CJK_RUN_RE.fullmatch(part):
+            if mode == 'jieba' and JIEBA_AVAILABLE:
+                tokens.extend(w for w in jieba.cut(part) if w.strip())
+            else:
+                tokens.extend(cjk_bigrams(part))
+        else:
+            tokens.extend(WORD_RE.findall(part))
+    return tokens
+
+def query_tokens(text, mode='bigram'):
+    """
+    查询分词：中文只取二元组（单字查询时取单字），避免单字带来大量误匹配
+    """
+    text = normalize_text(text)
+    tokens = []
+    for part in TOKEN_SPLIT_RE.split(text):
+        if not part:
+            continue
+        if CJK_RUN_RE.fullmatch(part):
+            if mode == 'jieba' and JIEBA_AVAILABLE:
+                tokens.extend(w for w in jieba.cut(part) if w.strip())
+            elif len(part) == 1:
+                tokens.append(part)
+            else:
+                tokens.extend(part[i:i + 2] for i in range(len(part) - 1))
+        else:
+            tokens.extend(WORD_RE.findall(part))
+    # 去重并保持顺序
+    return list(dict.fromkeys(tokens))
+
+def normalize_title(title):
+    """
+    规范化书名：去掉版本说明、副标题和标点
+    """
+    title = TITLE_NOISE_RE.sub('', normalize_text(title))
+    return PUNCT_RE.sub('', title)
+
+def normalize_author(author):
+    """
+    规范化作者：去掉国籍、著/译等标记，多个作者排序后拼接
+    """
+    names = re.split(r'[/,，、]', normalize_text(author))
+    names = [PUNCT_RE.sub('', AUTHOR_NOISE_RE.sub('', name)) for name in names]
+    return '/'.join(sorted(name for name in names if name))
+
+def book_key(title, author):
+    """
+    生成书籍的唯一键（书名 + 作者），用于跨批次识别同一本书
+    """
+    return f"{normalize_text(title)}|{normalize_text(author)}"
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+图书分类共现分析
+功能：
+1. 把"云计算与大数据 + 人工智能"这类多分类拆开，构建 图书×分类 的稀疏关联矩阵（scipy.sparse）
+2. 共现矩阵 = 关联矩阵的转置乘以自身，对角线为各分类图书数；由此计算分类对的共现数、提升度(lift)和PMI
+3. 在正PMI加权的分类图上做马尔可夫聚类（MCL，稀疏矩阵乘法+膨胀），得到经常一起出现的分类簇
+4. 导出分类对统计CSV和Top N分类的共现热力图
+只在稀疏矩阵上运算，可处理百万级的图书-分类关联
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+# 输出文件
+PAIRS_FILE = '分类共现统计.csv'
+HEATMAP_CHART = '分类共现热力图.png'
+# 输出和打印分类对时要求的最少共现次数（过少的共现提升度不稳定）
+MIN_PAIR_COUNT = 2
+# 热力图显示的分类数
+HEATMAP_TOP_N = 20
+# MCL参数：膨胀系数越大，簇越小；小于该值的转移概率剪掉以保持稀疏
+MCL_INFLATION = 2.0
+MCL_PRUNE = 1e-4
+MCL_MAX_ITER = 100
+
+def incidence_matrix(categories):
+    """
+    由分类列（多个分类用+分隔）构建 图书×分类 的0/1稀疏矩阵
+    返回 (CSR矩阵, 分类名数组)，分类按首次出现顺序编号；同一本书重复的分类只计一次
+    """
+    series = pd.Series(categories).reset_index(drop=True)
+    items = series.dropna().astype(str).str.split('+').explode().str.strip()
+    items = items[items != '']
+    codes, names = pd.factorize(items, sort=False)
+    rows = items.index.to_numpy()
+    matrix = sp.csr_matrix((np.ones(len(codes), dtype=np.float32), (rows, codes)),
+                           shape=(len(series), len(names)))
+    # 重复的 (书, 分类) 在转换时被累加，这里恢复为0/1
+    matrix.data[:] = 1
+    return matrix, np.asarray(names, dtype=object)
+
+def cooccurrence_matrix(incidence):
+    """分类×分类的共现次数矩阵（对角线为各分类的图书数）"""
+    return (incidence.T @ incidence).tocsr()
+
+def pair_statistics(cooccurrence, names, n_books, min_count=MIN_PAIR_COUNT):
+    """
+    各分类对的共现统计（只遍历共现矩阵上三角的非零项）
+    lift = P(A,B) / (P(A)P(B))，PMI = log2(lift)，NPMI = PMI / -log2(P(A,B))，置信度 = P(B|A)
+    """
+    counts = cooccurrence.diagonal().astype(np.float64)
+    upper = sp.triu(cooccurrence, k=1).tocoo()
+    keep = upper.data >= min_count
+    a, b, together = upper.row[keep], upper.col[keep], upper.data[keep].astype(np.float64)
+    p_ab = together / n_books
+    lift = together * n_books / (counts[a] * counts[b])
+    pmi = np.log2(lift)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        npmi = np.where(p_ab < 1, pmi / -np.log2(p_ab), 1.0)
+    pairs = pd.DataFrame({
+        '分类A': names[a], '分类B': names[b],
+        'A图书数': counts[a].astype(int), 'B图书数': counts[b].astype(int),
+        '共现数': together.astype(int), '支持度': p_ab,
+        '置信度A到B': together / counts[a], '置信度B到A': together / counts[b],
+        '提升度': lift, 'PMI': pmi, 'NPMI': npmi,
+    })
+    return pairs.sort_values(['共现数', '提升度'], ascending=False, kind='stable').reset_index(drop=True)
+
+def ppmi_graph(cooccurrence, n_books):
+    """正PMI加权的分类邻接矩阵（负相关和不共现的分类对没有边）"""
+    counts = cooccurrence.diagonal().astype(np.float64)
+    upper = sp.triu(cooccurrence, k=1).tocoo()
+    pmi = np.log2(upper.data * n_books / (counts[upper.row] * counts[upper.col]))
+    positive = pmi > 0
+    graph = sp.coo_matrix((pmi[positive], (upper.row[positive], upper.col[positive])), shape=cooccurrence.shape)
+    return (graph + graph.T).tocsr()
+
+def normalize_columns(matrix):
+    """按列归一化为转移概率"""
+    sums = np.asarray(matrix.sum(axis=0)).ravel()
+    sums[sums == 0] = 1
+    return (matrix @ sp.diags(1 / sums)).tocsr()
+
+def markov_clusters(graph, inflation=MCL_INFLATION, prune=MCL_PRUNE, max_iter=MCL_MAX_ITER):
+    """
+    马尔可夫聚类：交替做扩展（矩阵平方，随机游走两步）和膨胀（逐项乘方后重新归一化），
+    直到转移矩阵不再变化；每个分类归入其概率最大的吸引子，返回每个分类的簇编号
+    """
+    n = graph.shape[0]
+    # 自环避免二部结构来回振荡
+    matrix = normalize_columns(graph + sp.identity(n, format='csr'))
+    for _ in range(max_iter):
+        previous = matrix
+        matrix = matrix @ matrix
+        matrix = matrix.power(inflation)
+        matrix.data[matrix.data < prune] = 0
+        matrix.eliminate_zeros()
+        matrix = normalize_columns(matrix)
+        if abs(matrix - previous).max() < 1e-6:
+            break
+    attractors = np.asarray(matrix.argmax(axis=0)).ravel()
+    # 吸引子编号重排为 0, 1, 2, ...
+    _, labels = np.unique(attractors, return_inverse=True)
+    return labels
+
+def cluster_table(labels, names, counts):
+    """簇列表 [[(分类, 图书数), ...], ...]，簇按总图书数降序，簇内按图书数降序"""
+    clusters = {}
+    for label, name, count in zip(labels, names, counts):
+        clusters.setdefault(label, []).append((name, int(count)))
+    members = [sorted(items, key=lambda item: -item[1]) for items in clusters.values()]
+    return sorted(members, key=lambda items: -sum(count for _, count in items))
+
+class CategoryGraph:
+    def __init__(self, categories):
+        """categories: 每本书的分类字符串（多个分类用+分隔）"""
+        self.incidence, self.names = incidence_matrix(categories)
+        self.n_books = self.incidence.shape[0]
+        self.cooccurrence = cooccurrence_matrix(self.incidence)
+        self.counts = self.cooccurrence.diagonal()
+
+    @classmethod
+    def from_csv(cls, csv_file):
+        """只读取CSV的分类列"""
+        return cls(pd.read_csv(csv_file, encoding='utf-8-sig', usecols=['分类'])['分类'])
+
+    def pairs(self, min_count=MIN_PAIR_COUNT):
+        return pair_statistics(self.cooccurrence, self.names, self.n_books, min_count)
+
+    def clusters(self, inflation=MCL_INFLATION):
+        labels = markov_clusters(ppmi_graph(self.cooccurrence, self.n_books), inflation)
+        return cluster_table(labels, self.names, self.counts)
+
+    def heatmap(self, top_n=HEATMAP_TOP_N, output=HEATMAP_CHART, value='lift', show=False):
+        """Top N分类的共现热力图；value为'lift'时显示提升度（对数色阶），为'count'时显示共现数"""
+        from book_analysis import load_pyplot
+
+        top = np.argsort(-self.counts, kind='stable')[:top_n]
+        counts = self.cooccurrence[top][:, top].toarray().astype(np.float64)
+        # 对角线是分类自身的图书数，不参与配色
+        np.fill_diagonal(counts, np.nan)
+        if value == 'lift':
+            sizes = self.counts[top].astype(np.float64)
+            matrix = counts * self.n_books / np.outer(sizes, sizes)
+            title, label = f'Top {len(top)} 分类共现提升度', '提升度 (log2)'
+            shown = np.log2(np.where(matrix > 0, matrix, np.nan))
+        else:
+            matrix = counts
+            title, label = f'Top {len(top)} 分类共现次数', '共现次数'
+            shown = matrix
+
+        plt = load_pyplot(show)
+        size = max(8, len(top) * 0.6)
+        fig, ax = plt.subplots(figsize=(size + 2, size))
+        limit = np.nanmax(np.abs(shown)) if value == 'lift' and np.isfinite(shown).any() else None
+        image = ax.imshow(shown, cmap='RdBu_r' if value == 'lift' else 'YlOrRd',
+                          vmin=-limit if limit else None, vmax=limit)
+        ax.set_xticks(range(len(top)))
+        ax.set_yticks(range(len(top)))
+        ax.set_xticklabels(self.names[top], rotation=45, ha='right', fontsize=9)
+        ax.set_yticklabels(self.names[top], fontsize=9)
+        # 分类不多时在格子中标出数值
+        if len(top) <= 25:
+            for i in range(len(top)):
+                for j in range(len(top)):
+                    if np.isfinite(matrix[i, j]) and matrix[i, j] > 0:
+                        text = f'{matrix[i, j]:.1f}' if value == 'lift' else f'{matrix[i, j]:.0f}'
+                        ax.text(j, i, text, ha='center', va='center', fontsize=7)
+        fig.colorbar(image, ax=ax, label=label)
+        ax.set_title(title, fontsize=16, pad=20)
+        fig.tight_layout()
+        fig.savefig(output, dpi=200, bbox_inches='tight')
+        if show:
+            plt.show()
+        else:
+            plt.close(fig)
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='图书分类共现分析')
+    parser.add_argument('--csv', default='books.csv', help='数据文件 (默认: books.csv)')
+    parser.add_argument('--min-count', type=int, default=MIN_PAIR_COUNT,
+                        help=f'分类对的最少共现次数 (默认: {MIN_PAIR_COUNT})')
+    parser.add_argument('--top', type=int, default=15, help='打印的分类对数量 (默认: 15)')
+    parser.add_argument('--inflation', type=float, default=MCL_INFLATION,
+                        help=f'MCL膨胀系数，越大簇越小 (默认: {MCL_INFLATION})')
+    parser.add_argument('--pairs-output', default=PAIRS_FILE, help=f'分类对统计CSV (默认: {PAIRS_FILE})')
+    parser.add_argument('--heatmap', default=HEATMAP_CHART, help=f'热力图文件 (默认: {HEATMAP_CHART})')
+    parser.add_argument('--heatmap-top', type=int, default=HEATMAP_TOP_N,
+                        help=f'热力图显示的分类数 (默认: {HEATMAP_TOP_N})')
+    parser.add_argument('--heatmap-value', choices=['lift', 'count'], default='lift',
+                        help='热力图显示提升度或共现次数 (默认: lift)')
+    parser.add_argument('--no-chart', action='store_true', help='不生成热力图')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    graph = CategoryGraph.from_csv(args.csv)
+    pairs = graph.pairs(args.min_count)
+    clusters = graph.clusters(args.inflation)
+    elapsed = time.perf_counter() - start
+    print(f"{graph.n_books} 本书, {len(graph.names)} 个分类, {graph.incidence.nnz} 条图书-分类关联, "
+          f"{len(pairs)} 个分类对 (共现 >= {args.min_count}), 耗时 {elapsed:.2f} 秒")
+
+    print(f"\n=== 共现最多的分类对 (Top {args.top}) ===")
+    for _, row in pairs.head(args.top).iterrows():
+        print(f"{row['分类A']} + {row['分类B']}: 共现 {row['共现数']} 本, "
+              f"提升度 {row['提升度']:.2f}, PMI {row['PMI']:.2f}")
+
+    print(f"\n=== 分类簇 (MCL) ===")
+    for i, members in enumerate(clusters, 1):
+        if len(members) > 1:
+            print(f"簇{i}: " + '、'.join(f"{name}({count})" for name, count in members))
+    singles = sum(len(members) == 1 for members in clusters)
+    print(f"另有 {singles} 个分类没有与其他分类成簇")
+
+    pairs.to_csv(args.pairs_output, index=False, encoding='utf-8-sig')
+    print(f"\n分类对统计已保存至: {args.pairs_output}")
+    if not args.no_chart and len(graph.names):
+        graph.heatmap(args.heatmap_top, args.heatmap, args.heatmap_value)
+        print(f"共现热力图已保存至: {args.heatmap}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+各分类简介的TF-IDF关键词（增量维护）
+功能：
+1. 每本书的简介只分词一次，词频以稀疏向量保存；分类 × 词 的词频矩阵（scipy.sparse）和各词的文档频率随之累加
+2. 新一轮爬取后只对新增或简介、分类有变化的图书分词，把差值加到矩阵上，不重新扫描历史数据
+3. 查询时只读取该分类在矩阵中的一行计算TF-IDF，几毫秒即可得到各分类的关键词
+4. 安装了jieba时默认按词语切分；没有jieba时额外统计简介中连续中文的3~5元组，
+   几乎总是出现在同一个更长n元组中的词（如"人工智能"中的"人工"、"工智"、"人工智"）视为片段，不作为关键词
+5. 索引持久化到磁盘（与全文检索索引共用index_store）
+"""
+
+import argparse
+import csv
+import hashlib
+import os
+import time
+from collections import Counter
+
+import numpy as np
+import scipy.sparse as sp
+
+from book_text import tokenize, normalize_text, book_key, CJK_RUN_RE, JIEBA_AVAILABLE
+from index_store import save_index, load_index
+
+# 索引文件路径
+KEYWORD_INDEX_FILE = 'category_keywords.pkl'
+# 索引格式版本，结构变化时递增
+INDEX_VERSION = 2
+# 默认分词方式：有jieba时得到完整的词语
+DEFAULT_MODE = 'jieba' if JIEBA_AVAILABLE else 'bigram'
+# 每个分类默认返回的关键词数
+TOP_K = 10
+# 二元组分词时关键词最长的字数；多统计一个字的n元组，只用来判断更短的n元组是不是片段
+MAX_NGRAM = 4
+# 某个n元组向同一方向多一个字的n元组中，次数最多的FRAGMENT_PARENTS个合计达到其总次数的该比例时，视为片段
+# （如"联网"几乎都出现在"互联网"、"物联网"中）
+FRAGMENT_RATIO = 0.8
+FRAGMENT_PARENTS = 2
+# 单字和以下常见词不作为关键词
+MIN_TERM_LENGTH = 2
+STOPWORDS = frozenset([
+    '一个', '一本', '一些', '我们', '你们', '他们', '它们', '自己', '这个', '这些', '那些', '什么', '如何', '为什么',
+    '本书', '该书', '此书', '全书', '书中', '读者', '作者', '内容', '介绍', '主要', '包括', '以及', '通过', '进行',
+    '可以', '能够', '如果', '因为', '所以', '但是', '而且', '并且', '或者', '还是', '就是', '不是', '没有', '已经',
+    '之间', '之后', '之前', '其中', '以上', '以下', '同时', '不同', '相关', '各种', '很多', '更多', '方面', '问题',
+    '帮助', '提供', '了解', '学习', '知识', '方法', '实践', '讲解', '详细', '系统', '全面', '深入',
+])
+
+def book_terms(intro, mode=DEFAULT_MODE):
+    """
+    简介的关键词候选及词频（去掉单字、纯数字和常见词）
+    二元组分词时再加上连续中文的3 ~ MAX_NGRAM+1元组
+    """
+    if not isinstance(intro, str):
+        return Counter()
+    terms = Counter(t for t in tokenize(intro, mode)
+                    if len(t) >= MIN_TERM_LENGTH and not t.isdigit() and t not in STOPWORDS)
+    if mode == 'bigram':
+        for run in CJK_RUN_RE.findall(normalize_text(intro)):
+            for n in range(3, min(MAX_NGRAM + 1, len(run)) + 1):
+                terms.update(run[i:i + n] for i in range(len(run) - n + 1))
+    return terms
+
+def is_ngram(term):
+    """由book_terms额外统计的中文n元组（3个字及以上）"""
+    return len(term) >= 3 and CJK_RUN_RE.fullmatch(term) is not None
+
+def split_categories(category):
+    """分类列表（多个分类用+分隔，去重并保持顺序）"""
+    if not isinstance(category, str):
+        return []
+    return list(dict.fromkeys(c.strip() for c in category.split('+') if c.strip()))
+
+def content_hash(intro, category):
+    """影响关键词的字段摘要，用于判断图书是否需要重新分词"""
+    content = f"{intro if isinstance(intro, str) else ''}\x1f{category if isinstance(category, str) else ''}"
+    return hashlib.md5(content.encode('utf-8')).hexdigest()
+
+class CategoryKeywordIndex:
+    def __init__(self, mode=DEFAULT_MODE):
+        """初始化空索引；mode: bigram或jieba（与全文检索相同的分词方式）"""
+        self.mode = mode
+        self.terms = {}            # 词 -> 列号
+        self.vocab = []            # 列号 -> 词
+        self.category_rows = {}    # 分类 -> 行号
+        self.categories = []       # 行号 -> 分类
+        self.books = {}            # 书名|作者 -> (内容摘要, 分类行号, 词列号数组, 词频数组)
+        self.counts = sp.csr_matrix((0, 0), dtype=np.int64)   # 分类 × 词 的词频
+        self.doc_freq = np.zeros(0, dtype=np.int64)           # 每个词出现在多少本书的简介中
+        # n元组去掉最后一个字、第一个字后对应的列号（没有时为-1），用于判断片段
+        self.prefix = np.zeros(0, dtype=np.int64)
+        self.suffix = np.zeros(0, dtype=np.int64)
+        self.too_long = np.zeros(0, dtype=bool)   # 只用于判断片段的MAX_NGRAM+1元组
+
+    def __len__(self):
+        return len(self.books)
+
+    def _column(self, term):
+        column = self.terms.get(term)
+        if column is None:
+            column = self.terms[term] = len(self.vocab)
+            self.vocab.append(term)
+        return column
+
+    def _row(self, category):
+        row = self.category_rows.get(category)
+        if row is None:
+            row = self.category_rows[category] = len(self.categories)
+            self.categories.append(category)
+        return row
+
+    def update(self, rows):
+        """
+        用一批图书（含书名、作者、简介、分类的字典）增量更新索引
+        只对新增或内容变化的图书分词；返回 {'added': n, 'updated': n, 'unchanged': n}
+        """
+        stats = {'added': 0, 'updated': 0, 'unchanged': 0}
+        # 矩阵差值的 (行, 列, 值) 与文档频率差值
+        delta_rows, delta_cols, delta_values = [], [], []
+        df_cols, df_values = [], []
+
+        def apply(entry, sign):
+            _, category_rows, columns, counts = entry
+            for row in category_rows:
+                delta_rows.append(np.full(len(columns), row, dtype=np.int64))
+                delta_cols.append(columns)
+                delta_values.append(counts * sign)
+            df_cols.append(columns)
+            df_values.append(np.full(len(columns), sign, dtype=np.int64))
+
+        seen = set()
+        for row in rows:
+            key = book_key(row.get('书名') or '', row.get('作者') or '')
+            # 同一批次中重复出现的书只保留第一条（排名靠前）
+            if key in seen:
+                continue
+            seen.add(key)
+            intro, category = row.get('简介'), row.get('分类')
+            digest = content_hash(intro, category)
+            old = self.books.get(key)
+            if old is not None and old[0] == digest:
+                stats['unchanged'] += 1
+                continue
+            if old is not None:
+                apply(old, -1)
+            terms = book_terms(intro, self.mode)
+            columns = np.array([self._column(term) for term in terms], dtype=np.int64)
+            counts = np.array(list(terms.values()), dtype=np.int64)
+            entry = (digest, tuple(self._row(c) for c in split_categories(category)), columns, counts)
+            self.books[key] = entry
+            apply(entry, 1)
+            stats['updated' if old is not None else 'added'] += 1
+
+        shape = (len(self.categories), len(self.vocab))
+        if self.counts.shape != shape:
+            self.counts.resize(shape)
+        if len(self.doc_freq) < shape[1]:
+            self.doc_freq = np.concatenate([self.doc_freq, np.zeros(shape[1] - len(self.doc_freq), dtype=np.int64)])
+        if len(self.prefix) < shape[1]:
+            new_terms = self.vocab[len(self.prefix):]
+            self.prefix = np.concatenate([self.prefix, [self.terms.get(t[:-1], -1) if is_ngram(t) else -1
+                                                        for t in new_terms]]).astype(np.int64)
+            self.suffix = np.concatenate([self.suffix, [self.terms.get(t[1:], -1) if is_ngram(t) else -1
+                                                        for t in new_terms]]).astype(np.int64)
+            self.too_long = np.concatenate([self.too_long, [len(t) > MAX_NGRAM and is_ngram(t)
+                                                            for t in new_terms]]).astype(bool)
+        if delta_values:
+            delta = sp.csr_matrix((np.concatenate(delta_values), (np.concatenate(delta_rows), np.concatenate(delta_cols))),
+                                  shape=shape, dtype=np.int64)
+            self.counts = (self.counts + delta).tocsr()
+            self.counts.eliminate_zeros()
+        if df_values:
+            np.add.at(self.doc_freq, np.concatenate(df_cols), np.concatenate(df_values))
+        return stats
+
+    def update_from_csv(self, csv_file):
+        """从爬虫输出的CSV增量更新索引"""
+        with open(csv_file, 'r', newline='', encoding='utf-8-sig') as f:
+            return self.update(csv.DictReader(f))
+
+    def keywords(self, category, top_k=TOP_K):
+        """
+        分类的TF-IDF关键词 [(词, 得分), ...]
+        TF为该词在分类所有简介中的词频占比，IDF按图书计算：log((1+N)/(1+df)) + 1
+        二元组分词时不返回超过MAX_NGRAM个字的n元组，片段排在其他词之后：
+        只有该分类中不是片段的词不足top_k个时，才用得分最高的片段补足
+        """
+        row = self.category_rows.get(category)
+        if row is None:
+            return []
+        vector = self.counts[row]
+        if vector.nnz == 0:
+            return []
+        tf = vector.data / vector.data.sum()
+        idf = np.log((1 + len(self.books)) / (1 + self.doc_freq[vector.indices])) + 1
+        scores = tf * idf
+        if self.mode != 'bigram':
+            return self._top_terms(vector, scores, np.arange(len(scores)), top_k)
+        usable = ~self.too_long[vector.indices]
+        fragments = self._fragments(vector)
+        top = self._top_terms(vector, scores, np.flatnonzero(usable & ~fragments), top_k)
+        if len(top) < top_k:
+            top += self._top_terms(vector, scores, np.flatnonzero(usable & fragments), top_k - len(top))
+        return top
+
+    def _top_terms(self, vector, scores, candidates, k):
+        """candidates（分类一行中的位置）里得分最高的k个词"""
+        k = min(k, len(candidates))
+        if k == 0:
+            return []
+        scores = scores[candidates]
+        # 取得分不低于第k名的全部词，同分按词排序，结果与词表顺序（即更新历史）无关
+        threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+        top = [(self.vocab[vector.indices[candidates[i]]], float(scores[i])) for i in np.flatnonzero(scores >= threshold)]
+        return sorted(top, key=lambda item: (-item[1], item[0]))[:k]
+
+    def _fragments(self, vector):
+        """
+        分类一行中的片段（布尔数组）：
+        在该分类中，向同一方向多一个字的n元组（如"人工"之于"人工智"，"联网"之于"互联网"、"物联网"）
+        取次数最多的FRAGMENT_PARENTS个，合计达到本身次数的FRAGMENT_RATIO
+        只在该分类一行的非零项上计算，与词表大小无关
+        """
+        columns, counts = vector.indices, vector.data
+        # 每个词向同一方向多一个字的n元组中，最多FRAGMENT_PARENTS个的合计次数（两个方向取大）
+        longer = np.zeros(len(columns), dtype=np.int64)
+        for links in (self.prefix, self.suffix):
+            parents = links[columns]
+            linked = parents >= 0
+            parents, parent_counts = parents[linked].astype(columns.dtype), counts[linked]
+            if len(parents) == 0:
+                continue
+            # 按 (被包含的词, 次数降序) 排序，每组累加次数最多的一个，以及其后最多FRAGMENT_PARENTS-1个重复出现的
+            # （只出现一次的n元组不算，否则出现次数很少的词总能被两个偶然的n元组覆盖）
+            order = np.argsort(parents.astype(np.int64) * (counts.max() + 1) - parent_counts)
+            parents, parent_counts = parents[order], parent_counts[order]
+            starts = np.flatnonzero(np.r_[True, parents[1:] != parents[:-1]])
+            position = np.arange(len(parents)) - np.repeat(starts, np.diff(np.r_[starts, len(parents)]))
+            counted = (position == 0) | ((position < FRAGMENT_PARENTS) & (parent_counts > 1))
+            terms = parents[starts]
+            totals = np.add.reduceat(np.where(counted, parent_counts, 0), starts)
+            # 该行的词在terms中的位置（不在其中时合计为0）
+            at = np.minimum(np.searchsorted(terms, columns), len(terms) - 1)
+            longer = np.maximum(longer, np.where(terms[at] == columns, totals[at], 0))
+        return longer >= FRAGMENT_RATIO * counts
+
+    def save(self, index_file=KEYWORD_INDEX_FILE):
+        """保存索引到磁盘（先写临时文件再替换，避免中断时损坏索引）"""
+        save_index(self, index_file, INDEX_VERSION)
+
+    @classmethod
+    def load(cls, index_file=KEYWORD_INDEX_FILE):
+        """从磁盘加载索引"""
+        return load_index(cls, index_file, INDEX_VERSION)
+
+def load_keyword_index(index_file=KEYWORD_INDEX_FILE, mode=DEFAULT_MODE):
+    """加载磁盘上的关键词索引，不存在或无法加载时返回空索引"""
+    if os.path.exists(index_file):
+        try:
+            return CategoryKeywordIndex.load(index_file)
+        except Exception as e:
+            print(f"加载关键词索引失败，将重新建立: {e}")
+    return CategoryKeywordIndex(mode)
+
+def update_keyword_index(csv_file, index_file=KEYWORD_INDEX_FILE, mode=DEFAULT_MODE):
+    """用新爬取的CSV增量更新磁盘上的关键词索引（索引不存在时新建）"""
+    index = load_keyword_index(index_file, mode)
+    stats = index.update_from_csv(csv_file)
+    index.save(index_file)
+    print(f"关键词索引更新完成: 新增 {stats['added']} 本, 更新 {stats['updated']} 本, "
+          f"未变化 {stats['unchanged']} 本, 索引共 {len(index)} 本, {len(index.vocab)} 个词")
+    return index
+
+def annotate_categories(category_stats, index, top_k=5):
+    """给analyze_categories的结果加上关键词列（多个关键词用、连接）"""
+    category_stats = category_stats.copy()
+    category_stats['关键词'] = ['、'.join(term for term, _ in index.keywords(category, top_k))
+                               for category in category_stats['分类']]
+    return category_stats
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='各分类简介的TF-IDF关键词')
+    parser.add_argument('--index', default=KEYWORD_INDEX_FILE, help=f'索引文件 (默认: {KEYWORD_INDEX_FILE})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='从CSV重新建立索引')
+    build_parser.add_argument('--csv', default='books.csv', help='数据文件 (默认: books.csv)')
+    build_parser.add_argument('--mode', choices=['bigram', 'jieba'], default=DEFAULT_MODE,
+                              help=f'分词方式 (默认: {DEFAULT_MODE}，安装了jieba时为jieba)')
+
+    update_parser = subparsers.add_parser('update', help='用新的CSV增量更新索引')
+    update_parser.add_argument('--csv', default='books.csv', help='数据文件 (默认: books.csv)')
+
+    show_parser = subparsers.add_parser('show', help='显示分类关键词')
+    show_parser.add_argument('categories', nargs='*', help='分类名 (默认: 图书最多的若干个分类)')
+    show_parser.add_argument('-k', type=int, default=TOP_K, help=f'每个分类的关键词数 (默认: {TOP_K})')
+    show_parser.add_argument('--top', type=int, default=15, help='未指定分类时显示的分类数 (默认: 15)')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        if args.mode == 'jieba' and not JIEBA_AVAILABLE:
+            print("jieba未安装，改用二元组分词")
+            args.mode = 'bigram'
+        index = CategoryKeywordIndex(args.mode)
+        start = time.perf_counter()
+        stats = index.update_from_csv(args.csv)
+        index.save(args.index)
+        print(f"关键词索引建立完成: {stats['added']} 本书, {len(index.categories)} 个分类, {len(index.vocab)} 个词, "
+              f"耗时 {time.perf_counter() - start:.2f} 秒")
+    elif args.command == 'update':
+        update_keyword_index(args.csv, args.index)
+    else:
+        index = CategoryKeywordIndex.load(args.index)
+        categories = args.categories
+        if not categories:
+            sizes = Counter(row for _, rows, _, _ in index.books.values() for row in rows)
+            categories = [index.categories[row] for row, _ in sizes.most_common(args.top)]
+        start = time.perf_counter()
+        results = [(category, index.keywords(category, args.k)) for category in categories]
+        elapsed = (time.perf_counter() - start) * 1000
+        for category, keywords in results:
+            print(f"{category}: " + ('、'.join(term for term, _ in keywords) or '（索引中没有该分类）'))
+        print(f"\n{len(results)} 个分类，耗时 {elapsed:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+豆瓣读书爬虫与分析统一命令行
+功能：
+1. crawl / analyze / report / render 子命令，可单独运行，也可在一条命令中串联
+   （如 cli.py crawl --pages 5 analyze report），串联时直接传递DataFrame，不经过CSV
+2. 只运行指定的阶段，全程不等待输入、不弹出图表窗口，适合定时任务
+3. import-cost: 统计各模块的导入耗时，找出拖慢启动的依赖
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+# 默认统计的模块
+DEFAULT_MODULES = ['douban', 'book_analysis', 'book_search', 'book_similar', 'book_dedup',
+                   'book_detail', 'crawl_orchestrator', 'benchmark']
+# 默认数据文件
+DEFAULT_CSV = 'books.csv'
+# 分析引擎（与analysis_engines.ENGINES一致，这里不导入以免拖慢启动）
+ENGINES = ('pandas', 'polars', 'duckdb')
+# 项目目录（加入子进程的PYTHONPATH，保证能导入项目模块）
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def measure_import(module):
+    """
+    在新的解释器中导入模块（python -X importtime），返回 (总耗时秒, {直接依赖: 累计耗时秒})
+    子进程在临时目录中运行，避免导入douban时在项目目录下创建images目录
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [PROJECT_DIR, os.environ.get('PYTHONPATH')])))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                cwd=tmp_dir, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        raise ImportError(lines[-1] if lines else module)
+
+    # 输出按后序排列：子模块在前，缩进表示层级；模块自身那一行之前的缩进行都是它的依赖
+    children = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or line.count('|') != 2:
+            continue
+        _, cumulative, name = line.split('|')
+        if not cumulative.strip().isdigit():
+            continue  # 表头
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        seconds = int(cumulative) / 1e6
+        if depth > 0:
+            children.append((depth, name, seconds))
+        elif name == module:
+            direct = {child: secs for child_depth, child, secs in children if child_depth == 1}
+            return seconds, direct
+        else:
+            children = []
+    return 0.0, {}
+
+class PipelineContext:
+    def __init__(self):
+        """串联的各阶段之间共享的数据"""
+        self.books = None      # crawl阶段得到的Book列表
+        self.data = None       # 交给分析阶段的DataFrame
+        self.source = None     # 数据来源（CSV路径或说明）
+        self.analyzer = None
+        self.cleaned = False
+
+    def get_analyzer(self, csv_file, engine='pandas'):
+        """取得分析器：优先使用前面阶段传来的数据，否则读取csv_file；引擎由第一个创建分析器的阶段决定"""
+        if self.analyzer is None:
+            from book_analysis import BookDataAnalyzer
+            if self.data is not None:
+                self.analyzer = BookDataAnalyzer(self.source, data=self.data, engine=engine)
+            else:
+                self.analyzer = BookDataAnalyzer(csv_file, engine=engine)
+            if self.analyzer.frame is None:
+                sys.exit(f" 错误：没有可分析的数据 ({csv_file})")
+        if not self.cleaned:
+            self.analyzer.clean_data()
+            self.cleaned = True
+        return self.analyzer
+
+def cmd_crawl(args, context):
+    """crawl子命令：爬取并（默认）保存CSV，结果留给后续阶段"""
+    import douban
+    from book_record import books_to_frame
+
+    douban.configure(args)
+    csv_file = None if args.no_save else args.output
+    books = douban.run_crawl(pages=args.pages, category_id=args.category, sort=args.sort,
+                             parse_workers=args.parse_workers, enrich=args.enrich,
+                             enrich_workers=args.enrich_workers, csv_file=csv_file,
+                             update_index=args.update_index, metrics_json=args.metrics_json,
+                             metrics_prom=args.metrics_prom,
+                             changes_file=None if args.no_changes else args.changes)
+    context.books = books
+    context.data = books_to_frame(books) if books else None
+    context.source = csv_file or '爬取结果（未保存CSV）'
+    context.analyzer = None
+    context.cleaned = False
+    if not books:
+        sys.exit(" 错误：没有爬取到数据，后续阶段不再执行")
+
+def cmd_analyze(args, context):
+    """analyze子命令：数据清洗、（可选）去重、分类和指标统计"""
+    analyzer = context.get_analyzer(args.csv, args.engine)
+    if args.dedup:
+        analyzer.deduplicate_editions()
+    analyzer.analyze_categories()
+    if args.keywords:
+        analyzer.analyze_category_keywords(args.keyword_index)
+    analyzer.analyze_common_metrics()
+
+def cmd_report(args, context):
+    """report子命令：生成文本报告"""
+    from book_analysis import REPORT_FILE
+
+    context.get_analyzer(args.csv, args.engine).generate_report(args.output or REPORT_FILE)
+
+def cmd_render(args, context):
+    """render子命令：生成图表（默认只保存图片，不弹出窗口）"""
+    from book_analysis import CATEGORY_CHART, METRICS_CHART
+
+    analyzer = context.get_analyzer(args.csv, args.engine)
+    analyzer.visualize_categories(top_n=args.top_n, output=args.category_chart or CATEGORY_CHART,
+                                  show=args.show)
+    analyzer.visualize_metrics(output=args.metrics_chart or METRICS_CHART, show=args.show)
+
+def cmd_import_cost(args, context):
+    """import-cost子命令"""
+    modules = args.modules or DEFAULT_MODULES
+    print(f"{'模块':<22}{'导入耗时(ms)':>14}   最重的直接依赖(ms)")
+    for module in modules:
+        try:
+            # 多次测量取最小值，减少磁盘缓存等干扰
+            runs = [measure_import(module) for _ in range(args.repeat)]
+        except ImportError as e:
+            print(f"{module:<24}{'失败':>12}   {e}")
+            continue
+        total, direct = min(runs, key=lambda run: run[0])
+        heaviest = sorted(direct.items(), key=lambda item: -item[1])[:args.top]
+        detail = ', '.join(f"{name} {seconds * 1000:.0f}" for name, seconds in heaviest)
+        print(f"{module:<24}{total * 1000:>12.1f}   {detail}")
+
+def build_parser(argv):
+    """构造命令行解析器；爬取参数定义在douban.py中，只有用到crawl时才导入"""
+    parser = argparse.ArgumentParser(
+        description='豆瓣读书爬虫与分析统一命令行',
+        epilog='多个子命令可以串联，如: cli.py crawl --pages 5 --no-selenium analyze report render')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    crawl_parser = subparsers.add_parser('crawl', help='爬取图书数据')
+    if 'crawl' in argv:
+        import douban
+        douban.add_crawl_arguments(crawl_parser)
+    crawl_parser.add_argument('--output', default=DEFAULT_CSV, help=f'保存的CSV文件 (默认: {DEFAULT_CSV})')
+    crawl_parser.add_argument('--no-save', action='store_true', help='不保存CSV，结果只交给后续阶段')
+    crawl_parser.set_defaults(func=cmd_crawl)
+
+    analyze_parser = subparsers.add_parser('analyze', help='数据清洗与统计')
+    analyze_parser.add_argument('--csv', default=DEFAULT_CSV, help=f'没有前置crawl阶段时读取的数据文件 (默认: {DEFAULT_CSV})')
+    analyze_parser.add_argument('--dedup', action='store_true', help='去除近似重复的图书')
+    analyze_parser.add_argument('--keywords', action='store_true', help='为各分类提取简介关键词（后续report阶段写入报告）')
+    analyze_parser.add_argument('--keyword-index', help='关键词索引文件 (默认: category_keywords.pkl)')
+    analyze_parser.add_argument('--engine', choices=ENGINES, default='pandas', help='数据处理引擎 (默认: pandas)')
+    analyze_parser.set_defaults(func=cmd_analyze)
+
+    report_parser = subparsers.add_parser('report', help='生成文本分析报告')
+    report_parser.add_argument('--csv', default=DEFAULT_CSV, help=f'没有前置阶段时读取的数据文件 (默认: {DEFAULT_CSV})')
+    report_parser.add_argument('--output', help='报告文件 (默认: 豆瓣图书分析报告.txt)')
+    report_parser.add_argument('--engine', choices=ENGINES, default='pandas', help='数据处理引擎 (默认: pandas)')
+    report_parser.set_defaults(func=cmd_report)
+
+    render_parser = subparsers.add_parser('render', help='生成分类和指标图表')
+    render_parser.add_argument('--csv', default=DEFAULT_CSV, help=f'没有前置阶段时读取的数据文件 (默认: {DEFAULT_CSV})')
+    render_parser.add_argument('--top-n', type=int, default=15, help='分类图表显示的分类数 (默认: 15)')
+    render_parser.add_argument('--category-chart', help='分类统计图文件 (默认: 图书分类统计.png)')
+    render_parser.add_argument('--metrics-chart', help='指标分析图文件 (默认: 图书指标分析.png)')
+    render_parser.add_argument('--show', action='store_true', help='保存后弹出图表窗口')
+    render_parser.add_argument('--engine', choices=ENGINES, default='pandas', help='数据处理引擎 (默认: pandas)')
+    render_parser.set_defaults(func=cmd_render)
+
+    cost_parser = subparsers.add_parser('import-cost', help='统计各模块的导入耗时')
+    cost_parser.add_argument('modules', nargs='*', help=f'要统计的模块 (默认: {" ".join(DEFAULT_MODULES)})')
+    cost_parser.add_argument('--top', type=int, default=3, help='每个模块列出最重的直接依赖数 (默认: 3)')
+    cost_parser.add_argument('--repeat', type=int, default=3, help='每个模块测量次数，取最小值 (默认: 3)')
+    cost_parser.set_defaults(func=cmd_import_cost)
+    return parser
+
+def subcommand_parsers(parser):
+    """{子命令名: 子命令解析器}"""
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            return action.choices
+    return {}
+
+def takes_value(parser, arg):
+    """arg是parser中需要取值的选项（不是 --option=value 形式）时返回True；与argparse一样接受长选项的唯一前缀"""
+    if not arg.startswith('-') or '=' in arg:
+        return False
+    actions = parser._option_string_actions
+    action = actions.get(arg)
+    if action is None and arg.startswith('--'):
+        matches = {actions[option] for option in actions if option.startswith(arg)}
+        action = matches.pop() if len(matches) == 1 else None
+    return action is not None and action.nargs != 0
+
+def split_commands(argv, commands):
+    """
+    把 ['crawl', '--pages', '2', 'analyze', 'report'] 按子命令名拆成多段
+    commands: {子命令名: 子命令解析器}；选项的取值不算子命令名（如 analyze --output report 中的report）
+    """
+    segments = []
+    value_expected = False
+    for arg in argv:
+        if not value_expected and (arg in commands or not segments):
+            segments.append([arg])
+        else:
+            segments[-1].append(arg)
+        # 当前阶段的选项需要取值时，下一个参数是它的值
+        command = commands.get(segments[-1][0])
+        value_expected = not value_expected and command is not None and takes_value(command, arg)
+    return segments
+
+def main(argv=None):
+    """主函数：按顺序在同一进程中执行串联的子命令"""
+    argv = sys.argv[1:] if argv is None else argv
+    parser = build_parser(argv)
+    segments = split_commands(argv, subcommand_parsers(parser))
+    stages = [parser.parse_args(segment) for segment in segments] or [parser.parse_args(argv)]
+
+    context = PipelineContext()
+    for args in stages:
+        args.func(args, context)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+相邻两次爬取之间的变更事件
+功能：
+1. 以作品ID为键（没有作品ID时用书名+作者），把上一次快照建成哈希表，用本次结果逐条探测（哈希连接）
+2. 输出紧凑的JSONL变更事件：新上榜、下榜、排名变化、现价升降、书名/作者/分类/原价/字数变化
+3. 每次爬取后追加到changes.jsonl并更新快照，下游只需读取变更而不必比较整份CSV
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from collections import Counter
+
+from book_record import Book
+from book_text import book_key
+
+# 变更事件流和快照目录
+CHANGES_FILE = 'changes.jsonl'
+SNAPSHOT_DIR = 'snapshots'
+# 除排名和现价外，变化时输出updated事件的字段（事件字段名 -> Book属性）
+TRACKED_FIELDS = {'书名': 'title', '作者': 'author', '分类': 'category', '原价': 'original_price', '字数': 'word_count'}
+
+def snapshot_key(works_id, title, author):
+    """快照键：优先作品ID"""
+    return str(works_id) if works_id else book_key(title or '', author or '')
+
+def book_snapshot(book):
+    """一本书在快照中保存的字段"""
+    record = {'rank': book.rank, 'current_price': book.current_price}
+    for attr in TRACKED_FIELDS.values():
+        record[attr] = getattr(book, attr)
+    return record
+
+def diff_snapshots(previous, current, covered_rank=None):
+    """
+    比较两个快照 {键: 记录}，返回变更事件列表
+    covered_rank: 本次爬取覆盖的最大排名；上次排名超出该范围的书没有被观察到，不算下榜
+    """
+    events = []
+    for key, new in current.items():
+        old = previous.get(key)
+        if old is None:
+            events.append({'type': 'added', 'key': key, 'title': new['title'], 'rank': new['rank'],
+                           'current_price': new['current_price']})
+            continue
+        if old['rank'] != new['rank']:
+            events.append({'type': 'rank', 'key': key, 'title': new['title'], 'old_rank': old['rank'],
+                           'new_rank': new['rank'], 'delta': old['rank'] - new['rank']})
+        if old['current_price'] != new['current_price'] and None not in (old['current_price'], new['current_price']):
+            events.append({'type': 'price_drop' if new['current_price'] < old['current_price'] else 'price_rise',
+                           'key': key, 'title': new['title'], 'old_price': old['current_price'],
+                           'new_price': new['current_price'],
+                           'change': round(new['current_price'] - old['current_price'], 2)})
+        changed = {field: [old.get(attr), new[attr]] for field, attr in TRACKED_FIELDS.items()
+                   if old.get(attr) != new[attr]}
+        if changed:
+            events.append({'type': 'updated', 'key': key, 'title': new['title'], 'changes': changed})
+
+    for key, old in previous.items():
+        if key in current:
+            continue
+        if covered_rank is None or (isinstance(old['rank'], int) and old['rank'] <= covered_rank):
+            events.append({'type': 'removed', 'key': key, 'title': old['title'], 'last_rank': old['rank']})
+    return events
+
+def books_to_snapshot(books):
+    """Book列表 -> 快照 {键: 记录}"""
+    return {snapshot_key(book.works_id, book.title, book.author): book_snapshot(book) for book in books}
+
+def snapshot_path(snapshot_dir, category_id, sort):
+    return os.path.join(snapshot_dir, f'{category_id}_{sort}.json')
+
+def load_snapshot(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_snapshot(snapshot, path):
+    """先写临时文件再替换，避免中断时损坏快照"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+def record_changes(books, category_id, sort, changes_file=CHANGES_FILE, snapshot_dir=SNAPSHOT_DIR):
+    """
+    与该分类、排序的上一次快照比较，把变更事件追加到changes_file并更新快照
+    第一次爬取只建立快照，不输出事件，返回None；否则返回 {事件类型: 数量}
+    """
+    # 列表页解析依赖bs4，导入较慢，用到时再导入（douban.py启动时会导入本模块）
+    from book_extractor import BOOKS_PER_PAGE
+
+    path = snapshot_path(snapshot_dir, category_id, sort)
+    previous = load_snapshot(path)
+    current = books_to_snapshot(books)
+    # 本次爬取覆盖的排名范围按整页计算
+    ranks = [book.rank for book in books if isinstance(book.rank, int)]
+    covered_rank = -(-max(ranks) // BOOKS_PER_PAGE) * BOOKS_PER_PAGE if ranks else 0
+
+    counts = None
+    if previous is not None:
+        events = diff_snapshots(previous, current, covered_rank)
+        counts = Counter(event['type'] for event in events)
+        run = time.strftime('%Y-%m-%d %H:%M:%S')
+        with open(changes_file, 'a', encoding='utf-8') as f:
+            for event in events:
+                event = {'run': run, 'category_id': category_id, 'sort': sort, **event}
+                f.write(json.dumps(event, ensure_ascii=False, separators=(',', ':')) + '\n')
+        # 超出本次爬取范围的书没有被观察到，保留在快照中
+        for key, old in previous.items():
+            if key not in current and isinstance(old['rank'], int) and old['rank'] > covered_rank:
+                current[key] = old
+    save_snapshot(current, path)
+    return counts
+
+def format_counts(counts):
+    """事件数量的简短说明"""
+    if counts is None:
+        return '首次爬取，已建立快照'
+    names = {'added': '新上榜', 'removed': '下榜', 'rank': '排名变化', 'price_drop': '降价',
+             'price_rise': '涨价', 'updated': '信息变化'}
+    return '，'.join(f"{names.get(kind, kind)} {count}" for kind, count in counts.items()) or '无变化'
+
+def read_books(csv_file):
+    with open(csv_file, 'r', encoding='utf-8-sig', newline='') as f:
+        return [Book.from_row(row) for row in csv.DictReader(f)]
+
+def main():
+    """主函数：直接比较两个CSV文件"""
+    parser = argparse.ArgumentParser(description='比较两次爬取结果，输出JSONL变更事件')
+    parser.add_argument('old', help='上一次的CSV文件')
+    parser.add_argument('new', help='本次的CSV文件')
+    parser.add_argument('--output', help='事件输出文件 (默认: 标准输出)')
+    args = parser.parse_args()
+
+    events = diff_snapshots(books_to_snapshot(read_books(args.old)), books_to_snapshot(read_books(args.new)))
+    lines = [json.dumps(event, ensure_ascii=False, separators=(',', ':')) for event in events]
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.writelines(line + '\n' for line in lines)
+        counts = Counter(event['type'] for event in events)
+        print(f" {len(events)} 个变更事件（{format_counts(counts)}）已保存至 {args.output}")
+    else:
+        print('\n'.join(lines))
+
+if __name__ == "__main__":
+    main()
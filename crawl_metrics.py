@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+爬虫性能指标采集
+功能：
+1. 各阶段耗时直方图（页面加载、等待、解析、提取、图片下载等）：每个阶段只保存固定的分桶计数和
+   次数、总和、最小、最大值，长时间运行内存不增长；分位数由细分桶估算（相对误差约QUANTILE_GROWTH-1）
+2. 失败、空页等计数器和传输字节数
+3. 导出JSON汇总和Prometheus文本格式
+4. 子进程中采集的指标可通过snapshot/merge合并
+"""
+
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# 直方图分桶上界（秒），与Prometheus的le标签对应
+HISTOGRAM_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# 估算分位数用的细分桶：从QUANTILE_MIN秒起按QUANTILE_GROWTH倍递增到HISTOGRAM_BUCKETS的最大值，
+# 并包含HISTOGRAM_BUCKETS本身，导出的分桶计数是精确的
+QUANTILE_MIN = 1e-4
+QUANTILE_GROWTH = 1.1
+# 指标名前缀
+METRIC_PREFIX = 'douban_crawler'
+
+def quantile_bounds():
+    """细分桶上界（升序）"""
+    bounds = set(HISTOGRAM_BUCKETS)
+    bound = QUANTILE_MIN
+    while bound < HISTOGRAM_BUCKETS[-1]:
+        bounds.add(round(bound, 6))
+        bound *= QUANTILE_GROWTH
+    return tuple(sorted(bounds))
+
+BUCKET_BOUNDS = quantile_bounds()
+# HISTOGRAM_BUCKETS各上界在BUCKET_BOUNDS中的位置
+EXPORT_POSITIONS = tuple(BUCKET_BOUNDS.index(bound) for bound in HISTOGRAM_BUCKETS)
+
+class StageTiming:
+    __slots__ = ('count', 'total', 'min', 'max', 'buckets')
+
+    def __init__(self):
+        """一个阶段的耗时：次数、总和、最小、最大值和各细分桶的次数（最后一桶为超出最大上界的）"""
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+
+    def to_dict(self):
+        """可序列化的副本，分桶只保存非零项"""
+        return {'count': self.count, 'total': self.total, 'min': self.min, 'max': self.max,
+                'buckets': {i: n for i, n in enumerate(self.buckets) if n}}
+
+    def merge(self, data):
+        """合并另一个StageTiming的to_dict()"""
+        self.count += data['count']
+        self.total += data['total']
+        self.min = min(self.min, data['min'])
+        self.max = max(self.max, data['max'])
+        for i, n in data['buckets'].items():
+            self.buckets[int(i)] += n
+
+    def quantile(self, q):
+        """分位数估算：找到所在的细分桶，在桶内按次数线性插值（与Prometheus的histogram_quantile相同），并限制在最小、最大值之间"""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.buckets):
+            if n and cumulative + n >= target:
+                lower = max(BUCKET_BOUNDS[i - 1] if i > 0 else 0.0, self.min)
+                upper = min(BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max, self.max)
+                return lower + (upper - lower) * (target - cumulative) / n
+            cumulative += n
+        return self.max
+
+    def cumulative_buckets(self):
+        """HISTOGRAM_BUCKETS各上界的累计次数 {上界: 次数}"""
+        counts, cumulative, position = {}, 0, 0
+        for bound, end in zip(HISTOGRAM_BUCKETS, EXPORT_POSITIONS):
+            cumulative += sum(self.buckets[position:end + 1])
+            position = end + 1
+            counts[str(bound)] = cumulative
+        return counts
+
+class CrawlMetrics:
+    def __init__(self):
+        """初始化空的指标集合"""
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.timings = {}     # 阶段 -> StageTiming
+        self.counters = {}    # 计数器名 -> 数值
+        self.bytes = {}       # 字节计数名 -> 字节数
+
+    @contextmanager
+    def timer(self, stage):
+        """统计代码块耗时，异常时同样记录"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def observe(self, stage, seconds):
+        """记录一次阶段耗时"""
+        with self._lock:
+            timing = self.timings.get(stage)
+            if timing is None:
+                timing = self.timings[stage] = StageTiming()
+            timing.observe(seconds)
+
+    def inc(self, name, value=1):
+        """计数器加一"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_bytes(self, name, size):
+        """累加传输字节数"""
+        with self._lock:
+            self.bytes[name] = self.bytes.get(name, 0) + size
+
+    def snapshot(self):
+        """原始指标的可序列化副本（可跨进程传递后合并）"""
+        with self._lock:
+            return {
+                'timings': {stage: timing.to_dict() for stage, timing in self.timings.items()},
+                'counters': dict(self.counters),
+                'bytes': dict(self.bytes),
+            }
+
+    def merge(self, snapshot):
+        """合并另一个进程或实例的snapshot()"""
+        with self._lock:
+            for stage, data in snapshot['timings'].items():
+                self.timings.setdefault(stage, StageTiming()).merge(data)
+            for name, value in snapshot['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for name, size in snapshot['bytes'].items():
+                self.bytes[name] = self.bytes.get(name, 0) + size
+
+    def summary(self):
+        """生成汇总字典：每个阶段的次数、总耗时、均值、分位数（由细分桶估算）和分桶计数"""
+        stages = {}
+        with self._lock:
+            for stage, timing in self.timings.items():
+                stages[stage] = {
+                    'count': timing.count,
+                    'total_seconds': round(timing.total, 6),
+                    'mean_seconds': round(timing.total / timing.count, 6),
+                    'p50_seconds': round(timing.quantile(0.5), 6),
+                    'p90_seconds': round(timing.quantile(0.9), 6),
+                    'p99_seconds': round(timing.quantile(0.99), 6),
+                    'max_seconds': round(timing.max, 6),
+                    'buckets': timing.cumulative_buckets(),
+                }
+            counters = dict(self.counters)
+            byte_counts = dict(self.bytes)
+
+        return {
+            'started_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at)),
+            'elapsed_seconds': round(time.time() - self.started_at, 3),
+            'stages': stages,
+            'counters': counters,
+            'bytes': byte_counts,
+        }
+
+    def write_json(self, path):
+        """保存JSON汇总"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+
+    def write_prometheus(self, path):
+        """保存Prometheus文本格式（可供node_exporter的textfile收集器读取）"""
+        summary = self.summary()
+        lines = [
+            f"# HELP {METRIC_PREFIX}_stage_seconds Time spent in each crawler stage.",
+            f"# TYPE {METRIC_PREFIX}_stage_seconds histogram",
+        ]
+        for stage, stats in summary['stages'].items():
+            for bound, count in stats['buckets'].items():
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {stats["count"]}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {stats["total_seconds"]}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+
+        lines.append(f"# HELP {METRIC_PREFIX}_events_total Crawler event counters.")
+        lines.append(f"# TYPE {METRIC_PREFIX}_events_total counter")
+        for name, value in summary['counters'].items():
+            lines.append(f'{METRIC_PREFIX}_events_total{{event="{name}"}} {value}')
+
+        lines.append(f"# HELP {METRIC_PREFIX}_bytes_total Bytes transferred by the crawler.")
+        lines.append(f"# TYPE {METRIC_PREFIX}_bytes_total counter")
+        for name, value in summary['bytes'].items():
+            lines.append(f'{METRIC_PREFIX}_bytes_total{{kind="{name}"}} {value}')
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def format_table(self):
+        """生成便于终端查看的阶段耗时表"""
+        summary = self.summary()
+        lines = [f"{'阶段':<18}{'次数':>6}{'总耗时(s)':>12}{'平均(ms)':>12}{'P90(ms)':>12}"]
+        stages = sorted(summary['stages'].items(), key=lambda item: -item[1]['total_seconds'])
+        for stage, stats in stages:
+            lines.append(f"{stage:<20}{stats['count']:>6}{stats['total_seconds']:>12.3f}"
+                         f"{stats['mean_seconds'] * 1000:>12.1f}{stats['p90_seconds'] * 1000:>12.1f}")
+        return '\n'.join(lines)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+豆瓣读书多分类爬取调度
+功能：
+1. 一次运行爬取多个分类ID、多种排序方式
+2. 所有(分类, 排序, 页码)任务共享一个工作线程池和全局限速器；各列表先抓第一页确定实际页数，
+   连续EMPTY_PAGE_LIMIT页无数据时取消该列表其余还没开始的任务（与douban.py相同的规则）
+3. 每个分类单独输出CSV（附带分类ID和排序字段）和封面目录，变更事件追加到输出目录下的changes.jsonl
+4. 抓到的页面与douban.py一样压缩存档（page_archive/），可离线重新解析
+"""
+
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import douban
+from book_extractor import BOOKS_PER_PAGE
+from page_archive import ARCHIVE_DIR as PAGE_ARCHIVE_DIR
+from crawl_diff import record_changes, format_counts, CHANGES_FILE, SNAPSHOT_DIR
+from douban import debug_print
+
+# 输出目录
+OUTPUT_DIR = 'output'
+# 默认工作线程数（Selenium模式下每个线程一个浏览器）
+DEFAULT_WORKERS = 3
+# 默认全局限速：每秒页面请求数
+DEFAULT_RATE = 0.5
+# 输出CSV额外字段
+ORCHESTRATOR_FIELDS = ['分类ID', '排序'] + douban.CSV_FIELDS
+
+class RateLimiter:
+    def __init__(self, rate, burst=1):
+        """令牌桶限速器，rate: 每秒令牌数，burst: 桶容量"""
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """获取一个令牌，不足时等待"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class CrawlOrchestrator:
+    def __init__(self, categories, sorts, pages, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE,
+                 use_selenium=True, output_dir=OUTPUT_DIR):
+        """categories: 分类ID列表; sorts: 排序方式列表; pages: 每个分类爬取的页数"""
+        self.categories = categories
+        self.sorts = sorts
+        self.pages = pages
+        self.workers = workers
+        self.limiter = RateLimiter(rate)
+        self.use_selenium = use_selenium
+        self.output_dir = output_dir
+        self._local = threading.local()
+        self._drivers = []
+        self._drivers_lock = threading.Lock()
+
+    def _get_driver(self):
+        """每个工作线程复用自己的WebDriver"""
+        driver = getattr(self._local, 'driver', None)
+        if driver is None:
+            driver = douban.init_webdriver()
+            if driver is None:
+                raise RuntimeError("无法初始化WebDriver")
+            self._local.driver = driver
+            with self._drivers_lock:
+                self._drivers.append(driver)
+        return driver
+
+    def image_dir(self, category_id, sort):
+        return os.path.join(self.output_dir, f'images_{category_id}_{sort}')
+
+    def csv_path(self, category_id, sort):
+        return os.path.join(self.output_dir, f'books_{category_id}_{sort}.csv')
+
+    def _crawl_page(self, category_id, sort, page_num):
+        """工作线程：爬取一页，返回 (页面HTML, 书籍列表)，获取失败时为 (None, None)"""
+        url = douban.build_page_url(page_num, category_id, sort)
+        image_dir = self.image_dir(category_id, sort)
+        self.limiter.acquire()
+        with douban.METRICS.timer('page_total'):
+            if self.use_selenium:
+                html_content = douban.load_page_selenium(url, self._get_driver(), page_num)
+            else:
+                html_content = douban.load_page(url, page_num)
+            if html_content is None:
+                return None, None
+            start_rank = (page_num - 1) * BOOKS_PER_PAGE + 1
+            return html_content, douban.extract_page_books(html_content, start_rank, image_dir)
+
+    @staticmethod
+    def _empty_run_end(empty_pages, page_num):
+        """page_num所在的连续EMPTY_PAGE_LIMIT个无数据页的最后一页，没有时返回None"""
+        limit = douban.EMPTY_PAGE_LIMIT
+        for start in range(page_num - limit + 1, page_num + 1):
+            if start >= 1 and all(p in empty_pages for p in range(start, start + limit)):
+                return start + limit - 1
+        return None
+
+    def _stop_after_empty_pages(self, key, page_num, empty_pages, last_pages, futures):
+        """连续EMPTY_PAGE_LIMIT页无数据时已到列表末尾，取消该列表之后还没开始的任务"""
+        end = self._empty_run_end(empty_pages, page_num)
+        if end is None or end >= last_pages[key]:
+            return
+        cancelled = [future for future, (other, p) in futures.items()
+                     if other == key and p > end and future.cancel()]
+        for future in cancelled:
+            del futures[future]
+        print(f" 分类{key[0]}/{key[1]} 连续 {douban.EMPTY_PAGE_LIMIT} 页无数据，已到列表末尾，"
+              f"取消 {len(cancelled)} 个未开始的任务")
+        douban.METRICS.inc('pages_skipped', len(cancelled))
+        last_pages[key] = end
+
+    def run(self):
+        """执行全部任务，返回 {(分类ID, 排序): 书籍列表}"""
+        lists = [(c, s) for c in self.categories for s in self.sorts]
+        for category_id, sort in lists:
+            os.makedirs(self.image_dir(category_id, sort), exist_ok=True)
+
+        print(f" 共 {len(self.categories)} 个分类 x {len(self.sorts)} 种排序，每个最多 {self.pages} 页，"
+              f"{self.workers} 个工作线程")
+        results = {key: {} for key in lists}
+        last_pages = {key: self.pages for key in lists}
+        empty_pages = {key: set() for key in lists}
+        done = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = {}
+
+                def submit(key, page_num):
+                    futures[executor.submit(self._crawl_page, *key, page_num)] = (key, page_num)
+
+                # 先抓各列表的第一页，确定实际页数后再提交其余各页
+                for key in lists:
+                    submit(key, 1)
+                while futures:
+                    finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        key, page_num = futures.pop(future)
+                        category_id, sort = key
+                        done += 1
+                        try:
+                            html_content, books = future.result()
+                        except Exception as e:
+                            debug_print(f"分类{category_id}/{sort} 第{page_num}页出错: {e}", "ERROR")
+                            html_content, books = None, None
+                        if page_num == 1:
+                            if html_content is not None:
+                                last_pages[key] = douban.cap_pages(html_content, self.pages)
+                            for next_page in range(2, last_pages[key] + 1):
+                                submit(key, next_page)
+                        if books is None:
+                            douban.METRICS.inc('pages_failed')
+                            status = "失败"
+                        elif not books:
+                            douban.METRICS.inc('pages_empty')
+                            status = "无数据"
+                            empty_pages[key].add(page_num)
+                        else:
+                            douban.METRICS.inc('pages_ok')
+                            results[key][page_num] = books
+                            status = f"获取 {len(books)} 本书"
+                        print(f"[{done}/{done + len(futures)}] 分类{category_id}/{sort} 第{page_num}页: {status}")
+                        if books == []:
+                            self._stop_after_empty_pages(key, page_num, empty_pages[key], last_pages, futures)
+        finally:
+            for driver in self._drivers:
+                driver.quit()
+
+        # 按页码顺序合并，保证热度排名有序
+        return {key: [book for page in sorted(pages) for book in pages[page]]
+                for key, pages in results.items()}
+
+    def save(self, results):
+        """每个分类单独保存CSV，附带分类ID和排序字段"""
+        for (category_id, sort), books in results.items():
+            if not books:
+                print(f" 分类{category_id}/{sort} 没有获取到数据")
+                continue
+            for book in books:
+                book.category_id = category_id
+                book.sort = sort
+            path = self.csv_path(category_id, sort)
+            douban.save_to_csv(books, path, ORCHESTRATOR_FIELDS)
+            counts = record_changes(books, category_id, sort, os.path.join(self.output_dir, CHANGES_FILE),
+                                    os.path.join(self.output_dir, SNAPSHOT_DIR))
+            print(f" 分类{category_id}/{sort}: 保存 {len(books)} 本书到 {path}（{format_counts(counts)}）")
+
+def parse_categories(value):
+    """解析分类列表：逗号分隔的ID，或以@开头的文件（每行一个ID，#后为注释）"""
+    if value.startswith('@'):
+        with open(value[1:], 'r', encoding='utf-8') as f:
+            items = [line.split('#')[0].strip() for line in f]
+    else:
+        items = [item.strip() for item in value.split(',')]
+    return [int(item) for item in items if item]
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='豆瓣读书多分类爬取调度')
+    parser.add_argument('--categories', required=True,
+                        help='分类ID，逗号分隔（如 105,106）或 @文件路径')
+    parser.add_argument('--sorts', default=douban.DEFAULT_SORT, help=f'排序方式，逗号分隔 (默认: {douban.DEFAULT_SORT})')
+    parser.add_argument('--pages', type=int, default=douban.MAX_PAGES, help=f'每个分类爬取页数 (默认: {douban.MAX_PAGES})')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help=f'工作线程数 (默认: {DEFAULT_WORKERS})')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help=f'全局限速，每秒页面请求数，0为不限速 (默认: {DEFAULT_RATE})')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help=f'输出目录 (默认: {OUTPUT_DIR})')
+    parser.add_argument('--page-archive', default=PAGE_ARCHIVE_DIR,
+                        help=f'抓到的页面压缩存档到该目录 (默认: {PAGE_ARCHIVE_DIR})')
+    parser.add_argument('--no-page-archive', action='store_true', help='不存档抓到的页面')
+    parser.add_argument('--no-selenium', action='store_true', help='使用requests模式')
+    parser.add_argument('--debug', action='store_true', help='开启调试模式')
+    args = parser.parse_args()
+
+    douban.DEBUG_MODE = args.debug
+    use_selenium = not args.no_selenium
+    if use_selenium and not douban.SELENIUM_AVAILABLE:
+        print(" 错误：Selenium不可用，请安装selenium或使用 --no-selenium")
+        return
+
+    orchestrator = CrawlOrchestrator(parse_categories(args.categories),
+                                     [s.strip() for s in args.sorts.split(',') if s.strip()],
+                                     args.pages, args.workers, args.rate, use_selenium, args.output_dir)
+    os.makedirs(args.output_dir, exist_ok=True)
+    douban.open_page_archive(None if args.no_page_archive else args.page_archive)
+    try:
+        results = orchestrator.run()
+    finally:
+        douban.close_page_archive()
+    orchestrator.save(results)
+
+    metrics_file = os.path.join(args.output_dir, douban.METRICS_FILE)
+    douban.METRICS.write_json(metrics_file)
+    print(f" 性能指标已保存至 {metrics_file}")
+
+if __name__ == "__main__":
+    main()
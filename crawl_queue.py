@@ -0,0 +1,407 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+多机分布式爬取任务队列
+功能：
+1. 协调者把(分类ID, 排序, 页码)任务写入共享队列：Redis（多台机器共享），
+   或SQLite文件（本机多进程，不需要Redis时的替代实现）
+2. 各机器上的工作进程各自启动浏览器，领取任务（带租约）后调用fetch_book_data_selenium爬取，结果写回队列；
+   抓到的页面存档到本机的page_archive/（每个工作进程单独一个轮次）
+3. 工作进程崩溃或断网时，租约到期的任务自动重新排队，超过最大尝试次数标记为失败；
+   租约过期后迟到的结果不会覆盖新持有者的结果
+4. 协调者汇总各页结果，按分类保存CSV（与crawl_orchestrator.py格式一致）
+"""
+
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import time
+
+# 尝试导入redis，如果不可用则只能使用SQLite队列
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# 默认队列：SQLite文件路径，或 redis://host:port/db
+DEFAULT_QUEUE = 'crawl_queue.db'
+# Redis键前缀
+REDIS_PREFIX = 'douban:crawl'
+# 租约时长（秒）：超过该时间没有提交结果的任务重新排队
+DEFAULT_LEASE = 300
+# 每个任务最多尝试次数
+MAX_ATTEMPTS = 3
+# 队列为空但还有其他进程持有的任务时，轮询间隔（秒）
+POLL_INTERVAL = 5
+# 每个工作进程两次请求之间的间隔（秒）
+DEFAULT_DELAY = 2
+# 连续失败多少次后重启浏览器
+RESTART_AFTER_FAILURES = 3
+
+class SQLiteJobQueue:
+    def __init__(self, path=DEFAULT_QUEUE, max_attempts=MAX_ATTEMPTS):
+        """SQLite任务队列：所有状态变更都在IMMEDIATE事务中完成，多个进程可同时领取"""
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                category_id INTEGER NOT NULL,
+                sort TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                lease_until REAL,
+                error TEXT,
+                result TEXT,
+                updated_at REAL,
+                UNIQUE (category_id, sort, page)
+            )''')
+
+    def _transaction(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+
+    def put(self, jobs):
+        """加入任务 [(分类ID, 排序, 页码), ...]，已存在的任务不重复加入，返回新加入数"""
+        self._transaction()
+        before = self.conn.total_changes
+        self.conn.executemany('INSERT OR IGNORE INTO jobs (category_id, sort, page, updated_at) VALUES (?, ?, ?, ?)',
+                              [(c, s, p, time.time()) for c, s, p in jobs])
+        self.conn.execute('COMMIT')
+        return self.conn.total_changes - before
+
+    def lease(self, worker, lease_seconds=DEFAULT_LEASE):
+        """领取一个任务，没有可领取的任务时返回None"""
+        now = time.time()
+        self._transaction()
+        try:
+            # 租约到期的任务：未用完尝试次数的重新排队，否则标记失败
+            self.conn.execute("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                              "error = '租约过期', worker = NULL, updated_at = ? "
+                              "WHERE status = 'leased' AND lease_until < ?", (self.max_attempts, now, now))
+            row = self.conn.execute("SELECT id, category_id, sort, page, attempts FROM jobs WHERE status = 'pending' "
+                                    "ORDER BY page, id LIMIT 1").fetchone()
+            if row is None:
+                self.conn.execute('COMMIT')
+                return None
+            self.conn.execute("UPDATE jobs SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                              "updated_at = ? WHERE id = ?", (worker, now + lease_seconds, now, row[0]))
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        job_id, category_id, sort, page, attempts = row
+        return {'id': job_id, 'category_id': category_id, 'sort': sort, 'page': page, 'attempts': attempts + 1}
+
+    def complete(self, job, worker, rows):
+        """提交结果；租约已被他人接手时返回False，结果作废"""
+        cursor = self.conn.execute("UPDATE jobs SET status = 'done', result = ?, error = NULL, updated_at = ? "
+                                   "WHERE id = ? AND worker = ? AND status = 'leased'",
+                                   (json.dumps(rows, ensure_ascii=False), time.time(), job['id'], worker))
+        return cursor.rowcount == 1
+
+    def fail(self, job, worker, error):
+        """报告失败：未用完尝试次数的重新排队"""
+        cursor = self.conn.execute("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                                   "error = ?, worker = NULL, updated_at = ? "
+                                   "WHERE id = ? AND worker = ? AND status = 'leased'",
+                                   (self.max_attempts, error, time.time(), job['id'], worker))
+        return cursor.rowcount == 1
+
+    def stats(self):
+        """各状态的任务数"""
+        counts = dict(self.conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status'))
+        return {status: counts.get(status, 0) for status in ('pending', 'leased', 'done', 'failed')}
+
+    def results(self):
+        """已完成任务的结果 [(分类ID, 排序, 页码, 行列表), ...]"""
+        rows = self.conn.execute("SELECT category_id, sort, page, result FROM jobs WHERE status = 'done'")
+        return [(category_id, sort, page, json.loads(result)) for category_id, sort, page, result in rows]
+
+    def failures(self):
+        """失败的任务 [(分类ID, 排序, 页码, 错误), ...]"""
+        return self.conn.execute("SELECT category_id, sort, page, error FROM jobs WHERE status = 'failed'").fetchall()
+
+    def reset(self):
+        """清空队列"""
+        self.conn.execute('DELETE FROM jobs')
+
+    def close(self):
+        self.conn.close()
+
+# Redis队列的状态变更用Lua脚本保证原子性；时间取Redis服务器时间，避免各机器时钟不一致
+REDIS_NOW = "local t = redis.call('TIME') local now = tonumber(t[1]) + tonumber(t[2]) / 1000000 "
+# KEYS: pending, leased, owner, attempts, failed; ARGV: worker, 租约秒数, 最大尝试次数
+REDIS_LEASE = REDIS_NOW + """
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now)) do
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('HDEL', KEYS[3], id)
+    if tonumber(redis.call('HGET', KEYS[4], id) or '0') >= tonumber(ARGV[3]) then
+        redis.call('HSET', KEYS[5], id, '租约过期')
+    else
+        redis.call('RPUSH', KEYS[1], id)
+    end
+end
+local id = redis.call('LPOP', KEYS[1])
+if not id then return false end
+redis.call('ZADD', KEYS[2], now + tonumber(ARGV[2]), id)
+redis.call('HSET', KEYS[3], id, ARGV[1])
+return {id, redis.call('HINCRBY', KEYS[4], id, 1)}
+"""
+# KEYS: leased, owner, results; ARGV: id, worker, 结果JSON
+REDIS_COMPLETE = """
+if redis.call('HGET', KEYS[2], ARGV[1]) ~= ARGV[2] or not redis.call('ZSCORE', KEYS[1], ARGV[1]) then return 0 end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[3])
+return 1
+"""
+# KEYS: pending, leased, owner, attempts, failed; ARGV: id, worker, 错误, 最大尝试次数
+REDIS_FAIL = """
+if redis.call('HGET', KEYS[3], ARGV[1]) ~= ARGV[2] or not redis.call('ZSCORE', KEYS[2], ARGV[1]) then return 0 end
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+if tonumber(redis.call('HGET', KEYS[4], ARGV[1]) or '0') >= tonumber(ARGV[4]) then
+    redis.call('HSET', KEYS[5], ARGV[1], ARGV[3])
+else
+    redis.call('RPUSH', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+class RedisJobQueue:
+    def __init__(self, url, max_attempts=MAX_ATTEMPTS, prefix=REDIS_PREFIX):
+        """Redis任务队列：pending列表 + leased有序集合（分数为租约到期时间）"""
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("使用Redis队列需要安装redis")
+        self.max_attempts = max_attempts
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.keys = {name: f'{prefix}:{name}' for name in
+                     ('jobs', 'pending', 'leased', 'owner', 'attempts', 'results', 'failed')}
+        self._lease = self.client.register_script(REDIS_LEASE)
+        self._complete = self.client.register_script(REDIS_COMPLETE)
+        self._fail = self.client.register_script(REDIS_FAIL)
+
+    def _state_keys(self):
+        return [self.keys[name] for name in ('pending', 'leased', 'owner', 'attempts', 'failed')]
+
+    def put(self, jobs):
+        """加入任务 [(分类ID, 排序, 页码), ...]，已存在的任务不重复加入，返回新加入数"""
+        added = 0
+        for category_id, sort, page in jobs:
+            job_id = f'{category_id}:{sort}:{page}'
+            spec = json.dumps({'category_id': category_id, 'sort': sort, 'page': page})
+            if self.client.hsetnx(self.keys['jobs'], job_id, spec):
+                self.client.rpush(self.keys['pending'], job_id)
+                added += 1
+        return added
+
+    def lease(self, worker, lease_seconds=DEFAULT_LEASE):
+        """领取一个任务，没有可领取的任务时返回None"""
+        leased = self._lease(keys=self._state_keys(), args=[worker, lease_seconds, self.max_attempts])
+        if not leased:
+            return None
+        job_id, attempts = leased
+        job = json.loads(self.client.hget(self.keys['jobs'], job_id))
+        job.update(id=job_id, attempts=int(attempts))
+        return job
+
+    def complete(self, job, worker, rows):
+        """提交结果；租约已被他人接手时返回False，结果作废"""
+        keys = [self.keys['leased'], self.keys['owner'], self.keys['results']]
+        return bool(self._complete(keys=keys, args=[job['id'], worker, json.dumps(rows, ensure_ascii=False)]))
+
+    def fail(self, job, worker, error):
+        """报告失败：未用完尝试次数的重新排队"""
+        return bool(self._fail(keys=self._state_keys(), args=[job['id'], worker, error, self.max_attempts]))
+
+    def stats(self):
+        """各状态的任务数"""
+        return {
+            'pending': self.client.llen(self.keys['pending']),
+            'leased': self.client.zcard(self.keys['leased']),
+            'done': self.client.hlen(self.keys['results']),
+            'failed': self.client.hlen(self.keys['failed']),
+        }
+
+    def _with_spec(self, items):
+        specs = self.client.hgetall(self.keys['jobs'])
+        for job_id, value in items.items():
+            spec = json.loads(specs[job_id])
+            yield spec['category_id'], spec['sort'], spec['page'], value
+
+    def results(self):
+        """已完成任务的结果 [(分类ID, 排序, 页码, 行列表), ...]"""
+        return [(c, s, p, json.loads(rows)) for c, s, p, rows in
+                self._with_spec(self.client.hgetall(self.keys['results']))]
+
+    def failures(self):
+        """失败的任务 [(分类ID, 排序, 页码, 错误), ...]"""
+        return list(self._with_spec(self.client.hgetall(self.keys['failed'])))
+
+    def reset(self):
+        """清空队列"""
+        self.client.delete(*self.keys.values())
+
+    def close(self):
+        self.client.close()
+
+def open_queue(url=DEFAULT_QUEUE, max_attempts=MAX_ATTEMPTS):
+    """redis://开头时使用Redis队列，否则视为SQLite文件路径"""
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisJobQueue(url, max_attempts)
+    return SQLiteJobQueue(url, max_attempts)
+
+def run_worker(queue, worker, use_selenium=True, lease_seconds=DEFAULT_LEASE, delay=DEFAULT_DELAY,
+               image_dir=None):
+    """工作进程：循环领取任务并爬取，所有任务完成后返回本进程完成的任务数"""
+    import douban
+    from book_extractor import BOOKS_PER_PAGE
+
+    driver = None
+    if use_selenium:
+        driver = douban.init_webdriver()
+        if driver is None:
+            raise RuntimeError("无法初始化WebDriver")
+    done = 0
+    failures = 0
+    try:
+        while True:
+            job = queue.lease(worker, lease_seconds)
+            if job is None:
+                stats = queue.stats()
+                if stats['pending'] + stats['leased'] == 0:
+                    return done
+                # 其他进程持有的任务可能因租约过期重新排队，稍后再试
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            page_num = job['page']
+            url = douban.build_page_url(page_num, job['category_id'], job['sort'])
+            print(f" [{worker}] 分类{job['category_id']}/{job['sort']} 第{page_num}页（第{job['attempts']}次尝试）")
+            try:
+                with douban.METRICS.timer('page_total'):
+                    if driver:
+                        books = douban.fetch_book_data_selenium(url, driver, page_num, image_dir)
+                    else:
+                        books = douban.fetch_book_data(url, page_num, (page_num - 1) * BOOKS_PER_PAGE + 1,
+                                                       image_dir=image_dir)
+                error = '页面获取失败'
+            except Exception as e:
+                books, error = None, str(e)
+
+            if books is None:
+                douban.METRICS.inc('pages_failed')
+                queue.fail(job, worker, error)
+                failures += 1
+                if driver and failures >= RESTART_AFTER_FAILURES:
+                    print(f" [{worker}] 连续失败 {failures} 次，重启浏览器")
+                    driver.quit()
+                    driver = douban.init_webdriver()
+                    if driver is None:
+                        raise RuntimeError("无法重新初始化WebDriver")
+                    failures = 0
+            else:
+                failures = 0
+                douban.METRICS.inc('pages_ok' if books else 'pages_empty')
+                if queue.complete(job, worker, [book.to_row() for book in books]):
+                    done += 1
+                else:
+                    print(f" [{worker}] 第{page_num}页的租约已过期，结果作废")
+            time.sleep(delay)
+    finally:
+        if driver:
+            driver.quit()
+
+def collect(queue, output_dir):
+    """汇总队列中的结果，按分类保存CSV，返回 {(分类ID, 排序): Book列表}"""
+    from book_record import Book
+    from crawl_orchestrator import CrawlOrchestrator
+
+    pages = {}
+    for category_id, sort, page, rows in queue.results():
+        pages.setdefault((category_id, sort), {})[page] = rows
+    # 按页码顺序合并，保证热度排名有序
+    results = {key: [Book.from_row(row) for page in sorted(by_page) for row in by_page[page]]
+               for key, by_page in pages.items()}
+    os.makedirs(output_dir, exist_ok=True)
+    CrawlOrchestrator([], [], 0, output_dir=output_dir).save(results)
+    return results
+
+def main():
+    """主函数"""
+    from crawl_orchestrator import OUTPUT_DIR, parse_categories
+    from page_archive import ARCHIVE_DIR as PAGE_ARCHIVE_DIR
+
+    parser = argparse.ArgumentParser(description='多机分布式爬取任务队列')
+    parser.add_argument('--queue', default=DEFAULT_QUEUE,
+                        help=f'队列：SQLite文件路径或redis://host:port/db (默认: {DEFAULT_QUEUE})')
+    parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS, help=f'每个任务最多尝试次数 (默认: {MAX_ATTEMPTS})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    enqueue_parser = subparsers.add_parser('enqueue', help='协调者：加入爬取任务')
+    enqueue_parser.add_argument('--categories', required=True, help='分类ID，逗号分隔（如 105,106）或 @文件路径')
+    enqueue_parser.add_argument('--sorts', default='hot', help='排序方式，逗号分隔 (默认: hot)')
+    enqueue_parser.add_argument('--pages', type=int, default=3, help='每个分类爬取页数 (默认: 3)')
+    enqueue_parser.add_argument('--reset', action='store_true', help='先清空队列中已有的任务和结果')
+
+    worker_parser = subparsers.add_parser('worker', help='工作进程：领取任务并爬取')
+    worker_parser.add_argument('--worker-id', default=f'{socket.gethostname()}-{os.getpid()}',
+                               help='工作进程标识 (默认: 主机名-进程号)')
+    worker_parser.add_argument('--lease', type=float, default=DEFAULT_LEASE, help=f'租约时长秒数 (默认: {DEFAULT_LEASE})')
+    worker_parser.add_argument('--delay', type=float, default=DEFAULT_DELAY, help=f'两次请求间隔秒数 (默认: {DEFAULT_DELAY})')
+    worker_parser.add_argument('--image-dir', help='封面保存目录 (默认: images)')
+    worker_parser.add_argument('--no-selenium', action='store_true', help='使用requests模式')
+    worker_parser.add_argument('--page-archive', default=PAGE_ARCHIVE_DIR,
+                               help=f'抓到的页面压缩存档到该目录 (默认: {PAGE_ARCHIVE_DIR})')
+    worker_parser.add_argument('--no-page-archive', action='store_true', help='不存档抓到的页面')
+    worker_parser.add_argument('--debug', action='store_true', help='开启调试模式')
+
+    subparsers.add_parser('status', help='查看队列状态')
+
+    collect_parser = subparsers.add_parser('collect', help='协调者：汇总结果并按分类保存CSV')
+    collect_parser.add_argument('--output-dir', default=OUTPUT_DIR, help=f'输出目录 (默认: {OUTPUT_DIR})')
+    args = parser.parse_args()
+
+    queue = open_queue(args.queue, args.max_attempts)
+    try:
+        if args.command == 'enqueue':
+            if args.reset:
+                queue.reset()
+            sorts = [s.strip() for s in args.sorts.split(',') if s.strip()]
+            jobs = [(c, s, p) for c in parse_categories(args.categories) for s in sorts
+                    for p in range(1, args.pages + 1)]
+            print(f" 加入 {queue.put(jobs)} 个任务（共 {len(jobs)} 个，已存在的不重复加入）")
+        elif args.command == 'worker':
+            import douban
+            douban.DEBUG_MODE = args.debug
+            use_selenium = not args.no_selenium
+            if use_selenium and not douban.SELENIUM_AVAILABLE:
+                print(" 错误：Selenium不可用，请安装selenium或使用 --no-selenium")
+                return
+            # 同一目录可能有多个工作进程同时写入，轮次中带上工作进程标识
+            douban.open_page_archive(None if args.no_page_archive else args.page_archive,
+                                     f"{time.strftime('%Y%m%d-%H%M%S')}-{args.worker_id}")
+            try:
+                done = run_worker(queue, args.worker_id, use_selenium, args.lease, args.delay, args.image_dir)
+            finally:
+                douban.close_page_archive()
+            print(f" [{args.worker_id}] 队列已空，本进程完成 {done} 个任务")
+        elif args.command == 'collect':
+            results = collect(queue, args.output_dir)
+            print(f" 汇总 {sum(len(books) for books in results.values())} 本书")
+            for category_id, sort, page, error in queue.failures():
+                print(f" 失败: 分类{category_id}/{sort} 第{page}页: {error}")
+        stats = queue.stats()
+        print(f" 队列状态: 待领取 {stats['pending']}，进行中 {stats['leased']}，"
+              f"已完成 {stats['done']}，失败 {stats['failed']}")
+    finally:
+        queue.close()
+
+if __name__ == "__main__":
+    main()
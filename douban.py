@@ -1,45 +1,58 @@
 import requests
-from bs4 import BeautifulSoup
 import time
 import random
 import csv
 import os
 import sys
 import argparse
+import importlib.util
 
-# 尝试导入Selenium，如果不可用则使用备用方案
-try:
-    from selenium import webdriver
-    from selenium.webdriver.chrome.service import Service
-    from selenium.webdriver.chrome.options import Options
-    from selenium.webdriver.common.by import By
-    from selenium.webdriver.support.ui import WebDriverWait
-    from selenium.webdriver.support import expected_conditions as EC
-    from selenium.common.exceptions import TimeoutException, WebDriverException
-    from webdriver_manager.chrome import ChromeDriverManager
-    SELENIUM_AVAILABLE = True
-except ImportError:
-    SELENIUM_AVAILABLE = False
+from crawl_metrics import CrawlMetrics
+from book_record import intern_category
+from image_archive import ImageArchive
+from crawl_diff import record_changes, format_counts, CHANGES_FILE
+# 列表页解析（book_extractor，依赖bs4）、页面存档（page_archive，含压缩库）和解析进程池（parse_pipeline）
+# 导入较慢，在用到它们的函数中再导入
+
+# Selenium导入较慢，启动时只检查是否已安装，首次使用浏览器模式时再导入（见import_selenium）
+SELENIUM_AVAILABLE = all(importlib.util.find_spec(name) is not None
+                         for name in ('selenium', 'webdriver_manager'))
 
 # --- 配置 ---
-# 目标网址（使用热度排序）
-BASE_URL = "https://read.douban.com/category/105?sort=hot"
+# 目标网址（分类ID和排序方式可配置，默认计算机与互联网分类、热度排序）
+CATEGORY_URL = "https://read.douban.com/category/{category_id}?sort={sort}"
+DEFAULT_CATEGORY_ID = 105
+DEFAULT_SORT = 'hot'
+BASE_URL = CATEGORY_URL.format(category_id=DEFAULT_CATEGORY_ID, sort=DEFAULT_SORT)
 # 自定义请求头，模拟浏览器
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 }
 # 图片存储目录
 IMAGE_DIR = 'images'
+# 封面存档（image_archive.ImageArchive），设置后封面写入存档而不是IMAGE_DIR中的散落文件
+IMAGE_ARCHIVE = None
+# 列表页原始HTML存档（page_archive.PageArchive），由open_page_archive()打开
+PAGE_ARCHIVE = None
 # CSV文件路径
 CSV_FILE = 'books.csv'
+# CSV字段
+CSV_FIELDS = ['热度排名', '书名', '作者', '简介', '分类', '字数', '原价', '现价', '封面图片', '作品ID']
 # 爬取页数
 MAX_PAGES = 3  # 默认爬取3页
+# 连续这么多页没有数据时认为已到列表末尾，停止爬取
+EMPTY_PAGE_LIMIT = 2
+# 性能指标汇总文件
+METRICS_FILE = 'crawl_metrics.json'
 
 # --- 调试配置 ---
 DEBUG_MODE = False  # 设置为False可关闭所有调试输出
 SAVE_HTML = False   # 是否保存原始HTML文件用于调试
 USE_SELENIUM = True # 3默认使用
 
+# 各阶段耗时、计数器和传输字节数
+METRICS = CrawlMetrics()
+
 # --- 调试工具函数 ---
 def debug_print(message, level="INFO"):
     """
@@ -57,11 +70,33 @@ def debug_print(message, level="INFO"):
         prefix = prefix_map.get(level, "[调试]")
         print(f"{prefix} {message}")
 
+def import_selenium():
+    """
+    导入Selenium相关模块到模块全局，导入失败时返回False并回退到requests方案
+    """
+    global SELENIUM_AVAILABLE, webdriver, Service, Options, By, WebDriverWait, EC
+    global TimeoutException, WebDriverException, ChromeDriverManager
+    if not SELENIUM_AVAILABLE:
+        return False
+    try:
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.common.exceptions import TimeoutException, WebDriverException
+        from webdriver_manager.chrome import ChromeDriverManager
+    except ImportError as e:
+        debug_print(f"导入Selenium失败: {e}", "ERROR")
+        SELENIUM_AVAILABLE = False
+    return SELENIUM_AVAILABLE
+
 def create_selenium_driver():
     """
     创建Selenium WebDriver
     """
-    if not SELENIUM_AVAILABLE:
+    if not import_selenium():
         return None
     
     try:
@@ -88,25 +123,31 @@ def fetch_page_with_selenium(driver, url):
     """
     try:
         debug_print(f"使用Selenium加载页面: {url}")
-        driver.get(url)
+        with METRICS.timer('driver_get'):
+            driver.get(url)
         
         # 等待页面加载完成
         wait = WebDriverWait(driver, 10)
-        wait.until(EC.presence_of_element_located((By.CLASS_NAME, "works-list")))
+        with METRICS.timer('wait_works_list'):
+            wait.until(EC.presence_of_element_located((By.CLASS_NAME, "works-list")))
         
         # 等待一下确保动态内容加载完成
-        time.sleep(2)
-        
-        # 尝试滚动页面，触发懒加载
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(1)
+        with METRICS.timer('settle_sleep'):
+            time.sleep(2)
+            
+            # 尝试滚动页面，触发懒加载
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            time.sleep(1)
         
         # 获取页面源码
-        html_content = driver.page_source
+        with METRICS.timer('page_source'):
+            html_content = driver.page_source
+        METRICS.add_bytes('page_html', len(html_content.encode('utf-8')))
         debug_print(f"通过Selenium获取到页面内容，长度: {len(html_content)}", "SUCCESS")
         return html_content
         
     except TimeoutException:
+        METRICS.inc('page_timeouts')
         debug_print("页面加载超时", "ERROR")
         return None
     except Exception as e:
@@ -120,9 +161,13 @@ if not os.path.exists(IMAGE_DIR):
 
 # --- 爬虫核心逻辑 ---
 
+def build_page_url(page_num, category_id=DEFAULT_CATEGORY_ID, sort=DEFAULT_SORT):
+    """构造分类列表页URL"""
+    return f"{CATEGORY_URL.format(category_id=category_id, sort=sort)}&page={page_num}"
+
 def init_webdriver():
     """初始化Chrome WebDriver"""
-    if not SELENIUM_AVAILABLE:
+    if not import_selenium():
         debug_print("Selenium不可用，无法初始化WebDriver", "ERROR")
         return None
     
@@ -151,42 +196,50 @@ def init_webdriver():
         debug_print(f"❌ 初始化WebDriver失败: {e}", "ERROR")
         return None
 
-def fetch_book_data_selenium(url, driver, page_num=1):
+def load_page_selenium(url, driver, page_num=1):
     """
-    使用Selenium获取书籍数据（处理JavaScript动态加载）
+    使用Selenium加载列表页（处理JavaScript动态加载），返回HTML，失败时返回None
     """
     debug_print(f"开始请求第{page_num}页URL: {url}")
     debug_print("使用Selenium模式获取页面")
     
     try:
         # 使用Selenium获取页面
-        driver.get(url)
+        with METRICS.timer('driver_get'):
+            driver.get(url)
         
         # 等待页面加载完成 - 先等待works-list容器
         wait = WebDriverWait(driver, 10)
-        works_list = wait.until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "ul.works-list"))
-        )
+        with METRICS.timer('wait_works_list'):
+            works_list = wait.until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "ul.works-list"))
+            )
         
         # 等待实际的书籍数据加载（而非loading skeleton）
         debug_print("等待实际书籍数据加载...")
         try:
             # 等待至少有一个带有data-works-id属性的书籍项目出现
-            wait.until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "li[data-works-id]"))
-            )
+            with METRICS.timer('wait_book_items'):
+                wait.until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, "li[data-works-id]"))
+                )
             # 额外等待确保所有数据都加载完成
-            time.sleep(random.uniform(2, 3))
+            with METRICS.timer('settle_sleep'):
+                time.sleep(random.uniform(2, 3))
             debug_print("检测到实际书籍数据已加载")
         except TimeoutException:
+            METRICS.inc('book_items_timeouts')
             debug_print("未检测到实际书籍数据，可能页面仍在加载中...")
             # 给予更多时间
-            time.sleep(5)
+            with METRICS.timer('settle_sleep'):
+                time.sleep(5)
         
         debug_print("页面加载完成，开始解析...")
         
         # 获取页面源码
-        html_content = driver.page_source
+        with METRICS.timer('page_source'):
+            html_content = driver.page_source
+        METRICS.add_bytes('page_html', len(html_content.encode('utf-8')))
         
         # 保存HTML文件用于调试
         if SAVE_HTML:
@@ -195,193 +248,11 @@ def fetch_book_data_selenium(url, driver, page_num=1):
                 f.write(html_content)
             debug_print(f"已保存原始HTML到 {filename}")
         
-        # 使用BeautifulSoup解析HTML
-        soup = BeautifulSoup(html_content, 'html.parser')
-        page_title = soup.title.string if soup.title else "无标题"
-        debug_print(f"页面标题: {page_title}")
-        
-        # 查找书籍列表 - 优先查找React根节点下的动态加载内容
-        debug_print("尝试查找豆瓣页面中的书籍列表...")
-        
-        # 先尝试找React渲染的动态内容
-        react_root = soup.find('div', id='react-root')
-        if react_root:
-            works_list = react_root.find('ul', class_='works-list')
-            if works_list:
-                debug_print("找到React动态加载的works-list容器")
-            else:
-                debug_print("React根节点存在但未找到works-list")
-                works_list = None
-        else:
-            debug_print("未找到React根节点")
-            works_list = None
-        
-        # 如果动态内容没找到，尝试静态内容
-        if not works_list:
-            works_list = soup.find('ul', class_='works-list')
-            if works_list:
-                debug_print("找到静态works-list容器")
-            else:
-                debug_print("未找到任何works-list容器")
-                return []
-        
-        # 获取所有实际的书籍项目（有data-works-id的，排除loading skeleton）
-        book_items = works_list.find_all('li', {'data-works-id': True})
-        debug_print(f"在works-list中找到 {len(book_items)} 个实际书籍li元素")
-        
-        # 如果没有找到实际书籍，检查loading状态
-        if not book_items:
-            loading_items = works_list.find_all('li', class_='works-item is-loading')
-            debug_print(f"发现 {len(loading_items)} 个loading项目，数据可能还在加载中")
-            all_li_items = works_list.find_all('li')
-            debug_print(f"总共有 {len(all_li_items)} 个li元素")
-            return []
-        
-        books_data = []
-        
-        for i, book in enumerate(book_items):
-            debug_print(f"处理第 {i+1} 本书...")
-            try:
-                # 基于豆瓣实际HTML结构提取信息
-                # 提取标题
-                title_elem = book.find('h4', class_='title')
-                if title_elem:
-                    title_link = title_elem.find('a')
-                    if title_link:
-                        title_span = title_link.find('span', class_='title-text')
-                        if title_span:
-                            title = title_span.get_text(strip=True)
-                        else:
-                            title = title_link.get_text(strip=True)
-                    else:
-                        title = title_elem.get_text(strip=True)
-                    debug_print(f"书名: {title}")
-                else:
-                    debug_print(f"第 {i+1} 本书缺少标题信息")
-                    continue
-                
-                # 提取作者信息
-                author_elem = book.find('div', class_='author')
-                if author_elem:
-                    author_links = author_elem.find_all('a', class_='author-link')
-                    if author_links:
-                        authors = [link.get_text(strip=True) for link in author_links]
-                        author = ' / '.join(authors)
-                    else:
-                        author = author_elem.get_text(strip=True)
-                    debug_print(f"作者: {author}")
-                else:
-                    author = "未知作者"
-                    debug_print(f"第 {i+1} 本书缺少作者信息")
-                
-                # 提取简介信息
-                intro_elem = book.find('a', class_='intro')
-                if intro_elem:
-                    intro = intro_elem.get_text(strip=True)
-                    if len(intro) > 2000:
-                        intro = intro[:2000] + "..."
-                    debug_print(f"简介长度: {len(intro)} 字符")
-                else:
-                    intro = "无简介信息"
-                    debug_print(f"第 {i+1} 本书缺少简介信息")
-                
-                # 提取字数信息
-                word_count = "未知"
-                extra_info = book.find('div', class_='extra-info')
-                if extra_info:
-                    spans = extra_info.find_all('span')
-                    for span in spans:
-                        text = span.get_text(strip=True)
-                        if '万字' in text:
-                            word_count = text
-                            break
-                
-                # 提取价格信息
-                original_price = "未知"
-                current_price = "未知"
-                price_elem = book.find('span', class_='price-tag')
-                if price_elem:
-                    # 查找原价和现价的具体元素
-                    original_price_elem = price_elem.find('s', class_='original-price')
-                    discount_price_elem = price_elem.find('span', class_='discount-price')
-                    
-                    if original_price_elem and discount_price_elem:
-                        # 有打折，存在原价和现价
-                        original_price = f"￥{original_price_elem.get_text(strip=True)}"
-                        current_price = f"￥{discount_price_elem.get_text(strip=True)}"
-                    else:
-                        # 没有打折，只有一个价格
-                        price_text = price_elem.get_text(strip=True)
-                        if price_text:
-                            # 移除多余的￥符号，只保留数字部分
-                            import re
-                            price_numbers = re.findall(r'\d+\.?\d*', price_text)
-                            if price_numbers:
-                                price_value = price_numbers[0]
-                                original_price = f"￥{price_value}"
-                                current_price = f"￥{price_value}"
-                            else:
-                                original_price = price_text
-                                current_price = price_text
-                
-                # 提取分类信息
-                categories = []
-                extra_info = book.find('div', class_='extra-info')
-                if extra_info:
-                    category_links = extra_info.find_all('a', class_='kind-link')
-                    for link in category_links:
-                        category_name = link.get_text(strip=True)
-                        if category_name:
-                            categories.append(category_name)
-                
-                if categories:
-                    category_str = " + ".join(categories)
-                else:
-                    category_str = "未分类"
-                
-                debug_print(f"分类: {category_str}")
-                
-                # 计算热度排名（每页20本书）
-                ranking = (page_num - 1) * 20 + (i + 1)
-                
-                # 下载书籍封面图片
-                img_filename = None
-                try:
-                    img_elem = book.find('img')
-                    if img_elem and img_elem.get('src'):
-                        img_url = img_elem['src']
-                        # 去掉缩略图参数，获取原图
-                        if '!' in img_url:
-                            img_url = img_url.split('!')[0]
-                        debug_print(f"找到封面图片: {img_url}")
-                        img_filename = download_image(img_url, ranking, title)
-                    else:
-                        debug_print(f"第 {i+1} 本书没有找到封面图片")
-                except Exception as e:
-                    debug_print(f"下载第 {i+1} 本书封面失败: {e}", "ERROR")
-                
-                # 组装数据
-                data_row = {
-                    '热度排名': ranking,
-                    '书名': title,
-                    '作者': author,
-                    '简介': intro,
-                    '分类': category_str,
-                    '字数': word_count,
-                    '原价': original_price,
-                    '现价': current_price,
-                    '封面图片': img_filename or '未下载'
-                }
-                books_data.append(data_row)
-                debug_print(f"成功提取第 {i+1} 本书的信息", "SUCCESS")
-                
-            except Exception as e:
-                debug_print(f"处理第 {i+1} 本书时出错: {e}", "ERROR")
-        
-        debug_print(f"成功提取 {len(books_data)} 本书的数据", "SUCCESS")
-        return books_data
+        archive_page(html_content, url, page_num)
+        return html_content
         
     except TimeoutException:
+        METRICS.inc('page_timeouts')
         debug_print(" 页面加载超时", "ERROR")
         return None
     except WebDriverException as e:
@@ -391,12 +262,55 @@ def fetch_book_data_selenium(url, driver, page_num=1):
         debug_print(f" 其他错误: {e}", "ERROR")
         return None
 
-def fetch_book_data(url, page_num=1, start_rank=1, driver=None):
+def archive_page(html_content, url, page_num):
+    """把抓到的页面写入PAGE_ARCHIVE（如果已开启），存档失败不影响爬取"""
+    if PAGE_ARCHIVE is None:
+        return
+    try:
+        with METRICS.timer('archive_page'):
+            PAGE_ARCHIVE.add(html_content, url, page_num)
+    except Exception as e:
+        debug_print(f"存档第{page_num}页失败: {e}", "ERROR")
+
+def open_page_archive(archive_dir, run_id=None):
     """
-    爬取指定URL的页面并提取书籍信息
+    打开列表页存档，之后抓到的每一页都会写入；archive_dir为None时不存档
+    爬虫主程序、多分类调度和队列工作进程共用（多个进程同时写入同一目录时应使用不同的run_id）
+    """
+    global PAGE_ARCHIVE
+    PAGE_ARCHIVE = None
+    if archive_dir:
+        from page_archive import PageArchive
+        PAGE_ARCHIVE = PageArchive(archive_dir, run_id)
+    return PAGE_ARCHIVE
+
+def close_page_archive():
+    """关闭列表页存档并提示存档位置"""
+    global PAGE_ARCHIVE
+    if PAGE_ARCHIVE is not None:
+        PAGE_ARCHIVE.close()
+        print(f" 页面已存档至 {PAGE_ARCHIVE.archive_dir}（轮次 {PAGE_ARCHIVE.run_id}）")
+        PAGE_ARCHIVE = None
+
+def fetch_book_data_selenium(url, driver, page_num=1, image_dir=None):
+    """
+    使用Selenium获取书籍数据（处理JavaScript动态加载）
+    image_dir: 封面保存目录（默认IMAGE_DIR）
+    """
+    from book_extractor import BOOKS_PER_PAGE
+
+    html_content = load_page_selenium(url, driver, page_num)
+    if html_content is None:
+        return None
+    # 解析并提取书籍信息，下载封面
+    books_data = extract_page_books(html_content, (page_num - 1) * BOOKS_PER_PAGE + 1, image_dir)
+    debug_print(f"成功提取 {len(books_data)} 本书的数据", "SUCCESS")
+    return books_data
+
+def load_page(url, page_num=1, driver=None):
+    """
+    获取列表页HTML（requests模式，或传入driver时先尝试Selenium），失败时返回None
     page_num: 页码（用于调试显示）
-    start_rank: 起始排名（用于计算热度排名）
-    driver: Selenium WebDriver实例（可选）
     """
     try:
         debug_print(f"开始请求第{page_num}页URL: {url}")
@@ -408,7 +322,9 @@ def fetch_book_data(url, page_num=1, start_rank=1, driver=None):
             if html_content is None:
                 debug_print("Selenium获取失败，回退到requests模式", "ERROR")
                 # 回退到requests
-                response = requests.get(url, headers=HEADERS)
+                with METRICS.timer('http_get'):
+                    response = requests.get(url, headers=HEADERS)
+                METRICS.add_bytes('page_html', len(response.content))
                 html_content = response.text
             else:
                 # 保存Selenium获取的HTML
@@ -423,7 +339,9 @@ def fetch_book_data(url, page_num=1, start_rank=1, driver=None):
             # proxies = { "http": "http://your_proxy_ip:port", "https": "https://your_proxy_ip:port" }
             # response = requests.get(url, headers=HEADERS, proxies=proxies)
 
-            response = requests.get(url, headers=HEADERS)
+            with METRICS.timer('http_get'):
+                response = requests.get(url, headers=HEADERS)
+            METRICS.add_bytes('page_html', len(response.content))
             debug_print(f"HTTP状态码: {response.status_code}")
             debug_print(f"响应头: {dict(response.headers)}")
             
@@ -438,183 +356,66 @@ def fetch_book_data(url, page_num=1, start_rank=1, driver=None):
                     f.write(response.text)
                 debug_print(f"已保存原始HTML到 {filename}")
 
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # 打印页面标题用于确认
-        title_tag = soup.find('title')
-        if title_tag:
-            debug_print(f"页面标题: {title_tag.text}")
-        
-        # 根据实际页面结构查找书籍列表
-        debug_print("尝试查找豆瓣页面中的书籍列表...")
-        
-        # 查找works-list容器
-        works_list = soup.find('ul', class_='works-list')
-        if works_list:
-            debug_print("找到works-list容器")
-            books = works_list.find_all('li')
-            debug_print(f"在works-list中找到 {len(books)} 个li元素")
-        else:
-            debug_print("未找到works-list容器，尝试直接查找li元素...")
-            books = soup.find_all('li')
-            debug_print(f"直接找到 {len(books)} 个li元素")
-        
-        # 如果没找到，尝试其他常见的选择器
-        if len(books) == 0:
-            debug_print("尝试其他可能的选择器...")
-            
-            # 尝试查找所有包含"书"字的div
-            book_divs = soup.find_all('div', string=lambda text: text and '书' in text)
-            debug_print(f"找到包含'书'字的div: {len(book_divs)} 个")
-            
-            # 查找所有class包含book的元素
-            book_elements = soup.find_all(class_=lambda x: x and 'book' in x.lower())
-            debug_print(f"找到class包含'book'的元素: {len(book_elements)} 个")
-            for elem in book_elements[:5]:  # 只显示前5个
-                debug_print(f"元素: {elem.name}, class: {elem.get('class')}")
-            
-            # 查找所有img标签
-            img_tags = soup.find_all('img')
-            debug_print(f"找到图片标签: {len(img_tags)} 个")
-            
-            # 查找所有a标签  
-            a_tags = soup.find_all('a')
-            debug_print(f"找到链接标签: {len(a_tags)} 个")
-        
-        book_data = []
-        for i, book in enumerate(books):
-            current_rank = start_rank + i  # 计算当前书籍的热度排名
-            debug_print(f"处理第 {i+1} 本书（排名第{current_rank}）...")
-            
-            try:
-                # 根据实际HTML结构提取信息
-                title_elem = book.find('div', class_='title')
-                author_elem = book.find('div', class_='author')
-                abstract_elem = book.find('div', class_='abstract')
-                
-                if title_elem:
-                    title = title_elem.text.strip()
-                    debug_print(f"书名: {title}")
-                else:
-                    debug_print(f"第 {i+1} 本书缺少标题信息")
-                    continue
-                
-                # 处理作者信息
-                if author_elem:
-                    # 作者信息可能包含多个a标签
-                    authors = []
-                    author_links = author_elem.find_all('a')
-                    if author_links:
-                        for link in author_links:
-                            authors.append(link.text.strip())
-                        author = ', '.join(authors)
-                    else:
-                        author = author_elem.text.strip()
-                    debug_print(f"作者: {author}")
-                else:
-                    author = "未知作者"
-                    debug_print(f"第 {i+1} 本书缺少作者信息")
-                
-                # 处理简介信息
-                if abstract_elem:
-                    abstract = abstract_elem.text.strip()
-                    # 限制简介长度用于显示
-                    if len(abstract) > 200:
-                        abstract = abstract[:200] + "..."
-                    debug_print(f"简介长度: {len(abstract)} 字符")
-                else:
-                    abstract = "无简介信息"
-                    debug_print(f"第 {i+1} 本书缺少简介信息")
-                
-                # 提取价格信息
-                original_price = "未知"
-                current_price = "未知"
-                price_elem = book.find('span', class_='price-tag')
-                if price_elem:
-                    # 查找原价和现价的具体元素
-                    original_price_elem = price_elem.find('s', class_='original-price')
-                    discount_price_elem = price_elem.find('span', class_='discount-price')
-                    
-                    if original_price_elem and discount_price_elem:
-                        # 有打折，存在原价和现价
-                        original_price = f"￥{original_price_elem.get_text(strip=True)}"
-                        current_price = f"￥{discount_price_elem.get_text(strip=True)}"
-                    else:
-                        # 没有打折，只有一个价格
-                        price_text = price_elem.get_text(strip=True)
-                        if price_text:
-                            # 移除多余的￥符号，只保留数字部分
-                            import re
-                            price_numbers = re.findall(r'\d+\.?\d*', price_text)
-                            if price_numbers:
-                                price_value = price_numbers[0]
-                                original_price = f"￥{price_value}"
-                                current_price = f"￥{price_value}"
-                            else:
-                                original_price = price_text
-                                current_price = price_text
-                
-                # 提取分类信息
-                categories = []
-                category_links = book.find_all('a', class_='kind-link')
-                for link in category_links:
-                    category_name = link.get_text(strip=True)
-                    if category_name:
-                        categories.append(category_name)
-                
-                if categories:
-                    category_str = " + ".join(categories)
-                else:
-                    category_str = "未分类"
-                
-                debug_print(f"分类: {category_str}")
-                
-                # 下载书籍封面图片
-                img_filename = None
-                try:
-                    img_elem = book.find('img')
-                    if img_elem and img_elem.get('src'):
-                        img_url = img_elem['src']
-                        # 去掉缩略图参数，获取原图
-                        if '!' in img_url:
-                            img_url = img_url.split('!')[0]
-                        debug_print(f"找到封面图片: {img_url}")
-                        img_filename = download_image(img_url, current_rank, title)
-                    else:
-                        debug_print(f"第 {i+1} 本书没有找到封面图片")
-                except Exception as e:
-                    debug_print(f"下载第 {i+1} 本书封面失败: {e}", "ERROR")
-                
-                # 组装数据（增加热度排名字段）
-                data_row = {
-                    '热度排名': current_rank,
-                    '书名': title,
-                    '作者': author,
-                    '简介': abstract,
-                    '分类': category_str,
-                    '字数': '未知',
-                    '原价': original_price,
-                    '现价': current_price,
-                    '封面图片': img_filename or '未下载'
-                }
-                book_data.append(data_row)
-                debug_print(f"成功提取第 {i+1} 本书的信息（排名第{current_rank}）", "SUCCESS")
-                
-            except Exception as e:
-                debug_print(f"处理第 {i+1} 本书时出错: {e}", "ERROR")
-                if DEBUG_MODE:
-                    import traceback
-                    traceback.print_exc()
-
-        debug_print(f"成功提取 {len(book_data)} 本书的数据", "SUCCESS")
-        return book_data
+        archive_page(html_content, url, page_num)
+        return html_content
 
     except requests.exceptions.RequestException as e:
         debug_print(f"请求失败: {e}", "ERROR")
+        return None
+    except Exception as e:
+        debug_print(f"获取页面时出错: {e}", "ERROR")
+        return None
+
+def fetch_book_data(url, page_num=1, start_rank=1, driver=None, image_dir=None):
+    """
+    爬取指定URL的页面并提取书籍信息
+    page_num: 页码（用于调试显示）
+    start_rank: 起始排名（用于计算热度排名）
+    driver: Selenium WebDriver实例（可选）
+    image_dir: 封面保存目录（默认IMAGE_DIR）
+    """
+    html_content = load_page(url, page_num, driver)
+    if html_content is None:
         return []
+    try:
+        # 解析并提取书籍信息，下载封面
+        book_data = extract_page_books(html_content, start_rank, image_dir)
     except Exception as e:
         debug_print(f"解析页面时出错: {e}", "ERROR")
         return []
+    debug_print(f"成功提取 {len(book_data)} 本书的数据", "SUCCESS")
+    return book_data
+
+def extract_page_books(html_content, start_rank=1, image_dir=None):
+    """
+    两种爬取模式共用：解析页面HTML提取书籍信息，并下载封面
+    start_rank: 本页第一本书的热度排名
+    """
+    from book_extractor import extract_books
+
+    def on_error(i, e):
+        debug_print(f"处理第 {i+1} 本书时出错: {e}", "ERROR")
+
+    extracted = extract_books(html_content, start_rank, METRICS, on_error)
+    if not extracted:
+        debug_print("未找到works-list容器或其中没有书籍")
+    return attach_covers(extracted, image_dir)
+
+def attach_covers(extracted, image_dir=None):
+    """下载提取结果 [(Book, 封面URL), ...] 中的封面，返回Book列表"""
+    books = []
+    for book, cover_url in extracted:
+        debug_print(f"书名: {book.title} | 作者: {book.author} | 分类: {book.category}")
+        if cover_url:
+            try:
+                book.cover = download_image(cover_url, book.rank, book.title, image_dir)
+            except Exception as e:
+                debug_print(f"下载第 {book.rank} 名封面失败: {e}", "ERROR")
+        else:
+            debug_print(f"第 {book.rank} 名没有找到封面图片")
+        books.append(book)
+        METRICS.inc('books_extracted')
+    return books
 
 def clean_filename(filename):
     """
@@ -635,9 +436,9 @@ def clean_filename(filename):
     
     return cleaned
 
-def download_image(url, ranking, book_title):
+def download_image(url, ranking, book_title, image_dir=None):
     """
-    下载单张图片，按照"热度排名_书名.jpg"格式保存
+    下载单张图片，按照"热度排名_书名.jpg"格式保存到image_dir（默认IMAGE_DIR），设置了IMAGE_ARCHIVE时写入存档
     """
     try:
         # 清理书名，生成安全的文件名
@@ -646,60 +447,230 @@ def download_image(url, ranking, book_title):
         
         debug_print(f"开始下载图片: {filename}")
         
-        img_response = requests.get(url, headers=HEADERS, timeout=10)
-        img_response.raise_for_status()
+        with METRICS.timer('download_image'):
+            img_response = requests.get(url, headers=HEADERS, timeout=10)
+            img_response.raise_for_status()
+        METRICS.add_bytes('images', len(img_response.content))
         
-        filepath = os.path.join(IMAGE_DIR, filename)
-        with open(filepath, 'wb') as f:
-            f.write(img_response.content)
+        with METRICS.timer('save_image'):
+            if IMAGE_ARCHIVE is not None:
+                IMAGE_ARCHIVE.put(filename, img_response.content)
+            else:
+                filepath = os.path.join(image_dir or IMAGE_DIR, filename)
+                with open(filepath, 'wb') as f:
+                    f.write(img_response.content)
         
+        METRICS.inc('images_downloaded')
         debug_print(f" 图片下载成功: {filename}", "SUCCESS")
         return filename
         
     except requests.exceptions.RequestException as e:
+        METRICS.inc('image_failures')
         debug_print(f" 图片下载失败: {e}", "ERROR")
         return None
     except Exception as e:
+        METRICS.inc('image_failures')
         debug_print(f" 图片保存失败: {e}", "ERROR")
         return None
 
-def save_to_csv(data):
+def save_to_csv(books, csv_file=None, fieldnames=None):
     """
-    将数据保存到CSV文件（使用UTF-8 BOM编码）
+    将Book列表保存到CSV文件（使用UTF-8 BOM编码）
+    csv_file: 输出路径（默认CSV_FILE）; fieldnames: 字段列表（默认CSV_FIELDS）
     """
-    with open(CSV_FILE, 'w', newline='', encoding='utf-8-sig') as f:
-        writer = csv.DictWriter(f, fieldnames=['热度排名', '书名', '作者', '简介', '分类', '字数', '原价', '现价', '封面图片'])
+    with open(csv_file or CSV_FILE, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames or CSV_FIELDS, extrasaction='ignore')
         writer.writeheader()  # 写入表头
-        writer.writerows(data)
+        writer.writerows(book.to_row() for book in books)
 
-# --- 主程序 ---
-def main():
-    """主函数"""
-    global DEBUG_MODE, SAVE_HTML, MAX_PAGES, USE_SELENIUM
+def cap_pages(html_content, last_page):
+    """根据第一页的分页栏或作品总数，把爬取页数限制在列表实际的页数内"""
+    from book_extractor import parse_page_count
+
+    page_count = parse_page_count(html_content)
+    if page_count is None:
+        debug_print("第一页没有找到总数或分页信息，按指定页数爬取")
+        return last_page
+    debug_print(f"列表共 {page_count} 页")
+    if page_count < last_page:
+        print(f" 列表共 {page_count} 页，不再抓取第 {page_count + 1}-{last_page} 页")
+        METRICS.inc('pages_skipped', last_page - page_count)
+        return page_count
+    return last_page
+
+def crawl_pages(driver=None, category_id=DEFAULT_CATEGORY_ID, sort=DEFAULT_SORT):
+    """
+    逐页抓取并解析，返回按热度排名排列的Book列表
+    第一页确定实际页数；连续EMPTY_PAGE_LIMIT页无数据时提前结束
+    """
+    from book_extractor import BOOKS_PER_PAGE
+
+    all_books = []
+    last_page = MAX_PAGES
+    empty_pages = 0
+    page_num = 0
+    while page_num < last_page:
+        page_num += 1
+        debug_print(f"\n--- 开始爬取第 {page_num} 页 ---")
+
+        # 显示进度信息
+        print(f"[{page_num}/{last_page}] 正在获取第 {page_num} 页数据...", end=" ")
+
+        url = build_page_url(page_num, category_id, sort)
+        # 计算当前页的起始排名（每页20本书）
+        start_rank = (page_num - 1) * BOOKS_PER_PAGE + 1
+
+        # 根据配置选择爬取方式
+        with METRICS.timer('page_total'):
+            if USE_SELENIUM and driver:
+                html_content = load_page_selenium(url, driver, page_num)
+            else:
+                html_content = load_page(url, page_num)
+            books_data = None
+            if html_content is not None:
+                if page_num == 1:
+                    last_page = cap_pages(html_content, last_page)
+                try:
+                    # 解析并提取书籍信息，下载封面
+                    books_data = extract_page_books(html_content, start_rank)
+                except Exception as e:
+                    debug_print(f"解析页面时出错: {e}", "ERROR")
+                    books_data = []
+
+        if books_data is None:
+            METRICS.inc('pages_failed')
+            print(" 失败")
+            debug_print(f"第 {page_num} 页获取失败，跳过")
+            continue
+
+        if not books_data:
+            METRICS.inc('pages_empty')
+            print(" 无数据")
+            debug_print(f"第 {page_num} 页没有找到书籍数据")
+            empty_pages += 1
+            if empty_pages >= EMPTY_PAGE_LIMIT and page_num < last_page:
+                print(f" 连续 {empty_pages} 页无数据，已到列表末尾，不再抓取第 {page_num + 1}-{last_page} 页")
+                METRICS.inc('pages_skipped', last_page - page_num)
+                break
+            continue
+
+        empty_pages = 0
+        METRICS.inc('pages_ok')
+        # 不需要重新分配排名，各页面函数已经正确计算了排名
+        all_books.extend(books_data)
+
+        print(f" 获取 {len(books_data)} 本书")
+        debug_print(f"第 {page_num} 页成功获取 {len(books_data)} 本书")
+
+        # 延迟避免请求太频繁
+        if page_num < last_page:
+            debug_print("等待2秒...")
+            time.sleep(2)
+    return all_books
+
+def crawl_pages_pipelined(driver=None, category_id=DEFAULT_CATEGORY_ID, sort=DEFAULT_SORT,
+                          parse_workers=None):
+    """
+    抓取与解析并行：抓取循环只获取HTML，交给解析进程池
+    结果线程按页码顺序下载封面，返回按热度排名排列的Book列表
+    连续无数据的页数由结果线程统计，解析结果滞后于抓取，最多多抓取在途的几页
+    parse_workers: 解析进程数（默认parse_pipeline.DEFAULT_PARSE_WORKERS）
+    """
+    from book_extractor import BOOKS_PER_PAGE
+    from parse_pipeline import ParsePipeline, DEFAULT_PARSE_WORKERS
+
+    parse_workers = parse_workers or DEFAULT_PARSE_WORKERS
+    empty_pages = [0]
+
+    def handle_page(page_num, extracted):
+        for book, _ in extracted:
+            # 跨进程传回的字符串不再是驻留的，重新驻留
+            book.category = intern_category(book.category)
+        books = attach_covers(extracted)
+        if books:
+            METRICS.inc('pages_ok')
+            empty_pages[0] = 0
+            print(f" 第 {page_num} 页解析完成，获取 {len(books)} 本书")
+        else:
+            METRICS.inc('pages_empty')
+            empty_pages[0] += 1
+            print(f" 第 {page_num} 页无数据")
+        return books
+
+    last_page = MAX_PAGES
+    with ParsePipeline(handle_page, parse_workers, metrics=METRICS) as pipeline:
+        page_num = 0
+        while page_num < last_page:
+            if empty_pages[0] >= EMPTY_PAGE_LIMIT:
+                print(f" 连续 {empty_pages[0]} 页无数据，已到列表末尾，不再抓取第 {page_num + 1}-{last_page} 页")
+                METRICS.inc('pages_skipped', last_page - page_num)
+                break
+            page_num += 1
+            debug_print(f"\n--- 开始爬取第 {page_num} 页 ---")
+            print(f"[{page_num}/{last_page}] 正在获取第 {page_num} 页数据...")
+            url = build_page_url(page_num, category_id, sort)
+            
+            with METRICS.timer('page_fetch'):
+                if USE_SELENIUM and driver:
+                    html_content = load_page_selenium(url, driver, page_num)
+                else:
+                    html_content = load_page(url, page_num)
+            
+            if html_content is None:
+                METRICS.inc('pages_failed')
+                print(f" 第 {page_num} 页获取失败")
+                continue
+            if page_num == 1:
+                last_page = cap_pages(html_content, last_page)
+            
+            # 在途页数达到上限时在此阻塞，内存占用有界
+            pipeline.submit(page_num, html_content, (page_num - 1) * BOOKS_PER_PAGE + 1)
+            
+            # 延迟避免请求太频繁（解析在此期间并行进行）
+            if page_num < last_page:
+                debug_print("等待2秒...")
+                time.sleep(2)
+        
+        all_books = pipeline.close()
     
-    # 解析命令行参数
-    parser = argparse.ArgumentParser(description='豆瓣读书爬虫')
+    for page_num, e in pipeline.failed:
+        METRICS.inc('pages_failed')
+        print(f" 第 {page_num} 页解析失败: {e}")
+    return all_books
+
+# --- 主程序 ---
+def add_crawl_arguments(parser):
+    """注册爬取相关的命令行参数（douban.py和cli.py crawl共用）"""
+    from page_archive import ARCHIVE_DIR as PAGE_ARCHIVE_DIR
+
     parser.add_argument('--debug', action='store_true', help='开启调试模式')
     parser.add_argument('--no-debug', action='store_true', help='关闭调试模式')
     parser.add_argument('--save-html', action='store_true', help='保存原始HTML文件')
     parser.add_argument('--no-save-html', action='store_true', help='不保存原始HTML文件')
-    parser.add_argument('--pages', type=int, default=MAX_PAGES, help=f'爬取页数 (默认: {MAX_PAGES})')
+    parser.add_argument('--pages', type=int, help=f'爬取页数 (默认: {MAX_PAGES})')
+    parser.add_argument('--category', type=int, default=DEFAULT_CATEGORY_ID,
+                        help=f'分类ID (默认: {DEFAULT_CATEGORY_ID} 计算机与互联网)')
+    parser.add_argument('--sort', default=DEFAULT_SORT, help=f'排序方式 (默认: {DEFAULT_SORT})')
     parser.add_argument('--use-selenium', action='store_true', help='强制使用Selenium浏览器模式')
     parser.add_argument('--no-selenium', action='store_true', help='强制使用requests模式')
-    
-    args = parser.parse_args()
-    
-    # 如果没有指定页数参数，则提示用户输入
-    if '--pages' not in sys.argv:
-        try:
-            user_pages = input("请输入要爬取的页数: ")
-            MAX_PAGES = int(user_pages)
-        except (ValueError, KeyboardInterrupt):
-            print("输入无效，使用默认页数:", MAX_PAGES)
-    else:
-        MAX_PAGES = args.pages
-    
-    # 根据命令行参数调整配置
+    parser.add_argument('--update-index', action='store_true', help='爬取完成后增量更新全文检索索引和分类关键词索引')
+    parser.add_argument('--enrich', action='store_true', help='抓取详情页补全完整简介、出版社、评分和字数')
+    parser.add_argument('--enrich-workers', type=int, default=4, help='详情页抓取并发数 (默认: 4)')
+    parser.add_argument('--metrics-json', default=METRICS_FILE, help=f'性能指标JSON汇总文件 (默认: {METRICS_FILE})')
+    parser.add_argument('--metrics-prom', help='额外输出Prometheus文本格式的指标文件')
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help='解析进程数，大于0时抓取和解析并行进行 (默认: 0，在抓取循环中解析)')
+    parser.add_argument('--page-archive', default=PAGE_ARCHIVE_DIR,
+                        help=f'抓到的页面压缩存档到该目录，供page_archive.py reparse离线重新解析 (默认: {PAGE_ARCHIVE_DIR})')
+    parser.add_argument('--no-page-archive', action='store_true', help='不存档抓到的页面')
+    parser.add_argument('--changes', default=CHANGES_FILE,
+                        help=f'与上一次爬取比较，变更事件追加到该JSONL文件 (默认: {CHANGES_FILE})')
+    parser.add_argument('--no-changes', action='store_true', help='不输出变更事件')
+    parser.add_argument('--image-archive', help='封面写入该存档文件（如covers.pack），而不是images目录中的散落文件')
+
+def configure(args):
+    """根据命令行参数调整调试、保存HTML和爬取方式等全局配置"""
+    global DEBUG_MODE, SAVE_HTML, USE_SELENIUM, IMAGE_ARCHIVE
     if args.debug:
         DEBUG_MODE = True
     elif args.no_debug:
@@ -714,6 +685,22 @@ def main():
         USE_SELENIUM = True
     elif args.no_selenium:
         USE_SELENIUM = False
+
+    if args.image_archive:
+        IMAGE_ARCHIVE = ImageArchive(args.image_archive)
+    open_page_archive(None if args.no_page_archive else args.page_archive)
+
+def run_crawl(pages=None, category_id=DEFAULT_CATEGORY_ID, sort=DEFAULT_SORT, parse_workers=0,
+              enrich=False, enrich_workers=4, csv_file=CSV_FILE, update_index=False,
+              metrics_json=METRICS_FILE, metrics_prom=None, changes_file=CHANGES_FILE):
+    """
+    执行一次完整爬取，返回Book列表（按热度排名）
+    pages: 爬取页数（默认MAX_PAGES）; csv_file: 保存路径，为None时不写CSV（如交给后续分析直接使用）
+    changes_file: 与该分类上一次爬取比较的变更事件文件，为None时不比较
+    """
+    global MAX_PAGES
+    if pages:
+        MAX_PAGES = pages
     
     print("=" * 50)
     print("豆瓣读书爬虫启动")
@@ -730,7 +717,7 @@ def main():
     if USE_SELENIUM:
         if not SELENIUM_AVAILABLE:
             print(" 错误：指定使用Selenium但Selenium不可用")
-            return
+            return []
         print(" 使用浏览器模式进行爬取")
         debug_print(" 将使用Selenium浏览器模式进行爬取")
     else:
@@ -738,7 +725,6 @@ def main():
         debug_print(" 将使用requests模式进行爬取")
     
     all_books = []
-    current_ranking = 1
     driver = None
     
     # 初始化WebDriver（如果需要）
@@ -748,66 +734,55 @@ def main():
         driver = init_webdriver()
         if driver is None:
             print(" 错误：无法初始化WebDriver")
-            return
+            return []
         print(" 浏览器初始化完成")
     
     try:
         debug_print("开始爬取豆瓣读书...")
         print(f" 开始爬取 {MAX_PAGES} 页数据...")
         
-        for page_num in range(1, MAX_PAGES + 1):
-            debug_print(f"\n--- 开始爬取第 {page_num} 页 ---")
-            
-            # 显示进度信息
-            print(f"[{page_num}/{MAX_PAGES}] 正在获取第 {page_num} 页数据...", end=" ")
-            
-            url = f"https://read.douban.com/category/105?sort=hot&page={page_num}"
-            
-            # 根据配置选择爬取方式
-            if USE_SELENIUM and driver:
-                books_data = fetch_book_data_selenium(url, driver, page_num)
-            else:
-                # 计算当前页的起始排名（每页20本书）
-                start_rank = (page_num - 1) * 20 + 1
-                books_data = fetch_book_data(url, page_num, start_rank)
-            
-            if books_data is None:
-                print(" 失败")
-                debug_print(f"第 {page_num} 页获取失败，跳过")
-                continue
-            
-            if not books_data:
-                print(" 无数据")
-                debug_print(f"第 {page_num} 页没有找到书籍数据")
-                continue
-            
-            # 不需要重新分配排名，各页面函数已经正确计算了排名
-            all_books.extend(books_data)
-            
-            print(f" 获取 {len(books_data)} 本书")
-            debug_print(f"第 {page_num} 页成功获取 {len(books_data)} 本书")
-            
-            # 延迟避免请求太频繁
-            if page_num < MAX_PAGES:
-                debug_print("等待2秒...")
-                time.sleep(2)
+        if parse_workers > 0:
+            all_books = crawl_pages_pipelined(driver, category_id, sort, parse_workers)
+        else:
+            all_books = crawl_pages(driver, category_id, sort)
     
     finally:
         # 关闭WebDriver
         if driver:
             debug_print("关闭浏览器...")
             driver.quit()
+        close_page_archive()
     
     # 显示完成信息
     print(f"\n 爬取完成！共获得 {len(all_books)} 本书的数据")
     debug_print(f"所有页面爬取完成，共获得 {len(all_books)} 本书的数据")
     
     if all_books:
-        print(" 正在保存到CSV文件...")
-        debug_print("开始保存数据到CSV...")
-        save_to_csv(all_books)
-        print(f" 成功保存 {len(all_books)} 本书的信息到 {CSV_FILE}")
-        debug_print(f"成功将 {len(all_books)} 本书的信息存入 {CSV_FILE}")
+        fieldnames = CSV_FIELDS
+        if enrich:
+            from book_detail import enrich_books, ENRICH_FIELDS
+            print(" 正在补全书籍详情...")
+            all_books = enrich_books(all_books, workers=enrich_workers)
+            fieldnames = CSV_FIELDS + ENRICH_FIELDS
+        
+        if csv_file:
+            print(" 正在保存到CSV文件...")
+            debug_print("开始保存数据到CSV...")
+            save_to_csv(all_books, csv_file, fieldnames)
+            print(f" 成功保存 {len(all_books)} 本书的信息到 {csv_file}")
+            debug_print(f"成功将 {len(all_books)} 本书的信息存入 {csv_file}")
+
+            if update_index:
+                from book_search import update_index as update_search_index
+                from category_keywords import update_keyword_index
+                print(" 正在更新全文检索索引...")
+                update_search_index(csv_file)
+                print(" 正在更新分类关键词索引...")
+                update_keyword_index(csv_file)
+
+        if changes_file:
+            counts = record_changes(all_books, category_id, sort, changes_file)
+            print(f" 与上一次爬取相比: {format_counts(counts)}" + (f"（变更事件见 {changes_file}）" if counts else ""))
     else:
         print(" 没有获取到任何数据！")
         debug_print("  没有获取到任何数据！")
@@ -818,7 +793,44 @@ def main():
         debug_print("  4. 是否需要处理反爬虫机制")
         debug_print("  5. 检查 debug_response_page*.html 文件查看实际页面内容")
 
+    # 保存性能指标（在详情补全和保存CSV之后，包含详情页抓取和解析的耗时）
+    if metrics_json:
+        METRICS.write_json(metrics_json)
+        print(f" 性能指标已保存至 {metrics_json}")
+    if metrics_prom:
+        METRICS.write_prometheus(metrics_prom)
+    debug_print("各阶段耗时:\n" + METRICS.format_table())
+
     debug_print("程序结束", "MAIN")
+    return all_books
+
+
+def main():
+    """主函数"""
+    global MAX_PAGES
+    
+    # 解析命令行参数
+    parser = argparse.ArgumentParser(description='豆瓣读书爬虫')
+    add_crawl_arguments(parser)
+    parser.add_argument('--non-interactive', action='store_true',
+                        help='不提示输入页数（未指定--pages时使用默认页数，适合定时任务）')
+    args = parser.parse_args()
+    
+    # 如果没有指定页数参数，则提示用户输入（非交互模式或没有终端时直接使用默认页数）
+    if args.pages is None and not args.non_interactive and sys.stdin.isatty():
+        try:
+            user_pages = input("请输入要爬取的页数: ")
+            MAX_PAGES = int(user_pages)
+        except (ValueError, KeyboardInterrupt, EOFError):
+            print("输入无效，使用默认页数:", MAX_PAGES)
+    elif args.pages is not None:
+        MAX_PAGES = args.pages
+    
+    configure(args)
+    run_crawl(category_id=args.category, sort=args.sort, parse_workers=args.parse_workers,
+              enrich=args.enrich, enrich_workers=args.enrich_workers, update_index=args.update_index,
+              metrics_json=args.metrics_json, metrics_prom=args.metrics_prom,
+              changes_file=None if args.no_changes else args.changes)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
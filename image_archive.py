@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+封面图片打包存档
+功能：
+1. 所有封面追加写入同一个数据文件（covers.pack），偏移量记录在索引文件（covers.pack.idx，每行一条JSON）
+2. 按内容SHA-256去重：每轮爬取重复下载的相同封面只增加一行索引，不再占用数据空间
+3. 通过mmap读取，get()返回数据文件上的memoryview，不复制字节；相似推荐和缩略图阶段可直接从存档读取
+4. 导入已有的images目录，或导出为散落的图片文件
+注意：同一时间只允许一个进程写入
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import mmap
+import os
+import threading
+import time
+
+# 默认存档文件（索引文件为其后加.idx）
+ARCHIVE_FILE = 'covers.pack'
+INDEX_SUFFIX = '.idx'
+# 导入导出的默认目录（与douban.py一致）
+IMAGE_DIR = 'images'
+
+class ImageArchive:
+    def __init__(self, path=ARCHIVE_FILE):
+        """打开（不存在时创建）存档；索引中同名的后一条记录覆盖前一条"""
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        self._lock = threading.Lock()
+        self.entries = {}     # 文件名 -> (偏移量, 长度, SHA-256)
+        self.blobs = {}       # SHA-256 -> (偏移量, 长度)
+        self._map = None
+        self._load_index()
+        self._data = open(path, 'a+b')
+        self._index = open(self.index_path, 'a', encoding='utf-8')
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        data_size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # 写索引时中断留下的半行
+                offset, length = entry['offset'], entry['length']
+                if offset + length > data_size:
+                    continue
+                self.entries[entry['name']] = (offset, length, entry['sha256'])
+                self.blobs.setdefault(entry['sha256'], (offset, length))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def names(self):
+        return list(self.entries)
+
+    def digest(self, name):
+        """文件内容的SHA-256"""
+        return self.entries[name][2]
+
+    def put(self, name, content):
+        """写入一个文件；内容已存在时只追加索引，返回是否写入了新数据"""
+        sha = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            if name in self.entries and self.entries[name][2] == sha:
+                return False
+            stored = sha in self.blobs
+            if not stored:
+                # 先写数据再写索引，中断时最多留下没有索引指向的数据
+                self._data.seek(0, os.SEEK_END)
+                offset = self._data.tell()
+                self._data.write(content)
+                self._data.flush()
+                self.blobs[sha] = (offset, len(content))
+            offset, length = self.blobs[sha]
+            self._index.write(json.dumps({'name': name, 'offset': offset, 'length': length, 'sha256': sha,
+                                          'time': round(time.time(), 3)}, ensure_ascii=False) + '\n')
+            self._index.flush()
+            self.entries[name] = (offset, length, sha)
+            return not stored
+
+    def _mapped(self, end):
+        """数据文件的mmap；文件追加后重新映射（旧映射可能仍被memoryview引用，不主动关闭）"""
+        if self._map is None or len(self._map) < end:
+            self._data.flush()
+            self._map = mmap.mmap(self._data.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def get(self, name):
+        """返回文件内容的只读memoryview（零拷贝），不存在时返回None"""
+        entry = self.entries.get(name)
+        if entry is None:
+            return None
+        offset, length, _ = entry
+        if length == 0:
+            return memoryview(b'')
+        return memoryview(self._mapped(offset + length))[offset:offset + length]
+
+    def open_image(self, name):
+        """用Pillow打开存档中的图片（调用方负责关闭）"""
+        from PIL import Image
+        return Image.open(io.BytesIO(self.get(name)))
+
+    def import_dir(self, image_dir=IMAGE_DIR):
+        """把目录中的图片文件写入存档，返回 (文件数, 新写入数据的文件数)"""
+        names = sorted(name for name in os.listdir(image_dir) if os.path.isfile(os.path.join(image_dir, name)))
+        written = 0
+        for name in names:
+            with open(os.path.join(image_dir, name), 'rb') as f:
+                written += self.put(name, f.read())
+        return len(names), written
+
+    def export(self, output_dir, names=None):
+        """把存档中的文件（默认全部）导出为散落的文件，返回导出数量"""
+        os.makedirs(output_dir, exist_ok=True)
+        count = 0
+        for name in names or self.names():
+            view = self.get(name)
+            if view is None:
+                print(f" 存档中没有 {name}")
+                continue
+            with open(os.path.join(output_dir, name), 'wb') as f:
+                f.write(view)
+            count += 1
+        return count
+
+    def stats(self):
+        """文件数、去重后数据块数和各部分大小"""
+        return {
+            '文件数': len(self.entries),
+            '数据块数': len(self.blobs),
+            '文件总字节': sum(length for _, length, _ in self.entries.values()),
+            '数据文件字节': os.path.getsize(self.path),
+            '索引文件字节': os.path.getsize(self.index_path),
+        }
+
+    def close(self):
+        self._map = None
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='封面图片打包存档')
+    parser.add_argument('--archive', default=ARCHIVE_FILE, help=f'存档文件 (默认: {ARCHIVE_FILE})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='把图片目录写入存档')
+    import_parser.add_argument('--image-dir', default=IMAGE_DIR, help=f'图片目录 (默认: {IMAGE_DIR})')
+
+    export_parser = subparsers.add_parser('export', help='导出为散落的图片文件')
+    export_parser.add_argument('names', nargs='*', help='要导出的文件名 (默认: 全部)')
+    export_parser.add_argument('--output', default=IMAGE_DIR, help=f'导出目录 (默认: {IMAGE_DIR})')
+
+    subparsers.add_parser('stats', help='显示存档统计')
+    args = parser.parse_args()
+
+    with ImageArchive(args.archive) as archive:
+        if args.command == 'import':
+            start = time.perf_counter()
+            total, written = archive.import_dir(args.image_dir)
+            print(f" 导入 {total} 个文件，其中 {written} 个写入新数据，耗时 {time.perf_counter() - start:.2f} 秒")
+        elif args.command == 'export':
+            count = archive.export(args.output, args.names)
+            print(f" 导出 {count} 个文件到 {args.output}")
+        for key, value in archive.stats().items():
+            print(f"  {key}: {value}")
+
+if __name__ == "__main__":
+    main()
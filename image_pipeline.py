@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+封面图片后处理
+功能：
+1. 按文件头识别真实格式（下载的封面一律命名为.jpg，实际可能是PNG、WebP等）
+2. 按内容SHA-256去重，相同字节只处理、存储一次
+3. 生成WebP缩略图和WebP（可选AVIF）全尺寸版本，原图按真实扩展名保留
+4. 进程池并行处理，结果记录在manifest.json，再次运行只处理新增的封面
+5. 也可以直接处理封面存档（image_archive.py），哈希取自存档索引，图片从mmap读取
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from image_archive import ImageArchive
+
+# 尝试导入Pillow，如果不可用则只做格式识别和去重
+try:
+    from PIL import Image
+    Image.init()
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# 旧版Pillow需要pillow-avif-plugin插件才能写AVIF
+try:
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+AVIF_AVAILABLE = PIL_AVAILABLE and 'AVIF' in Image.SAVE
+
+# 输入目录（与douban.py一致）和输出目录
+IMAGE_DIR = 'images'
+OUTPUT_DIR = 'covers'
+MANIFEST_FILE = 'manifest.json'
+# 缩略图最长边（像素）和编码质量
+THUMB_SIZE = 200
+WEBP_QUALITY = 80
+AVIF_QUALITY = 60
+# 并行进程数
+DEFAULT_WORKERS = os.cpu_count() or 2
+# 识别格式只需读取文件头
+SNIFF_BYTES = 32
+
+# 格式 -> 扩展名
+FORMAT_EXTENSIONS = {'jpeg': 'jpg', 'png': 'png', 'gif': 'gif', 'webp': 'webp', 'avif': 'avif', 'bmp': 'bmp'}
+
+def sniff_format(head):
+    """根据文件头魔数判断图片格式，无法识别时返回None"""
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    if head[4:8] == b'ftyp' and head[8:12] in (b'avif', b'avis'):
+        return 'avif'
+    if head.startswith(b'BM'):
+        return 'bmp'
+    return None
+
+def digest_file(path):
+    """计算文件的SHA-256、大小和真实格式"""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        head = f.read(SNIFF_BYTES)
+        sha.update(head)
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest(), os.path.getsize(path), sniff_format(head)
+
+# 子进程中已打开的存档：路径 -> ImageArchive
+_WORKER_ARCHIVES = {}
+
+def worker_archive(archive_path):
+    """子进程中每个存档只打开一次"""
+    if archive_path not in _WORKER_ARCHIVES:
+        _WORKER_ARCHIVES[archive_path] = ImageArchive(archive_path)
+    return _WORKER_ARCHIVES[archive_path]
+
+def output_paths(output_dir, digest, fmt):
+    """某个内容哈希对应的各输出文件路径（按哈希前两位分目录）"""
+    shard = digest[:2]
+    return {
+        'original': os.path.join(output_dir, 'originals', shard, f"{digest}.{FORMAT_EXTENSIONS.get(fmt, 'bin')}"),
+        'webp': os.path.join(output_dir, 'webp', shard, f'{digest}.webp'),
+        'thumb': os.path.join(output_dir, 'thumbs', shard, f'{digest}.webp'),
+        'avif': os.path.join(output_dir, 'avif', shard, f'{digest}.avif'),
+    }
+
+def process_cover(src_path, digest, fmt, output_dir, thumb_size=THUMB_SIZE, quality=WEBP_QUALITY, avif=False,
+                  archive_path=None):
+    """子进程：保存原图并生成缩略图和WebP/AVIF版本，返回记录；给出archive_path时src_path为存档中的文件名"""
+    paths = output_paths(output_dir, digest, fmt)
+    for path in paths.values():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    if archive_path:
+        view = worker_archive(archive_path).get(src_path)
+        with open(paths['original'], 'wb') as f:
+            f.write(view)
+        size = len(view)
+    else:
+        shutil.copyfile(src_path, paths['original'])
+        size = os.path.getsize(src_path)
+    record = {'format': fmt, 'bytes': size, 'original': paths['original']}
+    if not PIL_AVAILABLE or fmt is None:
+        return record
+
+    with Image.open(io.BytesIO(view) if archive_path else src_path) as img:
+        img.load()
+        record['width'], record['height'] = img.size
+        # WebP不支持CMYK等模式，统一转换
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info else 'RGB')
+        img.save(paths['webp'], 'WEBP', quality=quality, method=4)
+        record['webp'] = paths['webp']
+        record['webp_bytes'] = os.path.getsize(paths['webp'])
+        if avif:
+            img.save(paths['avif'], 'AVIF', quality=AVIF_QUALITY)
+            record['avif'] = paths['avif']
+            record['avif_bytes'] = os.path.getsize(paths['avif'])
+        thumb = img.copy()
+        thumb.thumbnail((thumb_size, thumb_size), Image.LANCZOS)
+        thumb.save(paths['thumb'], 'WEBP', quality=quality, method=4)
+        record['thumb'] = paths['thumb']
+        record['thumb_bytes'] = os.path.getsize(paths['thumb'])
+    return record
+
+def load_manifest(output_dir):
+    """读取已有的manifest：{'files': {文件名: 内容哈希}, 'covers': {内容哈希: 记录}}"""
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {'files': {}, 'covers': {}}
+
+def save_manifest(manifest, output_dir):
+    """先写临时文件再替换，避免中断时损坏manifest"""
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+def digest_archive(archive):
+    """存档中的文件名及其 (SHA-256, 大小, 真实格式)；哈希直接取自索引，不读取全部内容"""
+    names = sorted(archive.names())
+    digests = []
+    for name in names:
+        view = archive.get(name)
+        digests.append((archive.digest(name), len(view), sniff_format(bytes(view[:SNIFF_BYTES]))))
+    return names, digests
+
+def run_pipeline(input_dir=IMAGE_DIR, output_dir=OUTPUT_DIR, workers=DEFAULT_WORKERS,
+                 thumb_size=THUMB_SIZE, quality=WEBP_QUALITY, avif=False, archive_path=None):
+    """处理input_dir（或archive_path指定的封面存档）中的所有封面，返回更新后的manifest"""
+    if avif and not AVIF_AVAILABLE:
+        print(" 当前Pillow不支持AVIF编码，跳过AVIF（可安装pillow-avif-plugin）")
+        avif = False
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    if archive_path:
+        with ImageArchive(archive_path) as archive:
+            names, digests = digest_archive(archive)
+        paths = names
+    else:
+        names = sorted(name for name in os.listdir(input_dir) if os.path.isfile(os.path.join(input_dir, name)))
+        paths = [os.path.join(input_dir, name) for name in names]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # 第一阶段：并行计算哈希、识别格式
+        if not archive_path:
+            digests = list(executor.map(digest_file, paths, chunksize=32))
+
+        # 第二阶段：每个新内容只处理一次
+        pending = {}
+        for name, path, (digest, size, fmt) in zip(names, paths, digests):
+            manifest['files'][name] = digest
+            if digest not in manifest['covers'] and digest not in pending:
+                pending[digest] = (path, fmt)
+        futures = {digest: executor.submit(process_cover, path, digest, fmt, output_dir, thumb_size, quality, avif,
+                                           archive_path)
+                   for digest, (path, fmt) in pending.items()}
+        failed = 0
+        for digest, future in futures.items():
+            try:
+                manifest['covers'][digest] = future.result()
+            except Exception as e:
+                failed += 1
+                print(f" 处理 {pending[digest][0]} 失败: {e}")
+
+    save_manifest(manifest, output_dir)
+    duplicates = len(names) - len(set(digest for digest, _, _ in digests))
+    print(f" 共 {len(names)} 个文件，重复 {duplicates} 个，新处理 {len(futures) - failed} 个，失败 {failed} 个")
+    return manifest
+
+def summarize(manifest):
+    """统计各版本占用的字节数和格式分布"""
+    covers = manifest['covers'].values()
+    formats = Counter(record.get('format') or '未知' for record in covers)
+    total_files = sum(manifest['covers'][digest]['bytes'] for digest in manifest['files'].values()
+                      if digest in manifest['covers'])
+    return {
+        '文件数': len(manifest['files']),
+        '去重后': len(manifest['covers']),
+        '格式分布': dict(formats),
+        '原始总字节': total_files,
+        '去重后原图字节': sum(record['bytes'] for record in covers),
+        'WebP字节': sum(record.get('webp_bytes', 0) for record in covers),
+        'AVIF字节': sum(record.get('avif_bytes', 0) for record in covers),
+        '缩略图字节': sum(record.get('thumb_bytes', 0) for record in covers),
+    }
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='封面图片后处理：格式识别、去重、缩略图和WebP/AVIF转换')
+    parser.add_argument('--input', default=IMAGE_DIR, help=f'封面目录 (默认: {IMAGE_DIR})')
+    parser.add_argument('--output', default=OUTPUT_DIR, help=f'输出目录 (默认: {OUTPUT_DIR})')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help=f'进程数 (默认: {DEFAULT_WORKERS})')
+    parser.add_argument('--thumb-size', type=int, default=THUMB_SIZE, help=f'缩略图最长边 (默认: {THUMB_SIZE})')
+    parser.add_argument('--quality', type=int, default=WEBP_QUALITY, help=f'WebP质量 (默认: {WEBP_QUALITY})')
+    parser.add_argument('--avif', action='store_true', help='同时生成AVIF版本')
+    parser.add_argument('--archive', help='处理封面存档（如covers.pack），代替--input目录')
+    args = parser.parse_args()
+
+    if not PIL_AVAILABLE:
+        print(" 未安装Pillow，只做格式识别和去重，不生成缩略图和WebP")
+    start = time.perf_counter()
+    manifest = run_pipeline(args.input, args.output, args.workers, args.thumb_size, args.quality, args.avif,
+                            args.archive)
+    print(f" 耗时 {time.perf_counter() - start:.2f} 秒")
+    for key, value in summarize(manifest).items():
+        print(f"  {key}: {value}")
+
+if __name__ == "__main__":
+    main()
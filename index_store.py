@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+索引持久化工具
+功能：
+1. 把索引对象的全部属性连同格式版本号pickle到磁盘，先写临时文件再替换，避免中断时损坏索引
+2. 加载时检查版本号，结构变化后的旧索引提示重新建立
+全文检索索引（book_search.py）和分类关键词索引（category_keywords.py）共用
+"""
+
+import os
+import pickle
+
+def save_index(index, index_file, version):
+    """保存索引对象的全部属性"""
+    state = dict(index.__dict__)
+    state['version'] = version
+    tmp_file = index_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, index_file)
+
+def load_index(cls, index_file, version):
+    """加载索引并恢复为cls的实例（不调用__init__）；版本不匹配时抛出ValueError"""
+    with open(index_file, 'rb') as f:
+        state = pickle.load(f)
+    if state.pop('version', None) != version:
+        raise ValueError(f"索引版本不匹配，请重新建立索引: {index_file}")
+    index = cls.__new__(cls)
+    index.__dict__.update(state)
+    return index
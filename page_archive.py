@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+列表页原始HTML存档与离线重新解析
+功能：
+1. 每次爬取抓到的每一页都单独压缩（优先zstd，未安装zstandard时用gzip）后追加到本轮的数据文件，
+   页码、URL、分类、抓取时间和偏移量记录在索引文件 index.jsonl
+2. reparse: 不访问网络，用当前的解析逻辑从存档页面重新生成books.csv；
+   各页由进程池并行解压和解析，修复提取逻辑后可在几秒内应用到全部历史数据
+"""
+
+import argparse
+import gzip
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
+from book_extractor import extract_books, BOOKS_PER_PAGE
+
+# 尝试导入zstandard，如果不可用则使用gzip压缩
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# 存档目录和索引文件名
+ARCHIVE_DIR = 'page_archive'
+INDEX_FILE = 'index.jsonl'
+# 压缩级别
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+# 重新解析的进程数
+DEFAULT_WORKERS = os.cpu_count() or 2
+
+def compress(data, codec):
+    """按codec压缩一页"""
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return gzip.compress(data, GZIP_LEVEL)
+
+def decompress(data, codec):
+    """按codec解压一页"""
+    if codec == 'zstd':
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("该页使用zstd压缩，需要安装zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+def page_params(url):
+    """从列表页URL中取出分类ID和排序方式"""
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query)
+    category_id = parsed.path.rstrip('/').rsplit('/', 1)[-1]
+    return category_id, query.get('sort', [''])[0]
+
+class PageArchive:
+    def __init__(self, archive_dir=ARCHIVE_DIR, run_id=None):
+        """打开存档目录；每轮爬取（run_id，默认为当前时间）写入各自的数据文件"""
+        self.archive_dir = archive_dir
+        self.run_id = run_id or time.strftime('%Y%m%d-%H%M%S')
+        self.codec = 'zstd' if ZSTD_AVAILABLE else 'gzip'
+        self._lock = threading.Lock()
+        self._data = None
+        os.makedirs(archive_dir, exist_ok=True)
+
+    @property
+    def data_file(self):
+        return f'{self.run_id}.pages'
+
+    def add(self, html_content, url, page_num):
+        """压缩并追加一页，返回索引记录"""
+        raw = html_content.encode('utf-8')
+        compressed = compress(raw, self.codec)
+        category_id, sort = page_params(url)
+        with self._lock:
+            if self._data is None:
+                self._data = open(os.path.join(self.archive_dir, self.data_file), 'ab')
+            offset = self._data.seek(0, os.SEEK_END)
+            self._data.write(compressed)
+            self._data.flush()
+            entry = {
+                'run': self.run_id, 'file': self.data_file, 'offset': offset, 'length': len(compressed),
+                'codec': self.codec, 'raw_bytes': len(raw), 'url': url, 'category_id': category_id,
+                'sort': sort, 'page': page_num, 'fetched_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            # 先写数据再写索引，中断时不会留下指向不完整数据的索引
+            with open(os.path.join(self.archive_dir, INDEX_FILE), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        return entry
+
+    def close(self):
+        with self._lock:
+            if self._data is not None:
+                self._data.close()
+                self._data = None
+
+def load_index(archive_dir=ARCHIVE_DIR):
+    """读取全部索引记录（按写入顺序）"""
+    path = os.path.join(archive_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue  # 写索引时中断留下的半行
+    return entries
+
+def select_pages(entries, run=None, category_id=None, sort=None):
+    """
+    选出要重新解析的页面：默认取最近一轮爬取
+    同一轮中同一分类、排序和页码抓取了多次时只保留最后一次
+    """
+    if run is None and entries:
+        run = entries[-1]['run']
+    latest = {}
+    for entry in entries:
+        if entry['run'] != run:
+            continue
+        if category_id is not None and str(entry['category_id']) != str(category_id):
+            continue
+        if sort is not None and entry['sort'] != sort:
+            continue
+        latest[(entry['category_id'], entry['sort'], entry['page'])] = entry
+    return [latest[key] for key in sorted(latest)]
+
+def read_page(archive_dir, entry):
+    """读取并解压一页HTML"""
+    with open(os.path.join(archive_dir, entry['file']), 'rb') as f:
+        f.seek(entry['offset'])
+        data = f.read(entry['length'])
+    return decompress(data, entry['codec']).decode('utf-8')
+
+def reparse_page(archive_dir, entry):
+    """子进程：解压并解析一页，返回 [(Book, 封面URL), ...]"""
+    html_content = read_page(archive_dir, entry)
+    return extract_books(html_content, (entry['page'] - 1) * BOOKS_PER_PAGE + 1)
+
+def reparse(archive_dir=ARCHIVE_DIR, run=None, category_id=None, sort=None, workers=DEFAULT_WORKERS):
+    """并行重新解析选中的页面，返回 (Book列表, 页面数)"""
+    entries = select_pages(load_index(archive_dir), run, category_id, sort)
+    books = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(reparse_page, archive_dir, entry) for entry in entries]
+        for entry, future in zip(entries, futures):
+            try:
+                extracted = future.result()
+            except Exception as e:
+                print(f" 第 {entry['page']} 页（{entry['url']}）解析失败: {e}")
+                continue
+            for book, _ in extracted:
+                book.category_id = entry['category_id']
+                book.sort = entry['sort']
+                books.append(book)
+    return books, len(entries)
+
+def summarize_runs(entries):
+    """按轮次统计页数、原始字节数和压缩后字节数"""
+    runs = {}
+    for entry in entries:
+        run = runs.setdefault(entry['run'], {'pages': 0, 'raw_bytes': 0, 'bytes': 0,
+                                             'first': entry['fetched_at'], 'codec': entry['codec']})
+        run['pages'] += 1
+        run['raw_bytes'] += entry['raw_bytes']
+        run['bytes'] += entry['length']
+    return runs
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='列表页原始HTML存档与离线重新解析')
+    parser.add_argument('--archive-dir', default=ARCHIVE_DIR, help=f'存档目录 (默认: {ARCHIVE_DIR})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('list', help='列出存档中的各轮爬取')
+
+    reparse_parser = subparsers.add_parser('reparse', help='从存档页面重新生成CSV（不访问网络）')
+    reparse_parser.add_argument('--run', help='爬取轮次 (默认: 最近一轮)')
+    reparse_parser.add_argument('--category', help='只解析该分类ID的页面')
+    reparse_parser.add_argument('--sort', help='只解析该排序方式的页面')
+    reparse_parser.add_argument('--output', default='books.csv', help='输出CSV文件 (默认: books.csv)')
+    reparse_parser.add_argument('--image-dir', default='images', help='封面目录，已下载的封面写入封面图片列 (默认: images)')
+    reparse_parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help=f'进程数 (默认: {DEFAULT_WORKERS})')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        runs = summarize_runs(load_index(args.archive_dir))
+        if not runs:
+            print(" 存档为空")
+        for run, stats in runs.items():
+            ratio = stats['raw_bytes'] / stats['bytes'] if stats['bytes'] else 0
+            print(f"  {run}  {stats['first']}  {stats['pages']:>4} 页  "
+                  f"{stats['raw_bytes'] / 1024:>9.1f} KB -> {stats['bytes'] / 1024:>8.1f} KB "
+                  f"({stats['codec']}, {ratio:.1f}x)")
+        return
+
+    from douban import save_to_csv, clean_filename
+
+    start = time.perf_counter()
+    books, pages = reparse(args.archive_dir, args.run, args.category, args.sort, args.workers)
+    if not books:
+        print(" 没有可解析的页面或页面中没有书籍")
+        return
+    # 封面不重新下载：封面目录中已有同名文件时沿用
+    for book in books:
+        filename = f"{book.rank}_{clean_filename(book.title)}.jpg"
+        if os.path.exists(os.path.join(args.image_dir, filename)):
+            book.cover = filename
+    save_to_csv(books, args.output)
+    print(f" 重新解析 {pages} 页，得到 {len(books)} 本书，已保存至 {args.output}，"
+          f"耗时 {time.perf_counter() - start:.2f} 秒")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+爬虫解析流水线
+功能：
+1. 抓取循环只负责获取页面HTML，解析交给进程池，浏览器不必等待解析完成
+2. 在途页面数有上限，抓取过快时阻塞抓取循环，内存占用有界
+3. 解析结果按页码顺序交给后续处理（下载封面等），子进程的性能指标合并回主进程
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from book_extractor import extract_books
+from crawl_metrics import CrawlMetrics
+
+# 默认解析进程数
+DEFAULT_PARSE_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+# 每个解析进程最多排队的页数
+PENDING_PER_WORKER = 2
+
+def parse_page(html_content, start_rank):
+    """子进程：解析一页，返回 (提取结果, 指标snapshot)"""
+    metrics = CrawlMetrics()
+    extracted = extract_books(html_content, start_rank, metrics)
+    return extracted, metrics.snapshot()
+
+class ParsePipeline:
+    def __init__(self, handle_page, workers=DEFAULT_PARSE_WORKERS, max_pending=None, metrics=None):
+        """
+        handle_page(页码, 提取结果) -> 书籍列表：在结果线程中按页码顺序调用（如下载封面）
+        max_pending: 已提交但尚未处理完的页数上限（默认每个进程PENDING_PER_WORKER页）
+        metrics: 合并子进程指标的CrawlMetrics
+        """
+        self.handle_page = handle_page
+        self.metrics = metrics
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self._slots = threading.BoundedSemaphore(max_pending or workers * PENDING_PER_WORKER)
+        self._queue = queue.Queue()
+        self.pages = {}       # 页码 -> 书籍列表
+        self.failed = []      # 解析失败的页码
+        self._thread = threading.Thread(target=self._consume, daemon=True)
+        self._thread.start()
+
+    def submit(self, page_num, html_content, start_rank):
+        """提交一页HTML；在途页数达到上限时阻塞，直到有页面处理完"""
+        self._slots.acquire()
+        future = self.executor.submit(parse_page, html_content, start_rank)
+        self._queue.put((page_num, future))
+
+    def _consume(self):
+        """结果线程：按提交顺序（即页码顺序）等待解析结果并处理"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            page_num, future = item
+            try:
+                extracted, snapshot = future.result()
+                if self.metrics:
+                    self.metrics.merge(snapshot)
+                self.pages[page_num] = self.handle_page(page_num, extracted)
+            except Exception as e:
+                self.failed.append((page_num, e))
+            finally:
+                self._slots.release()
+
+    def close(self):
+        """等待所有页面处理完，关闭进程池，返回按页码排序的书籍列表"""
+        self._queue.put(None)
+        self._thread.join()
+        self.executor.shutdown()
+        return [book for page_num in sorted(self.pages) for book in self.pages[page_num]]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self.executor.shutdown(cancel_futures=True)
@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+单遍流式统计
+功能：
+1. Welford/Chan算法计算计数、均值、标准差、最值，可合并
+2. 分位数：数值不超过EXACT_LIMIT个时保留原始值，结果精确（与pandas一样线性插值）；
+   超过后转为KLL草图，内存固定、误差有界，可合并
+3. BookMetricsAccumulator按块单遍计算BookDataAnalyzer所需的全部指标，不生成过滤后的DataFrame副本；
+   多个块、多个进程的结果可以merge，适合很大的历史数据（如 pd.read_csv(chunksize=...)）
+"""
+
+import math
+
+import numpy as np
+
+# KLL草图参数k：越大越精确，占用约3k个值
+DEFAULT_K = 200
+# 不超过该数量的数值保留原始值计算精确分位数，超过后才使用草图；None表示始终精确
+EXACT_LIMIT = 8192
+# 每块处理的行数
+CHUNK_SIZE = 65536
+# describe()输出的分位数
+DESCRIBE_QUANTILES = (0.25, 0.5, 0.75)
+
+class RunningStats:
+    def __init__(self):
+        """计数、均值、二阶中心矩、最值"""
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values):
+        """加入一批数值（numpy数组）"""
+        values = np.asarray(values, dtype=float)
+        if values.size == 0:
+            return
+        batch = RunningStats()
+        batch.count = values.size
+        batch.mean = float(values.mean())
+        batch.m2 = float(((values - batch.mean) ** 2).sum())
+        batch.min = float(values.min())
+        batch.max = float(values.max())
+        self.merge(batch)
+
+    def merge(self, other):
+        """合并另一组统计（Chan并行算法）"""
+        if other.count == 0:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def std(self):
+        """样本标准差（与pandas一致，ddof=1）"""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+class KLLSketch:
+    def __init__(self, k=DEFAULT_K, seed=0, exact_limit=EXACT_LIMIT):
+        """
+        KLL分位数草图：第h层每个值代表2^h个原始值
+        数值总数不超过exact_limit（None为不限）时只保存原始值，分位数和排名都是精确的
+        """
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self.exact_limit = exact_limit
+        self._exact = True
+        self._chunks = []       # 精确模式下的原始值（按批保存，用到时才拼接）
+        self._sorted = None
+        self._rng = np.random.RandomState(seed)
+
+    def _capacity(self, level):
+        """越低的层容量越大（按2/3几何递减）"""
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _size(self):
+        return sum(level.size for level in self.levels)
+
+    def _max_size(self):
+        return sum(self._capacity(h) for h in range(len(self.levels)))
+
+    def _within_limit(self, n):
+        return self.exact_limit is None or n <= self.exact_limit
+
+    def _raw_values(self):
+        """精确模式下的全部原始值（已排序）"""
+        if self._sorted is None:
+            self._sorted = np.sort(np.concatenate(self._chunks)) if self._chunks else np.empty(0)
+            self._chunks = [self._sorted]
+        return self._sorted
+
+    def _to_sketch(self):
+        """原始值超出exact_limit，转为草图"""
+        self.levels[0] = np.concatenate([self.levels[0], self._raw_values()])
+        self._chunks = []
+        self._sorted = None
+        self._exact = False
+        self._compress()
+
+    def update(self, values):
+        """加入一批数值"""
+        values = np.asarray(values, dtype=float).ravel()
+        if values.size == 0:
+            return
+        self.n += values.size
+        if self._exact:
+            self._chunks.append(values)
+            self._sorted = None
+            if not self._within_limit(self.n):
+                self._to_sketch()
+            return
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        """合并另一个草图"""
+        if other.exact:
+            self.update(other._raw_values())
+            return self
+        if self._exact:
+            self._to_sketch()
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, level in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def _compress(self):
+        """超出容量时逐层压缩：排序后随机取奇数位或偶数位的一半升到上一层"""
+        while self._size() >= self._max_size():
+            for h in range(len(self.levels)):
+                level = self.levels[h]
+                if level.size < self._capacity(h):
+                    continue
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                level = np.sort(level)
+                # 奇数个时最大的一个留在本层
+                keep = level[level.size - level.size % 2:]
+                promoted = level[self._rng.randint(2):level.size - level.size % 2:2]
+                self.levels[h] = keep
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+                break
+
+    @property
+    def exact(self):
+        """是否仍保存着全部原始值"""
+        return self._exact
+
+    def _weighted(self):
+        """所有保留值及其权重，按值排序"""
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(level.size, 2 ** h, dtype=float) for h, level in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        return values[order], weights[order]
+
+    def quantile(self, q):
+        """分位数；精确模式下与pandas一样线性插值"""
+        if self.n == 0:
+            return math.nan
+        if self.exact:
+            return float(np.quantile(self._raw_values(), q))
+        values, weights = self._weighted()
+        cumulative = np.cumsum(weights)
+        index = int(np.searchsorted(cumulative, q * cumulative[-1], side='left'))
+        return float(values[min(index, values.size - 1)])
+
+    def rank(self, x, inclusive=False):
+        """估计小于x（inclusive=True时为小于等于x）的原始值个数"""
+        if self.n == 0:
+            return 0
+        side = 'right' if inclusive else 'left'
+        if self.exact:
+            return int(np.searchsorted(self._raw_values(), x, side=side))
+        values, weights = self._weighted()
+        total = weights[:np.searchsorted(values, x, side=side)].sum()
+        # 各层权重之和可能与n有微小出入，按比例还原到n
+        return int(round(total * self.n / weights.sum()))
+
+class ColumnStats:
+    def __init__(self, k=DEFAULT_K, exact_limit=EXACT_LIMIT):
+        """一列数值的均值/标准差/最值 + 分位数"""
+        self.running = RunningStats()
+        self.sketch = KLLSketch(k, exact_limit=exact_limit)
+
+    def update(self, values):
+        self.running.update(values)
+        self.sketch.update(values)
+
+    def merge(self, other):
+        self.running.merge(other.running)
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def count(self):
+        return self.running.count
+
+    def describe(self):
+        """与pandas Series.describe()相同的键"""
+        empty = self.count == 0
+        stats = {
+            'count': float(self.count),
+            'mean': math.nan if empty else self.running.mean,
+            'std': self.running.std,
+            'min': math.nan if empty else self.running.min,
+        }
+        for q in DESCRIBE_QUANTILES:
+            stats[f'{q:.0%}'] = self.sketch.quantile(q)
+        stats['max'] = math.nan if empty else self.running.max
+        return stats
+
+class BookMetricsAccumulator:
+    def __init__(self, k=DEFAULT_K, exact_limit=EXACT_LIMIT):
+        """
+        累积BookDataAnalyzer.analyze_common_metrics所需的全部指标（需要clean_data后的数值列）
+        exact_limit: 每列不超过该数量时分位数为精确值，None表示始终精确
+        """
+        self.total = 0
+        self.price = ColumnStats(k, exact_limit)           # 原价_清洗 > 0
+        self.current_price = ColumnStats(k, exact_limit)   # 现价_清洗 > 0
+        self.words = ColumnStats(k, exact_limit)           # 字数_清洗 > 0
+        self.discount_rate = RunningStats()   # 原价、现价都 > 0 的折扣率
+        self.saving = RunningStats()          # 原价、现价都 > 0 的优惠金额
+        self.unpriced = 0                     # 原价 <= 0 的图书数
+        self.rank = RunningStats()
+        self.top100 = 0
+        self.top500 = 0
+
+    def update(self, data, chunk_size=CHUNK_SIZE):
+        """按块累积一个DataFrame；只取列的numpy视图，每块只生成临时的布尔掩码"""
+        columns = [np.asarray(data[column].to_numpy(), dtype=float)
+                   for column in ('原价_清洗', '现价_清洗', '字数_清洗', '折扣率', '优惠金额', '热度排名')]
+        for start in range(0, len(data), chunk_size):
+            self.update_arrays(*(column[start:start + chunk_size] for column in columns))
+
+    def update_arrays(self, price, current_price, words, discount_rate, saving, rank):
+        """累积一块数据（各参数为等长的numpy数组）"""
+        self.total += price.size
+        priced = price > 0
+        self.price.update(price[priced])
+        self.unpriced += int(price.size - priced.sum())
+        current_priced = current_price > 0
+        self.current_price.update(current_price[current_priced])
+        both = priced & current_priced
+        self.discount_rate.update(discount_rate[both])
+        self.saving.update(saving[both])
+        self.words.update(words[words > 0])
+        self.rank.update(rank)
+        self.top100 += int((rank <= 100).sum())
+        self.top500 += int((rank <= 500).sum())
+
+    def merge(self, other):
+        """合并另一个块或进程的累积结果"""
+        self.total += other.total
+        self.price.merge(other.price)
+        self.current_price.merge(other.current_price)
+        self.words.merge(other.words)
+        self.discount_rate.merge(other.discount_rate)
+        self.saving.merge(other.saving)
+        self.unpriced += other.unpriced
+        self.rank.merge(other.rank)
+        self.top100 += other.top100
+        self.top500 += other.top500
+        return self
+
+    def result(self):
+        """汇总为指标字典"""
+        price_stats = self.price.describe()
+        return {
+            'total_books': self.total,
+            'priced_books': self.price.count,
+            'worded_books': self.words.count,
+            'price_stats': price_stats,
+            'current_price_stats': self.current_price.describe(),
+            'word_stats': self.words.describe() if self.words.count else None,
+            'discount_books': self.discount_rate.count,
+            'mean_discount_rate': self.discount_rate.mean,
+            'mean_saving': self.saving.mean,
+            'rank_min': self.rank.min,
+            'rank_max': self.rank.max,
+            'top100_books': self.top100,
+            'top500_books': self.top500,
+            # 与原先的 (原价_清洗 > 75%分位数).sum()、(原价_清洗 < 25%分位数).sum() 口径一致
+            'high_price_books': self.price.count - self.price.sketch.rank(price_stats['75%'], inclusive=True),
+            'low_price_books': self.unpriced + self.price.sketch.rank(price_stats['25%']),
+        }